@@ -0,0 +1,74 @@
+"""
+Incrementally maintained dashboard aggregates.
+
+Counters by priority, sentiment and topic are updated as each ticket is
+classified or re-classified, so the dashboard reads O(labels) counts instead of
+rebuilding a DataFrame over every ticket on each rerun.
+"""
+
+import itertools
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+
+# Versions are unique across all aggregate objects so they can key chart caches
+_version_counter = itertools.count(1)
+
+
+def _topic_tags(ticket: Dict) -> List[str]:
+    tags = ticket.get('topic_tags') or []
+    if not isinstance(tags, list):
+        tags = [tags]
+    return list(set(tags))
+
+
+class TicketAggregates:
+    def __init__(self):
+        self.total = 0
+        self.priority_counts = Counter()
+        self.sentiment_counts = Counter()
+        self.topic_counts = Counter()
+        self.version = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_tickets(cls, tickets: List[Dict]) -> 'TicketAggregates':
+        """Build aggregates for a full classification run."""
+        aggregates = cls()
+        for ticket in tickets:
+            aggregates._apply(ticket, 1)
+        aggregates.version = next(_version_counter)
+        return aggregates
+
+    def _apply(self, ticket: Dict, delta: int):
+        self.total += delta
+        self.priority_counts[ticket.get('priority')] += delta
+        self.sentiment_counts[ticket.get('sentiment')] += delta
+        for tag in _topic_tags(ticket):
+            self.topic_counts[tag] += delta
+
+    def add(self, ticket: Dict):
+        """Count a newly classified ticket."""
+        with self._lock:
+            self._apply(ticket, 1)
+            self.version = next(_version_counter)
+
+    def replace(self, old_ticket: Optional[Dict], new_ticket: Dict):
+        """Swap a ticket's previous classification for its new one."""
+        with self._lock:
+            if old_ticket is not None:
+                self._apply(old_ticket, -1)
+            self._apply(new_ticket, 1)
+            self.version = next(_version_counter)
+
+    def snapshot(self) -> Dict:
+        """Return a consistent copy of the counters, dropping empty labels."""
+        with self._lock:
+            return {
+                'version': self.version,
+                'total': self.total,
+                'priority': {k: v for k, v in self.priority_counts.items() if v > 0},
+                'sentiment': {k: v for k, v in self.sentiment_counts.items() if v > 0},
+                'topics': {k: v for k, v in self.topic_counts.items() if v > 0}
+            }
@@ -1,147 +1,249 @@
-import cohere
-import google.generativeai as genai
-import json
-import re
+import threading
 import time
 from typing import Dict, List, Optional
+from budget import BULK, INTERACTIVE, LLM_BUDGET, BudgetExceededError
+from circuit_breaker import COHERE_BREAKER, CircuitOpenError
 from config import Config
+from dedup import TicketDeduplicator
+from distilled_classifier import DistilledClassifier
+from llm_pool import get_llm_pool
+from metrics import METRICS
+from prompt_templates import estimate_tokens, get_prompt_template
+from structured_output import CLASSIFICATION_FIELDS, coerce_classification, extract_json, supports_response_format
 
 class TicketClassifier:
-    def __init__(self):
+    def __init__(self, cohere_client=None, circuit_breaker=None, distilled_model=None, prompt_template=None,
+                 budget=None):
         self.config = Config()
-        self.cohere_client = None
+        self.cohere_client = cohere_client  # injectable, e.g. a stub client for local testing
+        self.circuit_breaker = circuit_breaker or COHERE_BREAKER  # shared with RAGSystem
+        self.budget = budget or LLM_BUDGET  # shared with RAGSystem
+        self.prompt_template = get_prompt_template(prompt_template)  # PROMPT_TEMPLATE_VERSION by default
+        
+        # Local model distilled from past LLM labels; tried before any API call
+        self.distilled_model = distilled_model
+        if self.distilled_model is None and self.config.DISTILLED_ENABLED:
+            self.distilled_model = DistilledClassifier.load_latest(self.config.DISTILLED_MODEL_DIR)
         self.last_api_call_time = 0
         self.min_delay_between_calls = 6  # 6 seconds for 10 calls/min limit
+        self._rate_limit_lock = threading.Lock()  # shared by UI and background jobs
    
         
-        # Initialize clients based on configuration
-        if self.config.USE_COHERE and self.config.COHERE_API_KEY:
-            try:
-                self.cohere_client = cohere.Client(self.config.COHERE_API_KEY)
-            except Exception as e:
-                print(f"Failed to initialize Cohere client: {e}")
+        # Shared pool of configured keys/providers (None when no LLM is configured)
+        if self.cohere_client is None:
+            self.cohere_client = get_llm_pool()
+        if getattr(self.cohere_client, 'handles_rate_limits', False):
+            self.min_delay_between_calls = 0  # the pool limits each key itself
+        
+        # Provider-enforced JSON schema when the client supports it; otherwise prompt + parser
+        self.structured_output = bool(self.cohere_client and self.config.STRUCTURED_OUTPUT
+                                      and supports_response_format(self.cohere_client))
     
     def _wait_for_rate_limit(self):
         """Ensure we respect the API rate limit (10 calls/min for trial keys)."""
-        current_time = time.time()
-        time_since_last_call = current_time - self.last_api_call_time
-        
-        if time_since_last_call < self.min_delay_between_calls:
-            wait_time = self.min_delay_between_calls - time_since_last_call
-            print(f"Rate limiting: waiting {wait_time:.1f} seconds...")
-            time.sleep(wait_time)
-        
-        self.last_api_call_time = time.time()
-        
-       
+        with METRICS.timer('rate_limit_wait', component='classifier'), self._rate_limit_lock:
+            current_time = time.time()
+            time_since_last_call = current_time - self.last_api_call_time
+            
+            if time_since_last_call < self.min_delay_between_calls:
+                wait_time = self.min_delay_between_calls - time_since_last_call
+                print(f"Rate limiting: waiting {wait_time:.1f} seconds...")
+                time.sleep(wait_time)
+            
+            self.last_api_call_time = time.time()
+    
+    def _chat(self, **kwargs):
+        """One rate-limited Cohere chat call; retried by the circuit breaker."""
+        self._wait_for_rate_limit()  # Respect API rate limit
+        with METRICS.timer('llm_call', component='classifier', template=self.prompt_template.version):
+            return self.cohere_client.chat(**kwargs)
     
     def _create_classification_prompt(self, subject: str, body: str) -> str:
-        """Create a detailed prompt for ticket classification."""
-        return f"""
-Analyze the following customer support ticket and classify it according to these categories:
+        """Render the ticket with the active prompt template (static instructions go in its preamble)."""
+        return self.prompt_template.render(subject, body)
+
+    def _classification_chat(self, message: str, ticket_count: int = 1, caller: str = INTERACTIVE,
+                             max_tokens: int = None, repair: bool = False):
+        """Send a rendered classification prompt, sized and tracked per template version.
+
+        The call is charged to the caller class's budget; BudgetExceededError is
+        raised without calling the API when that budget is spent. Repair re-asks
+        are sent without the template's preamble and answer schema.
+        """
+        template = self.prompt_template
+        preamble = None if repair else template.preamble
+        prompt = (preamble or "") + message
+        max_tokens = max_tokens or template.max_tokens(ticket_count)
+        extra = {'preamble_override': preamble} if preamble else {}
+        if self.structured_output and not repair:
+            extra['response_format'] = {'type': 'json_object', 'schema': template.response_schema(ticket_count)}
+        
+        reservation = self.budget.reserve(caller, estimate_tokens(prompt) + max_tokens)
+        try:
+            response = self.circuit_breaker.call(
+                self._chat,
+                model='command-r-plus-08-2024',
+                message=message,
+                max_tokens=max_tokens,
+                temperature=0.1,
+                **extra
+            )
+        except CircuitOpenError:
+            self.budget.release(reservation)
+            raise
+        except Exception:
+            self.budget.commit(reservation)  # the failed attempt may still have been billed
+            raise
+        self.budget.commit(reservation, self._record_token_usage(response, prompt, ticket_count, repair))
+        return response
 
-**TOPIC TAGS** (select one or more from): {', '.join(self.config.TOPIC_TAGS)}
-- How-to: Questions about using features or functionality
-- Product: General product questions, feature requests
-- Connector: Issues with data source connections (Snowflake, dbt, etc.)
-- Lineage: Data lineage tracking, mapping, visualization
-- API/SDK: Programming interfaces, automation, integrations
-- SSO: Single Sign-On, authentication issues
-- Glossary: Business terms, metadata management
-- Best practices: Guidance on optimal usage patterns
-- Sensitive data: PII, data privacy, security concerns
+    def _record_token_usage(self, response, prompt: str, ticket_count: int, repair: bool = False) -> int:
+        """Count prompt/completion tokens per template, estimating when the API reports none.
 
-**SENTIMENT** (select one): {', '.join(self.config.SENTIMENT_LABELS)}
-- Frustrated: User is blocked or facing repeated issues
-- Curious: User is exploring or learning
-- Angry: User is upset about service/product
-- Neutral: Matter-of-fact inquiry
+        Returns the total tokens used by the call.
+        """
+        usage = getattr(response, 'token_count', None) or {}
+        prompt_tokens = usage.get('prompt_tokens') or estimate_tokens(prompt)
+        completion_tokens = usage.get('response_tokens') or estimate_tokens(response.text or "")
+        labels = {'component': 'classifier', 'template': self.prompt_template.version}
+        METRICS.increment('repair_calls' if repair else 'classification_calls', **labels)
+        if not repair:
+            METRICS.increment('classified_by_llm', ticket_count, **labels)
+        METRICS.increment('prompt_tokens', prompt_tokens, **labels)
+        METRICS.increment('completion_tokens', completion_tokens, **labels)
+        return prompt_tokens + completion_tokens
 
-**PRIORITY** (select one): {', '.join(self.config.PRIORITY_LABELS)}
-- P0 (High): Urgent, business-critical, blocking workflows
-- P1 (Medium): Important but not immediately blocking
-- P2 (Low): Nice to have, general inquiries
+    def _parse_answers(self, response_text: str, ticket_count: int = 1) -> List[Optional[Dict]]:
+        """Decode the answers in a response (one pass over the text); None where an answer is missing."""
+        with METRICS.timer('json_extraction', component='classifier'):
+            parsed = extract_json(response_text)
+            if isinstance(parsed, dict) and isinstance(parsed.get('answers'), list):
+                parsed = parsed['answers']  # structured-output wrapper for packed answers
+            if isinstance(parsed, dict):
+                parsed = [parsed]
+            items = parsed[:ticket_count] if isinstance(parsed, list) else []
+            answers = [self.prompt_template.decode(item) if isinstance(item, dict) else None for item in items]
+        if not items:
+            METRICS.increment('parse_failures', component='classifier', reason='no_json')
+        return answers + [None] * (ticket_count - len(answers))
 
-**Ticket:**
-Subject: {subject}
-Body: {body}
+    def _complete_classifications(self, tickets: List[Dict], answers: List[Optional[Dict]],
+                                  caller: str) -> List[Optional[Dict]]:
+        """Validate answers against Config labels, re-asking (once) only the fields that failed.
 
-Respond in JSON format:
-{{
-  "topic_tags": ["tag1", "tag2"],
-  "sentiment": "sentiment_label",
-  "priority": "priority_label",
-  "reasoning": "Brief explanation of your classification"
-}}
-"""
+        Fields still invalid after the re-ask are filled from keyword classification;
+        an answer without any valid field is returned as None (full fallback).
+        """
+        results, failures = [], []
+        for answer in answers:
+            result, failed = coerce_classification(answer, self.config)
+            if failed and answer is not None:
+                METRICS.increment('parse_failures', component='classifier', reason='invalid_fields')
+            results.append(result)
+            failures.append(failed)
+        
+        to_repair = [i for i, failed in enumerate(failures) if failed]
+        if to_repair and self.config.STRUCTURED_REPAIR and not self.budget.should_degrade(caller):
+            repaired = self._repair_fields([tickets[i] for i in to_repair], [failures[i] for i in to_repair], caller)
+            for i, fixed in zip(to_repair, repaired):
+                results[i].update({field: fixed[field] for field in failures[i] if field in fixed})
+                failures[i] = [field for field in failures[i] if field not in results[i]]
+                if not failures[i]:
+                    METRICS.increment('repair_successes', component='classifier')
+        
+        completed = []
+        for ticket, result, failed in zip(tickets, results, failures):
+            if len(failed) == len(CLASSIFICATION_FIELDS):
+                completed.append(None)
+                continue
+            if failed:
+                METRICS.increment('keyword_filled_fields', len(failed), component='classifier')
+                keywords = self._keyword_classification(ticket['subject'], ticket['body'])
+                result.update({field: keywords[field] for field in failed})
+            completed.append(result)
+        return completed
 
-    def _extract_json_from_response(self, response_text: str) -> Optional[Dict]:
-        """Extract JSON from response text, handling various formats."""
+    def _repair_fields(self, tickets: List[Dict], failures: List[List[str]], caller: str) -> List[Dict]:
+        """One follow-up call asking only for each ticket's failed fields; returns the coerced fields."""
+        METRICS.increment('repair_asks', len(tickets), component='classifier')
+        items = list(zip(tickets, failures))
         try:
-            # Try direct JSON parsing
-            return json.loads(response_text)
-        except json.JSONDecodeError:
-            # Try to find JSON within the text
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                try:
-                    return json.loads(json_match.group())
-                except json.JSONDecodeError:
-                    pass
-            
-            # Fallback: extract individual fields
-            result = {}
-            
-            # Extract topic tags
-            topic_match = re.search(r'"topic_tags":\s*\[(.*?)\]', response_text, re.DOTALL)
-            if topic_match:
-                tags = re.findall(r'"([^"]*)"', topic_match.group(1))
-                result['topic_tags'] = tags
-            
-            # Extract sentiment
-            sentiment_match = re.search(r'"sentiment":\s*"([^"]*)"', response_text)
-            if sentiment_match:
-                result['sentiment'] = sentiment_match.group(1)
-            
-            # Extract priority
-            priority_match = re.search(r'"priority":\s*"([^"]*)"', response_text)
-            if priority_match:
-                result['priority'] = priority_match.group(1)
-            
-            # Extract reasoning
-            reasoning_match = re.search(r'"reasoning":\s*"([^"]*)"', response_text)
-            if reasoning_match:
-                result['reasoning'] = reasoning_match.group(1)
-            
-            return result if result else None
+            response = self._classification_chat(
+                self.prompt_template.render_repair(items), len(tickets), caller,
+                max_tokens=self.prompt_template.repair_max_tokens(items), repair=True
+            )
+        except (CircuitOpenError, BudgetExceededError):
+            return [{} for _ in tickets]
+        except Exception as e:
+            print(f"Error re-asking failed classification fields: {e}")
+            METRICS.increment('llm_errors', component='classifier')
+            return [{} for _ in tickets]
+        
+        parsed = extract_json(response.text)
+        if isinstance(parsed, dict):
+            parsed = [parsed]
+        fixed = [coerce_classification(item, self.config)[0] for item in (parsed or [])[:len(tickets)]]
+        return fixed + [{}] * (len(tickets) - len(fixed))
 
-    def classify_with_cohere(self, subject: str, body: str) -> Optional[Dict]:
+    def classify_with_cohere(self, subject: str, body: str, caller: str = INTERACTIVE) -> Optional[Dict]:
         """Classify ticket using Cohere API."""
         if not self.cohere_client:
             return None
         
         try:
-            prompt = self._create_classification_prompt(subject, body)
-            self._wait_for_rate_limit()  # Respect API rate limit
-            response = self.cohere_client.chat(
-                model='command-r-plus-08-2024',
-                message=prompt,
-                max_tokens=500,
-                temperature=0.1
-            )
+            with METRICS.timer('prompt_build', component='classifier'):
+                prompt = self._create_classification_prompt(subject, body)
+            response = self._classification_chat(prompt, caller=caller)
             
-            return self._extract_json_from_response(response.text)
+            answers = self._parse_answers(response.text)
+            return self._complete_classifications([{'subject': subject, 'body': body}], answers, caller)[0]
+        except (CircuitOpenError, BudgetExceededError):
+            # Outage detected or budget spent: skip the rate-limit wait and fall back immediately
+            return None
         except Exception as e:
             print(f"Error with Cohere classification: {e}")
+            METRICS.increment('llm_errors', component='classifier')
             return None
 
     
 
-    def classify_ticket(self, subject: str, body: str) -> Dict:
-        """Classify a ticket using available AI models."""
-        # Try Cohere first if enabled
+    def classify_with_distilled(self, subject: str, body: str, min_confidence: float = None) -> Optional[Dict]:
+        """Classify with the local distilled model, or None when it is missing or unsure."""
+        if not self.distilled_model:
+            return None
+        
+        if min_confidence is None:
+            min_confidence = self.config.DISTILLED_MIN_CONFIDENCE
+        with METRICS.timer('distilled_predict', component='classifier'):
+            result = self.distilled_model.predict(subject, body, min_confidence)
+        METRICS.increment('distilled_classifications' if result else 'distilled_abstentions', component='classifier')
+        return result
+
+    def _degraded_classification(self, subject: str, body: str, caller: str) -> Dict:
+        """Best local answer when the LLM budget is kept for other callers: any distilled guess, else keywords."""
+        METRICS.increment('budget_degraded', component='classifier', caller=caller)
+        result = self.classify_with_distilled(subject, body, min_confidence=0.0)
+        return result or self._fallback_classification(subject, body)
+
+    def _llm_enabled(self, caller: str) -> bool:
+        """Whether to call the LLM for this caller class (bulk work goes local when the budget runs low)."""
+        return bool(self.config.USE_COHERE and self.cohere_client) and not self.budget.should_degrade(caller)
+
+    def classify_ticket(self, subject: str, body: str, caller: str = INTERACTIVE) -> Dict:
+        """Classify a ticket using available AI models.
+
+        caller is the budget class the LLM call is charged to (INTERACTIVE or BULK).
+        """
+        # Confident local predictions need no API call
+        result = self.classify_with_distilled(subject, body)
+        if result:
+            return result
+        
+        # Try Cohere if enabled and within budget
         if self.config.USE_COHERE and self.cohere_client:
-            result = self.classify_with_cohere(subject, body)
+            if not self._llm_enabled(caller):
+                return self._degraded_classification(subject, body, caller)
+            result = self.classify_with_cohere(subject, body, caller)
             if result:
                 return result
         
@@ -152,6 +254,11 @@ Respond in JSON format:
 
     def _fallback_classification(self, subject: str, body: str) -> Dict:
         """Provide fallback classification using keyword matching."""
+        METRICS.increment('fallback_classifications', component='classifier')
+        return self._keyword_classification(subject, body)
+
+    def _keyword_classification(self, subject: str, body: str) -> Dict:
+        """Classify a ticket with the keyword tables (no metrics side effects)."""
         text = (subject + " " + body).lower()
         
         # Topic classification based on keywords
@@ -197,8 +304,23 @@ Respond in JSON format:
             "reasoning": "Fallback classification using keyword matching"
         }
 
-    def classify_bulk_tickets(self, tickets: List[Dict], progress_callback=None) -> List[Dict]:
-        """Classify multiple tickets in bulk with progress tracking."""
+    def classify_bulk_tickets(self, tickets: List[Dict], progress_callback=None,
+                              deduplicate: Optional[bool] = None) -> List[Dict]:
+        """Classify multiple tickets in bulk with progress tracking.
+        
+        With deduplication (DEDUP_ENABLED by default), near-duplicate tickets are
+        clustered and only one representative per cluster is classified.
+        """
+        if deduplicate is None:
+            deduplicate = self.config.DEDUP_ENABLED
+        if deduplicate:
+            classified_tickets, audit = TicketDeduplicator().classify(
+                tickets, lambda subject, body: self.classify_ticket(subject, body, caller=BULK), progress_callback
+            )
+            if audit:
+                print(f"Deduplication: {len(audit)} of {len(tickets)} tickets took labels from a near-duplicate")
+            return classified_tickets
+        
         classified_tickets = []
         total_tickets = len(tickets)
         
@@ -206,7 +328,7 @@ Respond in JSON format:
             if progress_callback:
                 progress_callback(i + 1, total_tickets)
             
-            classification = self.classify_ticket(ticket['subject'], ticket['body'])
+            classification = self.classify_ticket(ticket['subject'], ticket['body'], caller=BULK)
             classified_ticket = {
                 **ticket,
                 **classification
@@ -238,16 +360,18 @@ Respond in JSON format:
                 # Process each prompt in the batch
                 batch_results = []
                 for j, prompt in enumerate(batch):
+                    if self.budget.should_degrade(BULK):
+                        batch_results.append(self._degraded_classification(
+                            batch_tickets[j]['subject'],
+                            batch_tickets[j]['body'],
+                            BULK
+                        ))
+                        continue
                     try:
-                        self._wait_for_rate_limit()  # Respect API rate limit
-                        response = self.cohere_client.chat(
-                            model='command-r-plus-08-2024',
-                            message=prompt,
-                            max_tokens=300,
-                            temperature=0.1
-                        )
+                        response = self._classification_chat(prompt, caller=BULK)
                         
-                        result = self._extract_json_from_response(response.text)
+                        answers = self._parse_answers(response.text)
+                        result = self._complete_classifications([batch_tickets[j]], answers, BULK)[0]
                         if result:
                             batch_results.append(result)
                         else:
@@ -255,8 +379,14 @@ Respond in JSON format:
                                 batch_tickets[j]['subject'], 
                                 batch_tickets[j]['body']
                             ))
+                    except (CircuitOpenError, BudgetExceededError):
+                        batch_results.append(self._fallback_classification(
+                            batch_tickets[j]['subject'], 
+                            batch_tickets[j]['body']
+                        ))
                     except Exception as e:
                         print(f"Error classifying ticket {i+j}: {e}")
+                        METRICS.increment('llm_errors', component='classifier')
                         batch_results.append(self._fallback_classification(
                             batch_tickets[j]['subject'], 
                             batch_tickets[j]['body']
@@ -269,3 +399,41 @@ Respond in JSON format:
         except Exception as e:
             print(f"Error in batch classification: {e}")
             return [self._fallback_classification(t['subject'], t['body']) for t in tickets]
+
+    def _create_packed_classification_prompt(self, tickets: List[Dict]) -> str:
+        """Create a single prompt that classifies several tickets at once."""
+        return self.prompt_template.render_packed(tickets)
+
+    def classify_packed(self, tickets: List[Dict], caller: str = INTERACTIVE) -> List[Dict]:
+        """Classify several tickets with one LLM call, falling back per ticket on gaps.
+
+        Tickets the distilled model is confident about are not sent to the LLM.
+        """
+        results: List[Optional[Dict]] = [
+            self.classify_with_distilled(ticket['subject'], ticket['body']) for ticket in tickets
+        ]
+        pending = [i for i, result in enumerate(results) if result is None]
+
+        if pending and self.config.USE_COHERE and self.cohere_client and not self._llm_enabled(caller):
+            for i in pending:
+                results[i] = self._degraded_classification(tickets[i]['subject'], tickets[i]['body'], caller)
+        elif pending and self.config.USE_COHERE and self.cohere_client:
+            packed_tickets = [tickets[i] for i in pending]
+            try:
+                with METRICS.timer('prompt_build', component='classifier'):
+                    prompt = self._create_packed_classification_prompt(packed_tickets)
+                response = self._classification_chat(prompt, len(packed_tickets), caller)
+
+                answers = self._parse_answers(response.text, len(packed_tickets))
+                for i, item in zip(pending, self._complete_classifications(packed_tickets, answers, caller)):
+                    results[i] = item
+            except (CircuitOpenError, BudgetExceededError):
+                pass  # Outage detected or budget spent: keyword fallback for the whole batch
+            except Exception as e:
+                print(f"Error with packed Cohere classification: {e}")
+                METRICS.increment('llm_errors', component='classifier')
+
+        return [
+            result or self._fallback_classification(ticket['subject'], ticket['body'])
+            for ticket, result in zip(tickets, results)
+        ]
@@ -0,0 +1,271 @@
+"""
+Headless HTTP API for ticket classification and RAG answers.
+
+Endpoints (JSON in, JSON out):
+    POST /classify        {"subject": "...", "body": "..."}
+    POST /classify/batch  {"tickets": [{"subject": "...", "body": "..."}, ...]}
+    POST /answer          {"query": "..."}
+    POST /profile         {"requests": 5}  (profile the next micro-batches; 0 stops)
+    GET  /metrics                      (JSON; ?format=prometheus for text exposition)
+    GET  /health
+
+Concurrent requests are micro-batched: classifications arriving within a few
+milliseconds share one packed LLM call, and answer queries share one embedding
+forward pass and vector query.
+
+Usage:
+    python api_server.py --port 8000
+    python api_server.py --stub          # stub LLM client, no API key needed
+    python api_server.py --stub --no-rag # classification only, skips embedding model
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+from urllib.parse import parse_qs, urlparse
+
+from budget import LLM_BUDGET
+from circuit_breaker import COHERE_BREAKER
+from config import Config
+from llm_scheduler import tier_report
+from metrics import METRICS
+from micro_batcher import MicroBatcher
+from profiling import PROFILER
+
+
+class BadRequest(Exception):
+    """The request itself is invalid (HTTP 400)."""
+
+
+class NotFound(Exception):
+    """The requested endpoint or feature is not available (HTTP 404)."""
+
+
+class CopilotAPI:
+    def __init__(self, classifier, rag_system=None, max_batch_size: int = None,
+                 batch_window_ms: float = None):
+        self.config = Config()
+        self.classifier = classifier
+        self.rag_system = rag_system
+        max_batch_size = max_batch_size or self.config.API_MAX_BATCH_SIZE
+        batch_window_ms = batch_window_ms if batch_window_ms is not None else self.config.API_BATCH_WINDOW_MS
+
+        # Profiled on the batcher threads, where the work runs, while PROFILER is armed
+        self.classify_batcher = MicroBatcher(
+            PROFILER.wrap('classify', classifier.classify_packed), max_batch_size, batch_window_ms,
+            name="classify-batcher"
+        )
+        self.answer_batcher = None
+        if rag_system is not None:
+            self.answer_batcher = MicroBatcher(
+                PROFILER.wrap('answer', rag_system.generate_rag_responses), max_batch_size, batch_window_ms,
+                name="answer-batcher"
+            )
+
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self._requests: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._latency_totals: Dict[str, float] = {}
+
+    def _record(self, endpoint: str, elapsed: float, error: bool = False):
+        with self._lock:
+            self._requests[endpoint] = self._requests.get(endpoint, 0) + 1
+            self._latency_totals[endpoint] = self._latency_totals.get(endpoint, 0.0) + elapsed
+            if error:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+
+    @staticmethod
+    def _validate_ticket(ticket) -> Dict:
+        if not isinstance(ticket, dict) or not ticket.get('subject') or not ticket.get('body'):
+            raise BadRequest("each ticket needs non-empty 'subject' and 'body'")
+        return ticket
+
+    def classify(self, payload: Dict) -> Dict:
+        ticket = self._validate_ticket(payload)
+        return self.classify_batcher.submit(ticket).result()
+
+    def classify_batch(self, payload: Dict) -> Dict:
+        if not isinstance(payload, dict):
+            raise BadRequest("request body must be a JSON object")
+        tickets = payload.get('tickets')
+        if not isinstance(tickets, list) or not tickets:
+            raise BadRequest("'tickets' must be a non-empty list")
+        futures = [self.classify_batcher.submit(self._validate_ticket(t)) for t in tickets]
+        return {'results': [{**t, **f.result()} for t, f in zip(tickets, futures)]}
+
+    def answer(self, payload: Dict) -> Dict:
+        if self.answer_batcher is None:
+            raise NotFound("RAG answers are disabled on this server")
+        if not isinstance(payload, dict):
+            raise BadRequest("request body must be a JSON object")
+        query = payload.get('query')
+        if not query:
+            raise BadRequest("'query' is required")
+        return self.answer_batcher.submit(query).result()
+
+    def profile(self, payload: Dict) -> Dict:
+        if not isinstance(payload, dict):
+            raise BadRequest("request body must be a JSON object")
+        requests = payload.get('requests')
+        if not isinstance(requests, int) or requests < 0:
+            raise BadRequest("'requests' must be a non-negative integer")
+        PROFILER.arm(requests)
+        return PROFILER.status()
+
+    def metrics(self) -> Dict:
+        llm_client = self.classifier.cohere_client
+        with self._lock:
+            endpoints = {
+                name: {
+                    'requests': count,
+                    'errors': self._errors.get(name, 0),
+                    'avg_latency_ms': 1000 * self._latency_totals[name] / count
+                }
+                for name, count in self._requests.items()
+            }
+        return {
+            'uptime_seconds': time.time() - self._started_at,
+            'endpoints': endpoints,
+            'stages': METRICS.snapshot(),
+            'circuit': COHERE_BREAKER.snapshot(),
+            'budget': LLM_BUDGET.snapshot(),
+            'llm_pool': llm_client.snapshot() if hasattr(llm_client, 'snapshot') else None,
+            'time_to_classify': tier_report('classify'),
+            'profiler': PROFILER.status(),
+            'batchers': {
+                'classify': self.classify_batcher.stats(),
+                'answer': self.answer_batcher.stats() if self.answer_batcher else None
+            }
+        }
+
+
+def make_handler(api: CopilotAPI):
+    routes = {
+        '/classify': api.classify,
+        '/classify/batch': api.classify_batch,
+        '/answer': api.answer,
+        '/profile': api.profile
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, body: Dict):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_text(self, status: int, text: str):
+            data = text.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/metrics':
+                if parse_qs(url.query).get('format') == ['prometheus']:
+                    self._send_text(200, METRICS.to_prometheus())
+                else:
+                    self._send_json(200, api.metrics())
+            elif url.path == '/health':
+                self._send_json(200, {'status': 'ok'})
+            else:
+                self._send_json(404, {'error': f"unknown path {self.path}"})
+
+        def do_POST(self):
+            handler = routes.get(self.path)
+            if handler is None:
+                self._send_json(404, {'error': f"unknown path {self.path}"})
+                return
+
+            start = time.perf_counter()
+            try:
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    payload = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError as e:  # bad Content-Length, invalid JSON or UTF-8
+                    raise BadRequest(f"invalid JSON body: {e}") from e
+                result = handler(payload)
+                status = 200
+            except BadRequest as e:
+                # Only request validation maps to 400; errors raised while serving are 500s
+                result, status = {'error': str(e)}, 400
+            except NotFound as e:
+                result, status = {'error': str(e)}, 404
+            except Exception as e:
+                print(f"Error handling {self.path}: {e}")
+                result, status = {'error': "internal error"}, 500
+
+            elapsed = time.perf_counter() - start
+            api._record(self.path, elapsed, error=status >= 500)
+            METRICS.observe('http_request', elapsed, endpoint=self.path)
+            self._send_json(status, result)
+
+        def log_message(self, format, *args):
+            # Keep stdout quiet under load; metrics cover request accounting
+            pass
+
+    return Handler
+
+
+def create_server(api: CopilotAPI, host: str = "127.0.0.1", port: int = 8000) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(api))
+    server.daemon_threads = True
+    return server
+
+
+def build_api(stub: bool = False, with_rag: bool = True, llm_client=None) -> CopilotAPI:
+    """Construct classifier/RAG systems (optionally with a stub LLM) behind the API."""
+    from ai_classifier import TicketClassifier
+
+    if llm_client is None and stub:
+        from stub_llm import StubCohereClient
+        llm_client = StubCohereClient()
+
+    classifier = TicketClassifier(cohere_client=llm_client)
+    if stub:
+        # Stub clients have no quota to protect
+        classifier.min_delay_between_calls = 0
+
+    rag_system = None
+    if with_rag:
+        import sqlite_fix  # noqa: F401  (must precede chromadb)
+        from rag_system import RAGSystem
+        rag_system = RAGSystem(cohere_client=llm_client)
+        if stub:
+            rag_system.min_delay_between_calls = 0
+        rag_system.populate_knowledge_base()
+
+    return CopilotAPI(classifier, rag_system)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Customer Support Copilot HTTP API")
+    parser.add_argument('--host', default=Config.API_HOST)
+    parser.add_argument('--port', type=int, default=Config.API_PORT)
+    parser.add_argument('--stub', action='store_true', help="use the stub LLM client (no API calls)")
+    parser.add_argument('--no-rag', action='store_true', help="disable /answer (skips loading the embedding model)")
+    args = parser.parse_args()
+
+    api = build_api(stub=args.stub, with_rag=not args.no_rag)
+    server = create_server(api, args.host, args.port)
+    print(f"Copilot API listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
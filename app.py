@@ -3,12 +3,23 @@ import sqlite_fix
 
 import streamlit as st
 import pandas as pd
+import contextlib
+import functools
 import json
 import plotly.express as px
 import plotly.graph_objects as go
 from ai_classifier import TicketClassifier
 from rag_system import RAGSystem
+from result_store import ResultStore, compute_dataset_version
+from job_queue import ClassificationJobQueue
 from config import Config
+from dedup import TicketDeduplicator
+from ingestion import INBOX_VERSION, InboxIngestor, IngestorLockedError
+from budget import BULK, LLM_BUDGET
+from circuit_breaker import COHERE_BREAKER
+from llm_scheduler import tier_report
+from metrics import METRICS
+from profiling import PROFILER
 import time
 
 # Page configuration
@@ -65,6 +76,30 @@ def initialize_systems():
     rag_system.populate_knowledge_base()
     return classifier, rag_system
 
+@st.cache_resource
+def get_result_store():
+    """Process-wide classification results shared by every session."""
+    return ResultStore(Config.RESULT_STORE_DIR or None)
+
+@st.cache_resource
+def get_job_queue():
+    """Process-wide background classification worker, independent of script reruns."""
+    classifier, _ = initialize_systems()
+    return ClassificationJobQueue(
+        functools.partial(classifier.classify_ticket, caller=BULK),
+        get_result_store(),
+        max_workers=Config.JOB_WORKERS,
+        job_dir=Config.JOB_DIR or None,
+        estimate_fn=classifier._keyword_classification,
+        deduplicator=TicketDeduplicator() if Config.DEDUP_ENABLED else None
+    )
+
+@st.cache_resource
+def get_ingestor():
+    """Process-wide inbox tailer feeding new tickets into the shared result store."""
+    classifier, _ = initialize_systems()
+    return InboxIngestor(classifier, get_result_store(), Config.INBOX_PATH).start()
+
 @st.cache_data
 def load_sample_tickets():
     """Load sample tickets with caching."""
@@ -75,83 +110,92 @@ def load_sample_tickets():
         st.error("Sample tickets file not found. Please ensure sample_tickets.json exists.")
         return []
 
-def display_classification_metrics(classified_tickets):
-    """Display classification metrics and charts."""
-    if not classified_tickets:
-        return
+@st.cache_data(max_entries=32)
+def build_dashboard_figures(dataset_version, aggregate_version, _snapshot):
+    """Build dashboard charts once per aggregate version (the snapshot itself is not hashed)."""
+    # Priority distribution
+    priority_counts = sorted(_snapshot['priority'].items(), key=lambda kv: kv[1], reverse=True)
+    fig_priority = px.pie(
+        values=[count for _, count in priority_counts],
+        names=[label for label, _ in priority_counts],
+        title="Priority Distribution",
+        color_discrete_map={
+            'P0 (High)': '#ef4444',
+            'P1 (Medium)': '#f97316',
+            'P2 (Low)': '#22c55e'
+        }
+    )
     
-    df = pd.DataFrame(classified_tickets)
+    # Sentiment distribution
+    sentiment_counts = sorted(_snapshot['sentiment'].items(), key=lambda kv: kv[1], reverse=True)
+    fig_sentiment = px.bar(
+        x=[label for label, _ in sentiment_counts],
+        y=[count for _, count in sentiment_counts],
+        title="Sentiment Distribution",
+        color=[count for _, count in sentiment_counts],
+        color_continuous_scale="RdYlBu_r"
+    )
+    fig_sentiment.update_layout(showlegend=False)
+    
+    # Topic tags analysis
+    tag_counts = sorted(_snapshot['topics'].items(), key=lambda kv: kv[1], reverse=True)
+    fig_topics = px.bar(
+        x=[count for _, count in tag_counts],
+        y=[label for label, _ in tag_counts],
+        orientation='h',
+        title="Topic Distribution",
+        color=[count for _, count in tag_counts],
+        color_continuous_scale="viridis"
+    )
+    fig_topics.update_layout(height=400, showlegend=False)
+    
+    return fig_priority, fig_sentiment, fig_topics
+
+def display_classification_metrics(dataset_version, aggregates):
+    """Display classification metrics and charts from incrementally maintained aggregates."""
+    snapshot = aggregates.snapshot()
+    if not snapshot['total']:
+        return
     
     # Metrics row
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Total Tickets", len(df))
+        st.metric("Total Tickets", snapshot['total'])
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
-        high_priority = len(df[df['priority'] == 'P0 (High)'])
+        high_priority = snapshot['priority'].get('P0 (High)', 0)
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
         st.metric("High Priority", high_priority)
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col3:
-        frustrated_count = len(df[df['sentiment'] == 'Frustrated'])
+        frustrated_count = snapshot['sentiment'].get('Frustrated', 0)
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
         st.metric("Frustrated Users", frustrated_count)
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col4:
-        unique_topics = len(set([tag for tags in df['topic_tags'] for tag in tags]))
+        unique_topics = len(snapshot['topics'])
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
         st.metric("Unique Topics", unique_topics)
         st.markdown('</div>', unsafe_allow_html=True)
     
+    fig_priority, fig_sentiment, fig_topics = build_dashboard_figures(
+        dataset_version, snapshot['version'], snapshot
+    )
+    
     # Charts
     col1, col2 = st.columns(2)
     
     with col1:
-        # Priority distribution
-        priority_counts = df['priority'].value_counts()
-        fig_priority = px.pie(
-            values=priority_counts.values,
-            names=priority_counts.index,
-            title="Priority Distribution",
-            color_discrete_map={
-                'P0 (High)': '#ef4444',
-                'P1 (Medium)': '#f97316',
-                'P2 (Low)': '#22c55e'
-            }
-        )
         st.plotly_chart(fig_priority, use_container_width=True)
     
     with col2:
-        # Sentiment distribution
-        sentiment_counts = df['sentiment'].value_counts()
-        fig_sentiment = px.bar(
-            x=sentiment_counts.index,
-            y=sentiment_counts.values,
-            title="Sentiment Distribution",
-            color=sentiment_counts.values,
-            color_continuous_scale="RdYlBu_r"
-        )
-        fig_sentiment.update_layout(showlegend=False)
         st.plotly_chart(fig_sentiment, use_container_width=True)
     
-    # Topic tags analysis
-    all_tags = [tag for tags in df['topic_tags'] for tag in tags]
-    tag_counts = pd.Series(all_tags).value_counts()
-    
-    fig_topics = px.bar(
-        x=tag_counts.values,
-        y=tag_counts.index,
-        orientation='h',
-        title="Topic Distribution",
-        color=tag_counts.values,
-        color_continuous_scale="viridis"
-    )
-    fig_topics.update_layout(height=400, showlegend=False)
     st.plotly_chart(fig_topics, use_container_width=True)
 
 def display_ticket_details(ticket):
@@ -199,10 +243,202 @@ def display_ticket_details(ticket):
     if 'reasoning' in ticket and ticket['reasoning']:
         st.write(f"**AI Pipeline Reasoning:** {ticket['reasoning']}")
     
+    if ticket.get('duplicate_of'):
+        st.caption(f"🔁 Labels propagated from near-duplicate {ticket['duplicate_of']} "
+                   f"(similarity {ticket.get('duplicate_similarity', 0):.2f})")
+    
     st.markdown('</div>', unsafe_allow_html=True)
     st.markdown("---")
 
+def display_metrics_panel(llm_client=None):
+    """Sidebar panel with per-stage latency percentiles and counters."""
+    with st.sidebar.expander("📈 Performance Metrics"):
+        snapshot = METRICS.snapshot()
+        
+        circuit = COHERE_BREAKER.snapshot()
+        if circuit['state'] != 'closed':
+            st.warning(f"Cohere circuit is {circuit['state']}: using fallback classification and answers")
+        else:
+            st.caption("Cohere circuit: closed")
+        
+        budget = LLM_BUDGET.snapshot()
+        if budget['enabled']:
+            st.write(f"**LLM budget** (resets in {budget['window_resets_in_s'] // 60} min):")
+            st.dataframe(pd.DataFrame([
+                {'caller': caller, 'calls': usage['calls'], 'tokens': usage['tokens']}
+                for caller, usage in budget['usage'].items()
+            ]), hide_index=True, use_container_width=True)
+            if budget['bulk_degraded']:
+                st.warning("LLM budget is low: bulk classification is using local models only")
+        
+        if hasattr(llm_client, 'snapshot'):
+            st.write("**LLM backends:**")
+            st.dataframe(pd.DataFrame(llm_client.snapshot()), hide_index=True, use_container_width=True)
+        
+        if snapshot['histograms']:
+            st.write("**Stage latency (ms):**")
+            st.dataframe(pd.DataFrame([
+                {
+                    'stage': h['name'],
+                    'component': h['labels'].get('component', ''),
+                    'count': h['count'],
+                    'p50': round(h['p50'] * 1000, 1),
+                    'p95': round(h['p95'] * 1000, 1),
+                    'p99': round(h['p99'] * 1000, 1)
+                }
+                for h in snapshot['histograms']
+            ]), hide_index=True, use_container_width=True)
+        else:
+            st.write("No timings recorded yet.")
+        
+        time_to_classify = tier_report('classify')
+        if time_to_classify:
+            st.write("**Time to classify by priority tier (s):**")
+            st.dataframe(pd.DataFrame(time_to_classify), hide_index=True, use_container_width=True)
+        
+        if snapshot['counters']:
+            st.write("**Counters:**")
+            for counter in snapshot['counters']:
+                labels = ", ".join(f"{k}={v}" for k, v in counter['labels'].items())
+                st.write(f"• {counter['name']} ({labels}): {int(counter['value'])}")
+        
+        st.download_button("⬇️ Prometheus", METRICS.to_prometheus(), file_name="metrics.prom", mime="text/plain")
+        st.download_button("⬇️ JSON", METRICS.to_json(), file_name="metrics.json", mime="application/json")
+
+def display_profiling_panel():
+    """Sidebar panel that profiles the next agent requests with cProfile and tracemalloc."""
+    with st.sidebar.expander("🔬 Profiling"):
+        requests = st.number_input("Requests to profile", min_value=1, max_value=50, value=5, step=1)
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("▶️ Profile"):
+                PROFILER.arm(requests)
+        with col2:
+            if st.button("⏹️ Stop"):
+                PROFILER.arm(0)
+        
+        if PROFILER.remaining:
+            st.info(f"Profiling the next {PROFILER.remaining} request(s)")
+        
+        captures = PROFILER.captures()
+        if captures:
+            st.dataframe(pd.DataFrame([
+                {'request': c['name'], 'ms': c['elapsed_ms'], 'peak MB': c['peak_mb'], 'profile': c['profile']}
+                for c in captures
+            ]), hide_index=True, use_container_width=True)
+            try:
+                with open(captures[0]['report'], 'r') as f:
+                    report = f.read()
+            except OSError:
+                report = None  # deleted or moved since the capture
+            if report is not None:
+                st.download_button("⬇️ Latest report", report, file_name="profile.txt", mime="text/plain")
+            else:
+                st.caption(f"Latest report is no longer at {captures[0]['report']}")
+        st.caption(f"Profiles are saved to {PROFILER.output_dir}")
+
+def display_classified_results(result_store, dataset_version):
+    """Render dashboard metrics and the filtered, paginated ticket list for a stored version."""
+    config = Config()
+    
+    classified_tickets = result_store.get(dataset_version)
+    if classified_tickets is not None:
+        
+        st.success(f"✅ Classified {len(classified_tickets)} tickets successfully!")
+        
+        # Display metrics and charts
+        display_classification_metrics(dataset_version, result_store.get_aggregates(dataset_version))
+        
+        # Detailed ticket view
+        st.subheader("📋 Detailed Ticket Classifications")
+        
+        # Filter options
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            priority_filter = st.selectbox(
+                "Filter by Priority",
+                ["All"] + config.PRIORITY_LABELS
+            )
+        
+        with col2:
+            sentiment_filter = st.selectbox(
+                "Filter by Sentiment",
+                ["All"] + config.SENTIMENT_LABELS
+            )
+        
+        with col3:
+            topic_filter = st.selectbox(
+                "Filter by Topic",
+                ["All"] + config.TOPIC_TAGS
+            )
+        
+        # Apply filters using the precomputed inverted indexes
+        ticket_index = result_store.get_index(dataset_version)
+        filtered_positions = ticket_index.filter(
+            priority=None if priority_filter == "All" else priority_filter,
+            sentiment=None if sentiment_filter == "All" else sentiment_filter,
+            topic=None if topic_filter == "All" else topic_filter
+        )
+        total_filtered = len(filtered_positions)
+        
+        # Pagination: only the current page is materialized and rendered
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            page_size = st.selectbox("Tickets per page", [10, 25, 50], index=0)
+        total_pages = max((total_filtered + page_size - 1) // page_size, 1)
+        with col2:
+            # Keyed on the filters so the page resets when the result set changes
+            page = st.number_input(
+                "Page", min_value=1, max_value=total_pages, value=1, step=1,
+                key=f"page_{priority_filter}_{sentiment_filter}_{topic_filter}_{page_size}"
+            )
+        page = min(int(page), total_pages)
+        
+        first = (page - 1) * page_size + 1 if total_filtered else 0
+        last = min(page * page_size, total_filtered)
+        st.write(f"Showing {first}-{last} of {total_filtered} tickets (page {page}/{total_pages})")
+        
+        # Display tickets on the current page
+        for ticket in ticket_index.page(filtered_positions, page, page_size):
+            display_ticket_details(ticket)
+
+def display_live_inbox(result_store):
+    """Render tickets ingested from the inbox; returns whether to keep auto-refreshing."""
+    try:
+        ingestor = get_ingestor()
+    except IngestorLockedError as e:
+        # Only one ingestor may write a store's watermark; the CLI watcher already owns it
+        st.error(f"📥 Live inbox unavailable: {e}. Stop the other watcher, or point it at another RESULT_STORE_DIR.")
+        return False
+    status = ingestor.status()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Ingested", status['ingested'])
+    with col2:
+        st.metric("Duplicates skipped", status['duplicates'])
+    with col3:
+        st.metric("Malformed lines", status['malformed'])
+    with col4:
+        st.metric("Watcher", "Running" if status['running'] else "Stopped")
+    
+    st.caption(f"Watching `{status['source']}`")
+    if status['last_error']:
+        st.warning(f"Last ingestion error: {status['last_error']}")
+    
+    poll_inbox = st.checkbox("Auto-refresh inbox", value=True)
+    
+    if result_store.get(INBOX_VERSION) is None:
+        st.info("📭 No inbox tickets yet. New lines appended to the inbox will appear here.")
+    else:
+        display_classified_results(result_store, INBOX_VERSION)
+    return poll_inbox
+
 def main():
+    poll_job = False
+    poll_answer = False
+    poll_inbox = False
+    
     # Header
     st.markdown('<h1 class="main-header">🎧 Atlan Customer Support Copilot</h1>', unsafe_allow_html=True)
     
@@ -225,25 +461,58 @@ def main():
     if not config.COHERE_API_KEY:
         st.sidebar.error("❌ Cohere API Key missing - using fallback classification")
     
+    if hasattr(classifier.cohere_client, 'backends'):
+        st.sidebar.caption(f"LLM pool: {len(classifier.cohere_client.backends)} backend(s)")
+    
+    display_metrics_panel(classifier.cohere_client)
+    display_profiling_panel()
+    
     # Main tabs
     tab1, tab2 = st.tabs(["📊 Bulk Ticket Classification", "🤖 Interactive AI Agent"])
     
     with tab1:
         st.header("Bulk Ticket Classification Dashboard")
         
+        ticket_source = "Sample tickets"
+        if config.INBOX_PATH:
+            ticket_source = st.radio("Ticket source", ["Sample tickets", "Live inbox"], horizontal=True)
+        
         # Load and automatically classify tickets on app load
-        sample_tickets = load_sample_tickets()
+        sample_tickets = load_sample_tickets() if ticket_source == "Sample tickets" else []
         
-        if sample_tickets:
-            # Auto-classify tickets on first load
-            if 'classified_tickets' not in st.session_state:
-                with st.spinner("Ingesting and classifying tickets from sample_tickets file..."):
-                    classified_tickets = []
-                    for ticket in sample_tickets:
-                        classification = classifier.classify_ticket(ticket['subject'], ticket['body'])
-                        classified_ticket = {**ticket, **classification}
-                        classified_tickets.append(classified_ticket)
-                    st.session_state.classified_tickets = classified_tickets
+        if ticket_source == "Live inbox":
+            poll_inbox = display_live_inbox(get_result_store())
+        elif sample_tickets:
+            result_store = get_result_store()
+            job_queue = get_job_queue()
+            dataset_version = compute_dataset_version(sample_tickets)
+            
+            def classify_with_keywords():
+                classified_tickets = []
+                for ticket in sample_tickets:
+                    classification = classifier._fallback_classification(ticket['subject'], ticket['body'])
+                    classified_ticket = {**ticket, **classification}
+                    classified_tickets.append(classified_ticket)
+                return classified_tickets
+            
+            # On first load, seed the shared results instantly with keyword classification
+            # and upgrade them with AI in the background (once across all sessions)
+            seeded = []
+            
+            def seed_results():
+                seeded.append(True)
+                return classify_with_keywords()
+            
+            result_store.get_or_classify(dataset_version, seed_results)
+            if seeded:
+                job_queue.submit(dataset_version, sample_tickets)
+            elif (job_queue.has_partial(dataset_version) and not job_queue.was_cancelled(dataset_version)
+                  and job_queue.active_job(dataset_version) is None):
+                # Resume an AI run interrupted by a restart (not one the user cancelled)
+                job_queue.submit(dataset_version, sample_tickets)
+            
+            if result_store.is_refreshing(dataset_version):
+                st.info("🔄 A re-classification of this dataset is in progress; showing the latest stored results.")
             
             # Manual re-classification options
             with st.expander("🔄 Re-classify Options"):
@@ -251,81 +520,31 @@ def main():
                 
                 with col1:
                     if st.button("🔄 Re-classify with AI", type="primary"):
-                        progress_bar = st.progress(0)
-                        status_text = st.empty()
-                        
-                        def update_progress(current, total):
-                            progress = current / total
-                            progress_bar.progress(progress)
-                            status_text.text(f"Classifying ticket {current}/{total}...")
-                        
-                        with st.spinner("Re-classifying with AI..."):
-                            classified_tickets = classifier.classify_bulk_tickets(sample_tickets, update_progress)
-                            st.session_state.classified_tickets = classified_tickets
-                        
-                        progress_bar.empty()
-                        status_text.empty()
+                        job_queue.submit(dataset_version, sample_tickets, resume=False)
                 
                 with col2:
                     if st.button("⚡ Quick Re-classify", type="secondary"):
                         with st.spinner("Quick re-classification..."):
-                            classified_tickets = []
-                            for ticket in sample_tickets:
-                                classification = classifier._fallback_classification(ticket['subject'], ticket['body'])
-                                classified_ticket = {**ticket, **classification}
-                                classified_tickets.append(classified_ticket)
-                            st.session_state.classified_tickets = classified_tickets
+                            result_store.refresh(dataset_version, classify_with_keywords)
             
-            # Display results
-            if 'classified_tickets' in st.session_state:
-                classified_tickets = st.session_state.classified_tickets
-                
-                st.success(f"✅ Classified {len(classified_tickets)} tickets successfully!")
-                
-                # Display metrics and charts
-                display_classification_metrics(classified_tickets)
-                
-                # Detailed ticket view
-                st.subheader("📋 Detailed Ticket Classifications")
+            # Background job progress (polled; the job keeps running across reruns)
+            active_job = job_queue.active_job(dataset_version)
+            if active_job:
+                completed, total = active_job['completed'], active_job['total']
+                st.progress(completed / total if total else 0.0)
+                st.info(f"🤖 AI classification running in the background: {completed}/{total} tickets done. "
+                        "Results below update as each ticket completes.")
                 
-                # Filter options
                 col1, col2, col3 = st.columns(3)
-                
                 with col1:
-                    priority_filter = st.selectbox(
-                        "Filter by Priority",
-                        ["All"] + config.PRIORITY_LABELS
-                    )
-                
+                    st.button("🔄 Refresh progress")
                 with col2:
-                    sentiment_filter = st.selectbox(
-                        "Filter by Sentiment",
-                        ["All"] + config.SENTIMENT_LABELS
-                    )
-                
+                    if st.button("⏹️ Cancel job"):
+                        job_queue.cancel(active_job['id'])
                 with col3:
-                    topic_filter = st.selectbox(
-                        "Filter by Topic",
-                        ["All"] + config.TOPIC_TAGS
-                    )
-                
-                # Apply filters
-                filtered_tickets = classified_tickets.copy()
-                
-                if priority_filter != "All":
-                    filtered_tickets = [t for t in filtered_tickets if t['priority'] == priority_filter]
-                
-                if sentiment_filter != "All":
-                    filtered_tickets = [t for t in filtered_tickets if t['sentiment'] == sentiment_filter]
-                
-                if topic_filter != "All":
-                    filtered_tickets = [t for t in filtered_tickets if topic_filter in t['topic_tags']]
-                
-                st.write(f"Showing {len(filtered_tickets)} tickets")
-                
-                # Display filtered tickets
-                for ticket in filtered_tickets:
-                    display_ticket_details(ticket)
+                    poll_job = st.checkbox("Auto-refresh progress", value=False)
+            
+            display_classified_results(result_store, dataset_version)
         else:
             st.error("No sample tickets found. Please check the sample_tickets.json file.")
     
@@ -339,78 +558,114 @@ def main():
             body = st.text_area("Ticket Body", height=150, placeholder="Describe the issue or question...")
             submitted = st.form_submit_button("🚀 Analyze Ticket", type="primary")
         
-        if submitted and subject and body:
-            # Store the form data to prevent loss after submission
-            st.session_state.current_subject = subject
-            st.session_state.current_body = body
-            # Classification
-            with st.spinner("Analyzing ticket..."):
-                classification = classifier.classify_ticket(subject, body)
-            
-            st.subheader("🔍 Internal Analysis (Backend View)")
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown('<div class="classification-result">', unsafe_allow_html=True)
-                st.write("**Classification Results:**")
-                st.write(f"**Topics:** {', '.join(classification['topic_tags'])}")
-                st.write(f"**Sentiment:** {classification['sentiment']}")
-                st.write(f"**Priority:** {classification['priority']}")
-                if 'reasoning' in classification:
-                    st.write(f"**Reasoning:** {classification['reasoning']}")
-                st.markdown('</div>', unsafe_allow_html=True)
-            
-            with col2:
+        with contextlib.ExitStack() as request_profile:
+            if submitted and subject and body:
+                # While profiling is armed, the request is captured through to the end of its rendering
+                request_profile.enter_context(PROFILER.capture('agent_request'))
+                # Store the form data to prevent loss after submission
+                st.session_state.current_subject = subject
+                st.session_state.current_body = body
+                # Classification
+                with st.spinner("Analyzing ticket..."):
+                    classification = classifier.classify_ticket(subject, body)
+                
                 # Determine response type based on exact requirements
-                rag_topics = ["How-to", "Product", "Best practices", "API/SDK", "SSO"]
-                needs_rag = any(topic in classification['topic_tags'] for topic in rag_topics)
+                needs_rag = any(topic in classification['topic_tags'] for topic in config.RAG_TOPICS)
                 
+                rag_response = None
                 if needs_rag:
-                    st.write("**Response Type:** RAG-based answer")
-                    st.write("**Knowledge Base:** Atlan Documentation")
-                else:
-                    st.write("**Response Type:** Classification and routing")
-                    st.write("**Action:** Route to appropriate team")
-            
-            st.subheader("💬 Final Response (Frontend View)")
+                    # Quick extractive answer if the LLM can't answer within ANSWER_SLA_SECONDS
+                    with st.spinner("Generating response from knowledge base..."):
+                        query = f"{subject} {body}"
+                        rag_response = rag_system.generate_rag_response_with_deadline(query, classification=classification)
+                
+                st.session_state.agent_result = {
+                    'classification': classification,
+                    'needs_rag': needs_rag,
+                    'rag_response': rag_response
+                }
             
-            if needs_rag:
-                # Generate RAG response
-                with st.spinner("Generating response from knowledge base..."):
-                    query = f"{subject} {body}"
-                    rag_response = rag_system.generate_rag_response(query)
+            # Render the latest result on every rerun so a late LLM answer can replace the quick one
+            agent_result = st.session_state.get('agent_result')
+            if agent_result:
+                classification = agent_result['classification']
+                needs_rag = agent_result['needs_rag']
+                rag_response = agent_result['rag_response']
                 
-                st.markdown('<div class="rag-response">', unsafe_allow_html=True)
-                st.write("**AI Response:**")
-                st.write(rag_response['answer'])
+                if rag_response and rag_response.get('upgrade_pending'):
+                    upgraded = rag_system.get_answer_upgrade(rag_response['upgrade_id'])
+                    if upgraded:
+                        agent_result['rag_response'] = rag_response = upgraded
+                    elif not rag_system.has_pending_upgrade(rag_response['upgrade_id']):
+                        rag_response['upgrade_pending'] = False
+                    else:
+                        poll_answer = True
                 
-                if rag_response['sources']:
-                    st.write("**Sources (URLs used to create this answer):**")
-                    st.info("💡 **Note:** Due to Atlan's documentation structure, nested links may not work directly. Click the root link (https://docs.atlan.com) and navigate to the specific sections mentioned in the response.")
-                    for i, source in enumerate(rag_response['sources'], 1):
-                        st.markdown(f'<div class="source-link">{i}. 📖 <a href="{source}" target="_blank">{source}</a></div>', unsafe_allow_html=True)
+                st.subheader("🔍 Internal Analysis (Backend View)")
                 
-                st.write(f"**Confidence:** {rag_response['confidence']}")
-                st.markdown('</div>', unsafe_allow_html=True)
-            
-            else:
-                # Simple routing message
-                primary_topic = classification['topic_tags'][0] if classification['topic_tags'] else "General"
+                col1, col2 = st.columns(2)
                 
-                st.markdown('<div class="rag-response">', unsafe_allow_html=True)
-                st.write("**System Response:**")
-                st.write(f"This ticket has been classified as a '{primary_topic}' issue and routed to the appropriate team.")
-                st.write("Our specialists will review your request and respond within the standard SLA timeframe.")
+                with col1:
+                    st.markdown('<div class="classification-result">', unsafe_allow_html=True)
+                    st.write("**Classification Results:**")
+                    st.write(f"**Topics:** {', '.join(classification['topic_tags'])}")
+                    st.write(f"**Sentiment:** {classification['sentiment']}")
+                    st.write(f"**Priority:** {classification['priority']}")
+                    if 'reasoning' in classification:
+                        st.write(f"**Reasoning:** {classification['reasoning']}")
+                    st.markdown('</div>', unsafe_allow_html=True)
+                
+                with col2:
+                    if needs_rag:
+                        st.write("**Response Type:** RAG-based answer")
+                        st.write("**Knowledge Base:** Atlan Documentation")
+                    else:
+                        st.write("**Response Type:** Classification and routing")
+                        st.write("**Action:** Route to appropriate team")
                 
-                if classification['priority'] == 'P0 (High)':
-                    st.write("⚡ **High Priority:** This ticket has been escalated for immediate attention.")
+                st.subheader("💬 Final Response (Frontend View)")
                 
-                st.markdown('</div>', unsafe_allow_html=True)
+                if needs_rag:
+                    st.markdown('<div class="rag-response">', unsafe_allow_html=True)
+                    st.write("**AI Response:**")
+                    st.write(rag_response['answer'])
+                    if rag_response.get('upgrade_pending'):
+                        st.caption("⏳ Quick answer from the documentation; a fuller AI answer will replace it when ready.")
+                    if rag_response.get('faq_question'):
+                        st.caption(f"⚡ Pre-generated answer to the FAQ \"{rag_response['faq_question']}\" "
+                                   f"(similarity {rag_response['faq_similarity']:.2f})")
+                    
+                    if rag_response['sources']:
+                        st.write("**Sources (URLs used to create this answer):**")
+                        st.info("💡 **Note:** Due to Atlan's documentation structure, nested links may not work directly. Click the root link (https://docs.atlan.com) and navigate to the specific sections mentioned in the response.")
+                        for i, source in enumerate(rag_response['sources'], 1):
+                            st.markdown(f'<div class="source-link">{i}. 📖 <a href="{source}" target="_blank">{source}</a></div>', unsafe_allow_html=True)
+                    
+                    st.write(f"**Confidence:** {rag_response['confidence']}")
+                    st.markdown('</div>', unsafe_allow_html=True)
+                
+                else:
+                    # Simple routing message
+                    primary_topic = classification['topic_tags'][0] if classification['topic_tags'] else "General"
+                    
+                    st.markdown('<div class="rag-response">', unsafe_allow_html=True)
+                    st.write("**System Response:**")
+                    st.write(f"This ticket has been classified as a '{primary_topic}' issue and routed to the appropriate team.")
+                    st.write("Our specialists will review your request and respond within the standard SLA timeframe.")
+                    
+                    if classification['priority'] == 'P0 (High)':
+                        st.write("⚡ **High Priority:** This ticket has been escalated for immediate attention.")
+                    
+                    st.markdown('</div>', unsafe_allow_html=True)
     
     # Footer
     st.markdown("---")
     st.markdown("Built with ❤️ using Streamlit, Cohere, and ChromaDB")
+    
+    # Poll background job progress, pending answer upgrades and the inbox after the whole page has rendered
+    if poll_job or poll_answer or poll_inbox:
+        time.sleep(config.JOB_POLL_SECONDS)
+        st.rerun()
 
 if __name__ == "__main__":
     main()
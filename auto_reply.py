@@ -0,0 +1,199 @@
+"""
+Bulk auto-reply: classify, route, retrieve, generate and write replies for a ticket file.
+
+Each ticket goes through the stages of a Pipeline, each with its own workers
+and a bounded queue in front of it:
+
+    classify  packed LLM classification, PIPELINE_CLASSIFY_BATCH tickets per call
+    route     knowledge-base answer for RAG_TOPICS, otherwise a routing reply
+    retrieve  FAQ match or document retrieval, one embedding pass per batch
+    generate  LLM answer from the retrieved documents (PIPELINE_GENERATE_WORKERS calls in flight)
+    write     appends one JSON line per ticket to the output file
+
+LLM work is charged to the bulk budget class, so a running batch degrades to
+local answers before it takes capacity from the dashboard. Replies are
+streamed to the output as they finish; tickets whose id is already in the
+output are skipped, so an interrupted run resumes where it stopped.
+
+    python auto_reply.py --input sample_tickets.json --output replies.jsonl
+    python auto_reply.py --input tickets.jsonl --output replies.jsonl --stub --generate-workers 8
+"""
+
+import argparse
+import json
+import os
+import threading
+from typing import Dict, Iterator, List, Set
+
+from budget import BULK
+from config import Config
+from pipeline import Pipeline, Stage
+
+
+def load_tickets(path: str) -> List[Dict]:
+    """Tickets from a JSON list or a JSONL file."""
+    with open(path, 'r') as f:
+        if path.endswith('.jsonl'):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids of tickets already answered in an output file (failed tickets are tried again)."""
+    ids = set()
+    if not os.path.exists(path):
+        return ids
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # partial last line of an interrupted run
+            if isinstance(record, dict) and 'id' in record and 'pipeline_error' not in record:
+                ids.add(record['id'])
+    return ids
+
+
+def routing_reply(classification: Dict) -> str:
+    primary_topic = classification['topic_tags'][0] if classification['topic_tags'] else "General"
+    reply = (f"This ticket has been classified as a '{primary_topic}' issue and routed to the appropriate team. "
+             "Our specialists will review your request and respond within the standard SLA timeframe.")
+    if classification['priority'] == 'P0 (High)':
+        reply += " This ticket has been escalated for immediate attention."
+    return reply
+
+
+class AutoReplyPipeline:
+    def __init__(self, classifier, rag_system, output_path: str, config: Config = None, **tuning):
+        self.classifier = classifier
+        self.rag_system = rag_system
+        self.output_path = output_path
+        self.config = config or Config()
+        self._write_lock = threading.Lock()
+
+        def setting(name: str) -> int:
+            value = tuning.get(name)
+            return value if value is not None else getattr(self.config, f"PIPELINE_{name.upper()}")
+
+        queue_size = setting('queue_size')
+        self.pipeline = Pipeline([
+            Stage('classify', self._classify, setting('classify_workers'), setting('classify_batch'), queue_size),
+            Stage('route', self._route, 1, 64, queue_size),
+            Stage('retrieve', self._retrieve, setting('retrieve_workers'), setting('retrieve_batch'), queue_size),
+            Stage('generate', self._generate, setting('generate_workers'), 1, queue_size),
+            Stage('write', self._write, 1, 64, queue_size),
+        ])
+
+    def _classify(self, items: List[Dict]) -> List[Dict]:
+        classifications = self.classifier.classify_packed([item['ticket'] for item in items], caller=BULK)
+        for item, classification in zip(items, classifications):
+            item['classification'] = classification
+        return items
+
+    def _route(self, items: List[Dict]) -> List[Dict]:
+        for item in items:
+            classification = item['classification']
+            item['needs_rag'] = any(topic in classification['topic_tags'] for topic in self.config.RAG_TOPICS)
+            if not item['needs_rag']:
+                item['reply'] = routing_reply(classification)
+        return items
+
+    def _retrieve(self, items: List[Dict]) -> List[Dict]:
+        rag_items = [item for item in items if item['needs_rag']]
+        if rag_items:
+            queries = [f"{item['ticket']['subject']} {item['ticket']['body']}" for item in rag_items]
+            for item, query, prepared in zip(rag_items, queries, self.rag_system.retrieve_for_answers(queries)):
+                item['_query'] = query
+                item['_prepared'] = prepared
+        return items
+
+    def _generate(self, items: List[Dict]) -> List[Dict]:
+        for item in items:
+            prepared = item.pop('_prepared', None)
+            if prepared is None:
+                continue
+            query = item.pop('_query')
+            response = prepared['response'] or self.rag_system._build_rag_response(query, prepared['docs'], BULK)
+            item['reply'] = response['answer']
+            item['sources'] = response['sources']
+            item['confidence'] = response['confidence']
+        return items
+
+    def _write(self, items: List[Dict]) -> List[Dict]:
+        with self._write_lock, open(self.output_path, 'a') as f:
+            for item in items:
+                record = {'id': item['id'], 'subject': item['ticket']['subject']}
+                record.update({key: value for key, value in item.items()
+                               if key not in ('id', 'ticket') and not key.startswith('_')})
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+        return items
+
+    def _items(self, tickets: List[Dict], skip: Set[str]) -> Iterator[Dict]:
+        for i, ticket in enumerate(tickets):
+            ticket_id = str(ticket.get('id', f"ticket-{i}"))
+            if ticket_id not in skip:
+                yield {'id': ticket_id, 'ticket': ticket}
+
+    def run(self, tickets: List[Dict], progress=None, progress_interval: float = 2.0) -> Dict:
+        skip = completed_ids(self.output_path)
+        stats = self.pipeline.run(self._items(tickets, skip), progress, progress_interval)
+        stats['skipped'] = len(skip)
+        return stats
+
+
+def format_stats(stats: Dict) -> str:
+    lines = [f"{'stage':<10} {'workers':>7} {'in':>6} {'out':>6} {'errors':>6} {'items/s':>8} "
+             f"{'busy %':>7} {'queue':>6} {'max q':>6}"]
+    for stage in stats['stages']:
+        lines.append(
+            f"{stage['name']:<10} {stage['workers']:>7} {stage['items_in']:>6} {stage['items_out']:>6} "
+            f"{stage['errors']:>6} {stage['items_per_second']:>8.2f} {stage['busy_percent']:>7.1f} "
+            f"{stage['queue_depth']:>6} {stage['max_queue_depth']:>6}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify and answer a file of tickets through a staged pipeline")
+    parser.add_argument('--input', default='sample_tickets.json', help=".json list or .jsonl file of tickets")
+    parser.add_argument('--output', default='replies.jsonl', help="JSONL file replies are appended to")
+    parser.add_argument('--stub', action='store_true', help="use the stub LLM client (no API key or quota)")
+    parser.add_argument('--classify-workers', type=int)
+    parser.add_argument('--classify-batch', type=int)
+    parser.add_argument('--retrieve-workers', type=int)
+    parser.add_argument('--retrieve-batch', type=int)
+    parser.add_argument('--generate-workers', type=int)
+    parser.add_argument('--queue-size', type=int)
+    args = parser.parse_args()
+
+    import sqlite_fix  # noqa: F401  (must precede chromadb)
+    from ai_classifier import TicketClassifier
+    from rag_system import RAGSystem
+
+    if args.stub:
+        from stub_llm import StubCohereClient
+        client = StubCohereClient()
+        classifier = TicketClassifier(cohere_client=client)
+        rag_system = RAGSystem(cohere_client=client)
+        classifier.min_delay_between_calls = rag_system.min_delay_between_calls = 0
+    else:
+        classifier = TicketClassifier()
+        rag_system = RAGSystem()
+    rag_system.populate_knowledge_base()
+
+    tickets = load_tickets(args.input)
+    auto_reply = AutoReplyPipeline(
+        classifier, rag_system, args.output,
+        classify_workers=args.classify_workers, classify_batch=args.classify_batch,
+        retrieve_workers=args.retrieve_workers, retrieve_batch=args.retrieve_batch,
+        generate_workers=args.generate_workers, queue_size=args.queue_size
+    )
+    print(f"Answering {len(tickets)} tickets from {args.input} into {args.output}")
+    stats = auto_reply.run(tickets, progress=lambda s: print(format_stats(s) + "\n"))
+    print(f"Done in {stats['elapsed_seconds']:.1f}s ({stats['skipped']} tickets already answered)")
+    print(format_stats(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Offline throughput/latency benchmark for the classifier and RAG paths.
+
+Runs TicketClassifier and RAGSystem against StubCohereClient, which injects
+configurable latency, server errors, 429s and malformed JSON, over synthetic
+tickets derived from sample_tickets.json. No API quota is used.
+
+Reports tickets/sec, p50/p95/p99 latency and LLM calls per ticket for each
+scenario, and can save or compare against a baseline file:
+
+    python benchmark.py --tickets 200 --latency-ms 50
+    python benchmark.py --save-baseline benchmarks/baseline.json
+    python benchmark.py --compare benchmarks/baseline.json --tolerance 0.15
+    python benchmark.py --rag    # also benchmark generate_rag_response (loads the embedding model)
+    python benchmark.py --rag --faq    # ... answering from a freshly built FAQ index where possible
+    python benchmark.py --prompt-template v2    # token use of the compact prompt
+    python benchmark.py --pool-size 3 --per-key-rpm 600    # throughput of a pool of rate-limited keys
+    python benchmark.py --tickets 20000 --memory    # result-store memory only, ticket dicts vs columnar
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from ai_classifier import TicketClassifier
+from budget import LLM_BUDGET
+from circuit_breaker import COHERE_BREAKER
+from columnar_store import ColumnarTickets
+from config import Config
+from llm_pool import LLMBackend, LLMPool
+from metrics import METRICS
+from stub_llm import StubCohereClient
+
+_NOISE_PHRASES = [
+    "Any help appreciated.", "This is for our production workspace.", "Thanks in advance!",
+    "We noticed this after the last release.", "Our team lead asked me to follow up.",
+    "Please advise.", "It worked fine last week."
+]
+
+
+def make_synthetic_tickets(count: int, source_path: str = 'sample_tickets.json', seed: int = 7) -> List[Dict]:
+    """Generate varied tickets by recombining the sample tickets with filler sentences."""
+    with open(source_path, 'r') as f:
+        base = json.load(f)
+
+    rng = random.Random(seed)
+    tickets = []
+    for i in range(count):
+        ticket = base[i % len(base)]
+        extra = " ".join(rng.sample(_NOISE_PHRASES, k=rng.randint(0, 2)))
+        tickets.append({
+            'id': f"SYN-{i:05d}",
+            'subject': ticket['subject'],
+            'body': f"{ticket['body']} {extra}".strip()
+        })
+    return tickets
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def _summarize(name: str, tickets: int, elapsed: float, latencies: List[float],
+               client: StubCohereClient, fallbacks: float) -> Dict:
+    return {
+        'scenario': name,
+        'tickets': tickets,
+        'elapsed_s': round(elapsed, 4),
+        'tickets_per_sec': round(tickets / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 2),
+        'llm_calls_per_ticket': round(client.calls / tickets, 3) if tickets else 0.0,
+        'prompt_tokens_per_ticket': round(_counter_total('prompt_tokens') / tickets, 1) if tickets else 0.0,
+        'completion_tokens_per_ticket': round(_counter_total('completion_tokens') / tickets, 1) if tickets else 0.0,
+        'fallbacks': int(fallbacks),
+        'parse_failures': int(_counter_total('parse_failures')),
+        'repair_asks': int(_counter_total('repair_asks')),
+        'llm_errors': client.errors,
+        'rate_limited': client.rate_limited,
+        'malformed': client.malformed
+    }
+
+
+def _counter_total(*names: str) -> float:
+    return sum(c['value'] for c in METRICS.snapshot()['counters'] if c['name'] in names)
+
+
+def _fallback_count() -> float:
+    return _counter_total('fallback_classifications', 'fallback_answers')
+
+
+def _run_scenario(name: str, tickets: List[Dict], client: StubCohereClient,
+                  run: Callable[[List[float]], None], llm_client=None) -> Dict:
+    client.reset_stats()
+    if isinstance(llm_client, LLMPool):
+        llm_client.reset()
+    METRICS.reset()
+    COHERE_BREAKER.reset()  # an open circuit must not leak between scenarios
+    LLM_BUDGET.reset()
+    latencies: List[float] = []
+    start = time.perf_counter()
+    run(latencies)
+    elapsed = time.perf_counter() - start
+    return _summarize(name, len(tickets), elapsed, latencies, client, _fallback_count())
+
+
+def build_stub_pool(client: StubCohereClient, pool_size: int, per_key_rpm: float) -> LLMPool:
+    """Pool of `pool_size` rate-limited backends sharing one stub (so call stats stay in one place)."""
+    return LLMPool([LLMBackend(f"stub-{i + 1}", client, per_key_rpm) for i in range(pool_size)])
+
+
+def bench_classifier(tickets: List[Dict], client: StubCohereClient, rate_limit_delay: float,
+                     prompt_template: str = None, llm_client=None) -> List[Dict]:
+    llm_client = llm_client or client
+    classifier = TicketClassifier(cohere_client=llm_client, distilled_model=False, prompt_template=prompt_template)
+    if not isinstance(llm_client, LLMPool):
+        classifier.min_delay_between_calls = rate_limit_delay
+    results = []
+
+    def run_single(latencies):
+        for ticket in tickets:
+            start = time.perf_counter()
+            classifier.classify_ticket(ticket['subject'], ticket['body'])
+            latencies.append(time.perf_counter() - start)
+
+    def run_bulk(latencies):
+        marks = []
+        classifier.classify_bulk_tickets(tickets, lambda current, total: marks.append(time.perf_counter()),
+                                         deduplicate=False)
+        marks.append(time.perf_counter())
+        latencies.extend(b - a for a, b in zip(marks, marks[1:]))
+
+    def run_bulk_dedup(latencies):
+        # Progress is reported per cluster; spread each cluster's time over its tickets
+        marks = [(0, time.perf_counter())]
+        classifier.classify_bulk_tickets(tickets, lambda current, total: marks.append((current, time.perf_counter())),
+                                         deduplicate=True)
+        for (done_a, a), (done_b, b) in zip(marks, marks[1:]):
+            latencies.extend([(b - a) / (done_b - done_a)] * (done_b - done_a))
+
+    def run_batch(latencies):
+        classifier.classify_batch_with_cohere(tickets)
+        # One LLM call per ticket in this mode
+        latencies.extend(client.call_durations)
+
+    results.append(_run_scenario('classify_ticket', tickets, client, run_single, llm_client))
+    results.append(_run_scenario('classify_bulk_tickets', tickets, client, run_bulk, llm_client))
+    results.append(_run_scenario('classify_bulk_tickets_dedup', tickets, client, run_bulk_dedup, llm_client))
+    results.append(_run_scenario('classify_batch_with_cohere', tickets, client, run_batch, llm_client))
+    return results
+
+
+def bench_rag(tickets: List[Dict], client: StubCohereClient, rate_limit_delay: float,
+              llm_client=None, faq: bool = False) -> List[Dict]:
+    llm_client = llm_client or client
+    Config.FAQ_ENABLED = faq  # the FAQ index is only built (synchronously below) when measuring it
+    try:
+        import sqlite_fix  # noqa: F401  (must precede chromadb)
+        from rag_system import RAGSystem
+        rag_system = RAGSystem(cohere_client=llm_client)
+        rag_system.populate_knowledge_base()
+        if faq:
+            rag_system.build_faq_index()
+    except Exception as e:
+        print(f"Skipping RAG benchmark, could not initialize RAGSystem: {e}")
+        return []
+    if not isinstance(llm_client, LLMPool):
+        rag_system.min_delay_between_calls = rate_limit_delay
+
+    def run_rag(latencies):
+        for ticket in tickets:
+            start = time.perf_counter()
+            rag_system.generate_rag_response(f"{ticket['subject']} {ticket['body']}")
+            latencies.append(time.perf_counter() - start)
+
+    return [_run_scenario('generate_rag_response', tickets, client, run_rag, llm_client)]
+
+
+def bench_memory(tickets: List[Dict]) -> Dict:
+    """Measure with tracemalloc what the classified tickets hold as JSON-loaded dicts and as columns."""
+    rng = random.Random(0)
+    classified = [dict(ticket,
+                       topic_tags=rng.sample(Config.TOPIC_TAGS, k=rng.randint(1, 2)),
+                       sentiment=rng.choice(Config.SENTIMENT_LABELS),
+                       priority=rng.choice(Config.PRIORITY_LABELS),
+                       reasoning="Fallback classification (AI unavailable)")
+                  for ticket in tickets]
+    payload = json.dumps(classified)
+    del classified
+
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        records = json.loads(payload)  # what ResultStore held before the columnar layout
+        dicts_bytes = tracemalloc.get_traced_memory()[0] - start
+
+        start = tracemalloc.get_traced_memory()[0]
+        columns = ColumnarTickets.from_tickets(records)
+        columnar_bytes = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+
+    assert len(columns) == len(records)
+    return {
+        'tickets': len(records),
+        'dicts_mb': round(dicts_bytes / 2 ** 20, 1),
+        'columnar_mb': round(columnar_bytes / 2 ** 20, 1),
+        'ratio': round(dicts_bytes / max(columnar_bytes, 1), 1)
+    }
+
+
+def compare_to_baseline(results: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """Return human-readable regressions relative to a baseline run."""
+    regressions = []
+    baseline_by_name = {r['scenario']: r for r in baseline.get('results', [])}
+    for result in results:
+        previous = baseline_by_name.get(result['scenario'])
+        if not previous:
+            continue
+        if result['tickets_per_sec'] < previous['tickets_per_sec'] * (1 - tolerance):
+            regressions.append(f"{result['scenario']}: throughput {result['tickets_per_sec']} < "
+                               f"baseline {previous['tickets_per_sec']} tickets/sec")
+        if result['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{result['scenario']}: p95 {result['p95_ms']} ms > baseline {previous['p95_ms']} ms")
+        if result['llm_calls_per_ticket'] > previous['llm_calls_per_ticket'] * (1 + tolerance):
+            regressions.append(f"{result['scenario']}: {result['llm_calls_per_ticket']} LLM calls/ticket > "
+                               f"baseline {previous['llm_calls_per_ticket']}")
+        previous_tokens = previous.get('prompt_tokens_per_ticket')
+        if previous_tokens and result.get('prompt_tokens_per_ticket', 0) > previous_tokens * (1 + tolerance):
+            regressions.append(f"{result['scenario']}: {result['prompt_tokens_per_ticket']} prompt tokens/ticket > "
+                               f"baseline {previous_tokens}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline classifier/RAG benchmark with a stub LLM")
+    parser.add_argument('--tickets', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--jitter-ms', type=float, default=5.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument('--malformed-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-delay', type=float, default=0.0,
+                        help="classifier min delay between calls in seconds (production uses 6)")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--rag', action='store_true', help="also benchmark generate_rag_response")
+    parser.add_argument('--faq', action='store_true', help="serve RAG answers from the FAQ index when they match")
+    parser.add_argument('--prompt-template', default=None, help="classification prompt version (default: config)")
+    parser.add_argument('--pool-size', type=int, default=0,
+                        help="route calls through an LLM pool of this many stub backends (0: no pool)")
+    parser.add_argument('--per-key-rpm', type=float, default=0.0,
+                        help="calls per minute allowed per pool backend (0: unlimited)")
+    parser.add_argument('--memory', action='store_true',
+                        help="measure result-store memory as ticket dicts vs columnar instead of latency")
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+
+    tickets = make_synthetic_tickets(args.tickets, seed=args.seed)
+    if args.memory:
+        memory = bench_memory(tickets)
+        print(f"result store, {memory['tickets']} tickets: dicts {memory['dicts_mb']} MB, "
+              f"columnar {memory['columnar_mb']} MB ({memory['ratio']}x smaller)")
+        return
+
+    client = StubCohereClient(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, malformed_rate=args.malformed_rate, seed=args.seed
+    )
+
+    llm_client = build_stub_pool(client, args.pool_size, args.per_key_rpm) if args.pool_size else None
+
+    results = bench_classifier(tickets, client, args.rate_limit_delay, args.prompt_template, llm_client)
+    if args.rag:
+        results.extend(bench_rag(tickets, client, args.rate_limit_delay, llm_client, args.faq))
+
+    print(f"{'scenario':<30}{'tickets/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'calls/t':>9}"
+          f"{'in tok/t':>10}{'out tok/t':>10}{'fallbk':>8}{'repair':>8}")
+    for r in results:
+        print(f"{r['scenario']:<30}{r['tickets_per_sec']:>10}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+              f"{r['p99_ms']:>9}{r['llm_calls_per_ticket']:>9}{r['prompt_tokens_per_ticket']:>10}"
+              f"{r['completion_tokens_per_ticket']:>10}{r['fallbacks']:>8}{r['repair_asks']:>8}")
+
+    settings = {k: v for k, v in vars(args).items() if k not in ('save_baseline', 'compare')}
+    run = {'settings': settings, 'results': results}
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(run, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        mismatched = sorted(k for k, v in baseline.get('settings', {}).items()
+                            if k != 'tolerance' and settings.get(k) != v)
+        if mismatched:
+            print(f"Warning: settings differ from baseline ({', '.join(mismatched)}); comparison may be misleading")
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Per-window LLM call and token budget shared by the classifier and RAG.
+
+Usage is accounted per caller class: bulk classification (background jobs,
+inbox ingestion, bulk runs), interactive classification (agent tab, API) and
+RAG answers. Each class can be given a reserved share of the window's quota
+that only it may spend; the rest is a shared pool. Bulk work has no
+reservation, so a large backlog can never eat into the quota kept for
+interactive use. When the shared pool runs low (below BUDGET_LOW_WATERMARK)
+bulk work degrades to local tiers (distilled model, then keywords) before
+the hard limit is reached.
+
+Callers reserve an estimate before each call and commit the measured tokens
+afterwards; a rejected reservation raises BudgetExceededError and callers
+fall back as they do for an open circuit. Limits of 0 mean unlimited.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from config import Config
+from metrics import METRICS
+
+BULK = 'bulk'
+INTERACTIVE = 'interactive'
+RAG = 'rag'
+CALLER_CLASSES = (BULK, INTERACTIVE, RAG)
+_RESOURCES = ('calls', 'tokens')
+
+
+class BudgetExceededError(Exception):
+    """Raised instead of calling the LLM when the caller's budget is spent."""
+
+
+class Reservation:
+    def __init__(self, caller: str, tokens: int, window_start: float):
+        self.caller = caller
+        self.tokens = tokens
+        self.window_start = window_start
+        self.settled = False
+
+
+class BudgetManager:
+    def __init__(self, call_limit: int = None, token_limit: int = None, window_seconds: float = None,
+                 reserved: Optional[Dict[str, float]] = None, low_watermark: float = None,
+                 state_path: Optional[str] = None):
+        config = Config()
+        self.limits = {
+            'calls': call_limit if call_limit is not None else config.BUDGET_CALLS_PER_WINDOW,
+            'tokens': token_limit if token_limit is not None else config.BUDGET_TOKENS_PER_WINDOW
+        }
+        self.window_seconds = window_seconds or config.BUDGET_WINDOW_SECONDS
+        # Fractions of each limit only the given caller class may spend
+        self.reserved = reserved if reserved is not None else {
+            INTERACTIVE: config.BUDGET_RESERVE_INTERACTIVE,
+            RAG: config.BUDGET_RESERVE_RAG
+        }
+        if sum(self.reserved.values()) > 1:
+            raise ValueError("Budget reservations add up to more than the whole budget")
+        self.low_watermark = low_watermark if low_watermark is not None else config.BUDGET_LOW_WATERMARK
+        self.state_path = state_path if state_path is not None else (config.BUDGET_STATE_PATH or None)
+
+        self._lock = threading.Lock()
+        self._window_start = self._current_window_start()
+        self._usage = self._empty_usage()
+        self._load_state()
+
+    @property
+    def enabled(self) -> bool:
+        return any(self.limits.values())
+
+    def _current_window_start(self) -> float:
+        # Windows are aligned to the epoch (UTC midnight for the default one-day window)
+        return time.time() // self.window_seconds * self.window_seconds
+
+    @staticmethod
+    def _empty_usage() -> Dict[str, Dict[str, int]]:
+        return {caller: {'calls': 0, 'tokens': 0} for caller in CALLER_CLASSES}
+
+    def _roll_window(self):
+        window_start = self._current_window_start()
+        if window_start != self._window_start:
+            self._window_start = window_start
+            self._usage = self._empty_usage()
+
+    # -- persistence --------------------------------------------------------
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable budget state {self.state_path}: {e}")
+            return
+        if state.get('window_start') == self._window_start:
+            for caller, usage in state.get('usage', {}).items():
+                if caller in self._usage:
+                    self._usage[caller].update(usage)
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'window_start': self._window_start, 'usage': self._usage}, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"Error persisting budget state: {e}")
+
+    # -- accounting ---------------------------------------------------------
+
+    def _shared_pool(self, resource: str) -> float:
+        return self.limits[resource] * (1 - sum(self.reserved.values()))
+
+    def _shared_used(self, resource: str, extra_caller: str = None, extra: int = 0) -> float:
+        """Usage spilling past each class's reservation into the shared pool."""
+        limit = self.limits[resource]
+        used = 0.0
+        for caller in CALLER_CLASSES:
+            amount = self._usage[caller][resource] + (extra if caller == extra_caller else 0)
+            used += max(0.0, amount - limit * self.reserved.get(caller, 0.0))
+        return used
+
+    def _fits(self, caller: str, calls: int, tokens: int) -> bool:
+        for resource, amount in (('calls', calls), ('tokens', tokens)):
+            if self.limits[resource] and self._shared_used(resource, caller, amount) > self._shared_pool(resource):
+                return False
+        return True
+
+    def reserve(self, caller: str, tokens: int) -> Reservation:
+        """Hold one call and an estimated token count, or raise BudgetExceededError."""
+        with self._lock:
+            self._roll_window()
+            if self.enabled and not self._fits(caller, 1, tokens):
+                METRICS.increment('budget_rejections', caller=caller)
+                raise BudgetExceededError(f"LLM budget for '{caller}' is spent for this window")
+            self._usage[caller]['calls'] += 1
+            self._usage[caller]['tokens'] += tokens
+            return Reservation(caller, tokens, self._window_start)
+
+    def commit(self, reservation: Reservation, tokens: Optional[int] = None):
+        """Settle a reservation with the measured token count (None keeps the estimate)."""
+        tokens = reservation.tokens if tokens is None else tokens
+        with self._lock:
+            if reservation.settled:
+                return
+            reservation.settled = True
+            if reservation.window_start == self._window_start:
+                self._usage[reservation.caller]['tokens'] += tokens - reservation.tokens
+            self._save_state()
+        METRICS.increment('budget_calls', caller=reservation.caller)
+        METRICS.increment('budget_tokens', tokens, caller=reservation.caller)
+
+    def release(self, reservation: Reservation):
+        """Return a reservation whose call was never made."""
+        with self._lock:
+            if reservation.settled:
+                return
+            reservation.settled = True
+            if reservation.window_start == self._window_start:
+                self._usage[reservation.caller]['calls'] -= 1
+                self._usage[reservation.caller]['tokens'] -= reservation.tokens
+
+    def _is_low(self, caller: str) -> bool:
+        if not self.enabled or self.reserved.get(caller, 0.0) > 0:
+            return False
+        for resource in _RESOURCES:
+            pool = self._shared_pool(resource)
+            if self.limits[resource] and pool - self._shared_used(resource) <= pool * self.low_watermark:
+                return True
+        return False
+
+    def should_degrade(self, caller: str) -> bool:
+        """Whether work of this class should use local tiers to save the remaining budget.
+
+        Only classes without a reservation degrade early (at the low watermark);
+        the others simply stop when their reservation and the pool are spent.
+        """
+        with self._lock:
+            self._roll_window()
+            return self._is_low(caller)
+
+    def reset(self):
+        with self._lock:
+            self._window_start = self._current_window_start()
+            self._usage = self._empty_usage()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            self._roll_window()
+            remaining = {
+                resource: (max(0.0, self._shared_pool(resource) - self._shared_used(resource))
+                           if self.limits[resource] else None)
+                for resource in _RESOURCES
+            }
+            return {
+                'enabled': self.enabled,
+                'limits': dict(self.limits),
+                'window_resets_in_s': round(self._window_start + self.window_seconds - time.time()),
+                'usage': {caller: dict(usage) for caller, usage in self._usage.items()},
+                'shared_remaining': remaining,
+                'bulk_degraded': self._is_low(BULK)
+            }
+
+
+# Shared by TicketClassifier and RAGSystem so all Cohere usage draws on one allowance
+LLM_BUDGET = BudgetManager()
@@ -0,0 +1,167 @@
+"""
+Circuit breaker with jittered exponential backoff for LLM calls.
+
+TicketClassifier and RAGSystem share one breaker per provider (COHERE_BREAKER),
+so an outage detected by either opens the circuit for both. While open, calls
+are rejected immediately with CircuitOpenError, skipping the rate-limit wait,
+and callers go straight to keyword classification or extractive answers.
+After CIRCUIT_RESET_SECONDS the breaker half-opens and lets a few probe calls
+through; a successful probe closes it, a failed one re-opens it.
+
+Transient errors (429, 5xx, connection failures, timeouts) are retried with
+full-jitter exponential backoff while the circuit stays closed.
+"""
+
+import random
+import threading
+import time
+from typing import Callable
+
+from config import Config
+from metrics import METRICS
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the backend while the circuit is open."""
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Whether an error is worth retrying (rate limits, server errors, network)."""
+    status = getattr(error, 'http_status', None)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # Cohere wraps network failures in CohereConnectionError, which has no status
+    return type(error).__name__ in ('CohereConnectionError', 'Timeout', 'ConnectTimeout', 'ReadTimeout')
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = None, reset_timeout: float = None,
+                 half_open_max_calls: int = None, max_retries: int = None,
+                 backoff_base: float = None, backoff_max: float = None):
+        config = Config()
+        self.name = name
+        self.failure_threshold = failure_threshold or config.CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout if reset_timeout is not None else config.CIRCUIT_RESET_SECONDS
+        self.half_open_max_calls = half_open_max_calls or config.CIRCUIT_HALF_OPEN_PROBES
+        self.max_retries = max_retries if max_retries is not None else config.LLM_MAX_RETRIES
+        self.backoff_base = backoff_base if backoff_base is not None else config.LLM_BACKOFF_BASE_SECONDS
+        self.backoff_max = backoff_max if backoff_max is not None else config.LLM_BACKOFF_MAX_SECONDS
+
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _transition(self, state: str):
+        if state != self._state:
+            print(f"Circuit '{self.name}' {self._state} -> {state}")
+            METRICS.increment('circuit_transitions', breaker=self.name, state=state)
+            self._state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self._probes_in_flight = 0
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._transition(HALF_OPEN)
+
+    def allow_request(self) -> bool:
+        """Admit a call, or reject it while open / when probe slots are taken."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+                self._probes_in_flight += 1
+                return True
+        METRICS.increment('circuit_rejections', breaker=self.name)
+        return False
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive_failures = 0
+            if self._state == HALF_OPEN:
+                self._transition(CLOSED)
+                self._probes_in_flight = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._transition(OPEN)
+
+    def record_ignored(self):
+        """A call that failed for reasons of its own (bad request, auth): health is unchanged."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes_in_flight > 0:
+                self._probes_in_flight -= 1  # free the probe slot for a call that can tell
+
+    def reset(self):
+        with self._lock:
+            self._transition(CLOSED)
+            self._consecutive_failures = 0
+            self._probes_in_flight = 0
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt (0-based)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Call fn through the breaker, retrying transient errors with backoff.
+
+        Raises CircuitOpenError without calling fn when the circuit is open
+        (chained to the transient error that opened it, if this call saw one),
+        and re-raises the last error once retries are exhausted. Only transient
+        errors count as failures; others are re-raised without touching the
+        breaker's state, so one malformed request cannot open the circuit.
+        """
+        attempt = 0
+        last_error = None
+        while True:
+            if not self.allow_request():
+                raise CircuitOpenError(f"circuit '{self.name}' is open") from last_error
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_transient_error(e):
+                    self.record_ignored()
+                    raise
+                last_error = e
+                self.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                METRICS.increment('llm_retries', breaker=self.name)
+                print(f"Transient error from {self.name} ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.record_success()
+            return result
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                'name': self.name,
+                'state': self._state,
+                'consecutive_failures': self._consecutive_failures,
+                'seconds_since_open': time.monotonic() - self._opened_at if self._state != CLOSED else 0.0
+            }
+
+
+# Shared by TicketClassifier and RAGSystem so either one detecting an outage protects both
+COHERE_BREAKER = CircuitBreaker('cohere')
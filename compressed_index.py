@@ -0,0 +1,321 @@
+"""
+Compressed IVF-PQ vector index with exact re-ranking, persisted memory-mappable.
+
+Vectors are partitioned by a coarse k-means quantizer (IVF, `nlist` lists)
+and each vector's residual from its list centroid is product-quantized: split
+into `pq_subspaces` sub-vectors, each replaced by the index (one byte) of its
+nearest centroid in that subspace's 256-entry codebook. With the default 48
+subspaces a 384-d MiniLM vector costs 48 bytes instead of 1536.
+
+A query scans only the `nprobe` nearest lists, scores their codes with
+per-list lookup tables (asymmetric distance) and re-ranks the best
+`rerank` candidates exactly against float16 copies of the vectors. Setting
+pq_subspaces=0 skips PQ and scans the float16 vectors directly (IVF with
+scalar float16 quantization).
+
+Everything lives in one directory, rows grouped by list so each list is a
+contiguous slice:
+
+    index.json        parameters, counts, distance space
+    centroids.npy     coarse centroids (nlist x dim, float32)
+    codebooks.npy     PQ codebooks (subspaces x 256 x dim/subspaces, float32)
+    list_offsets.npy  start row of each list (nlist + 1)
+    codes.npy         PQ codes (count x subspaces, uint8)
+    vectors.npy       float16 vectors for re-ranking (count x dim)
+    ids.npy           row ids (fixed-width bytes)
+
+Codes, vectors and ids are opened with mmap, so the process only keeps the
+centroids and codebooks in memory; the OS pages in the lists a query touches.
+
+    python compressed_index.py build --out ./vector_index    # from the RAG Chroma collection
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import Config
+
+INDEX_FORMAT_VERSION = 1
+_SPACES = ('l2', 'cosine', 'ip')
+_ENCODE_BATCH = 65536
+_MAX_TRAIN_POINTS_PER_CENTROID = 40
+_DISTANCE_BLOCK = 1 << 24  # distance matrix entries computed at once (64 MB of float32)
+
+
+def _kmeans(x: np.ndarray, k: int, iterations: int = 10, seed: int = 7) -> np.ndarray:
+    """Lloyd's k-means on (a sample of) x; empty clusters are re-seeded from random points."""
+    rng = np.random.default_rng(seed)
+    if len(x) > k * _MAX_TRAIN_POINTS_PER_CENTROID:
+        x = x[rng.choice(len(x), k * _MAX_TRAIN_POINTS_PER_CENTROID, replace=False)]
+    centroids = x[rng.choice(len(x), k, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assignment = _nearest(x, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        empty = counts == 0
+        # Per-cluster sums over the points sorted by cluster
+        order = np.argsort(assignment, kind='stable')
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        centroids[~empty] = np.add.reduceat(x[order], starts[~empty], axis=0) / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), int(empty.sum()), replace=False)]
+    return centroids
+
+
+def _nearest(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid (squared L2) for each row of x."""
+    norms = np.sum(centroids ** 2, axis=1)[None, :]
+    block = max(1, _DISTANCE_BLOCK // len(centroids))
+    return np.concatenate([np.argmin(norms - 2 * x[s:s + block] @ centroids.T, axis=1)
+                           for s in range(0, len(x), block)])
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+class CompressedVectorIndex:
+    def __init__(self, path: str, meta: Dict, centroids: np.ndarray, codebooks: Optional[np.ndarray],
+                 list_offsets: np.ndarray, codes: Optional[np.ndarray], vectors: np.ndarray, ids: np.ndarray):
+        self.path = path
+        self.meta = meta
+        self.space = meta['space']
+        self.centroids = centroids
+        self.codebooks = codebooks
+        self.list_offsets = list_offsets
+        self.codes = codes
+        self.vectors = vectors
+        self.ids = ids
+        if codebooks is not None:
+            subspaces, ksub, _ = codebooks.shape
+            self._codebook_norms = np.sum(codebooks ** 2, axis=2)
+            self._table_offsets = (np.arange(subspaces) * ksub).astype(np.int64)
+
+    def __len__(self) -> int:
+        return self.meta['count']
+
+    @property
+    def pq_subspaces(self) -> int:
+        return self.meta['pq_subspaces']
+
+    # -- building -------------------------------------------------------------
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, ids: Sequence[str], path: str, space: str = 'l2', nlist: int = 0,
+              pq_subspaces: int = 48, seed: int = 7) -> 'CompressedVectorIndex':
+        """Train the quantizers on `vectors`, encode them and save the index to `path`."""
+        if space not in _SPACES:
+            raise ValueError(f"Unsupported space '{space}' (expected one of {', '.join(_SPACES)})")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        count, dim = vectors.shape
+        if count == 0 or count != len(ids):
+            raise ValueError("Need one id per vector and at least one vector")
+        if pq_subspaces and dim % pq_subspaces:
+            raise ValueError(f"pq_subspaces ({pq_subspaces}) must divide the vector dimension ({dim})")
+        if space == 'cosine':
+            vectors = _normalize(vectors)
+
+        # Roughly sqrt(N) lists, but enough points per list to train the coarse quantizer
+        nlist = nlist or int(np.sqrt(count))
+        nlist = max(1, min(nlist, count // _MAX_TRAIN_POINTS_PER_CENTROID or 1))
+        centroids = _kmeans(vectors, nlist, seed=seed)
+        assignment = _nearest(vectors, centroids)
+        order = np.argsort(assignment, kind='stable')
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))]).astype(np.int64)
+
+        codebooks = None
+        codes = None
+        if pq_subspaces:
+            dsub = dim // pq_subspaces
+            ksub = min(256, count)
+            rng = np.random.default_rng(seed)
+            sample = rng.choice(count, min(count, ksub * _MAX_TRAIN_POINTS_PER_CENTROID), replace=False)
+            residuals = vectors[sample] - centroids[assignment[sample]]
+            codebooks = np.stack([
+                _kmeans(residuals[:, j * dsub:(j + 1) * dsub], ksub, seed=seed + j) for j in range(pq_subspaces)
+            ])
+            codes = np.empty((count, pq_subspaces), dtype=np.uint8)
+            for start in range(0, count, _ENCODE_BATCH):
+                rows = order[start:start + _ENCODE_BATCH]
+                block = vectors[rows] - centroids[assignment[rows]]
+                for j in range(pq_subspaces):
+                    codes[start:start + len(rows), j] = _nearest(block[:, j * dsub:(j + 1) * dsub], codebooks[j])
+
+        ids = [str(i).encode('utf-8') for i in ids]
+        id_array = np.array([ids[i] for i in order], dtype=f"S{max(len(i) for i in ids)}")
+        meta = {
+            'version': INDEX_FORMAT_VERSION,
+            'space': space,
+            'dim': dim,
+            'count': count,
+            'nlist': nlist,
+            'pq_subspaces': pq_subspaces,
+            'built_at': time.time()
+        }
+
+        # Write to a sibling directory and swap it in, so readers never see half an index
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        np.save(os.path.join(tmp_path, 'centroids.npy'), centroids)
+        np.save(os.path.join(tmp_path, 'list_offsets.npy'), list_offsets)
+        np.save(os.path.join(tmp_path, 'vectors.npy'), vectors[order].astype(np.float16))
+        np.save(os.path.join(tmp_path, 'ids.npy'), id_array)
+        if pq_subspaces:
+            np.save(os.path.join(tmp_path, 'codebooks.npy'), codebooks)
+            np.save(os.path.join(tmp_path, 'codes.npy'), codes)
+        with open(os.path.join(tmp_path, 'index.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        old_path = f"{path}.old"
+        if os.path.exists(path):
+            shutil.rmtree(old_path, ignore_errors=True)
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        return cls.load(path)
+
+    # -- loading --------------------------------------------------------------
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'CompressedVectorIndex':
+        with open(os.path.join(path, 'index.json'), 'r') as f:
+            meta = json.load(f)
+        if meta.get('version') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported compressed index version {meta.get('version')} in {path}")
+        mmap_mode = 'r' if mmap else None
+
+        def array(name: str, mode=None) -> np.ndarray:
+            return np.load(os.path.join(path, name), mmap_mode=mode)
+
+        return cls(
+            path, meta,
+            centroids=array('centroids.npy'),
+            codebooks=array('codebooks.npy') if meta['pq_subspaces'] else None,
+            list_offsets=array('list_offsets.npy'),
+            codes=array('codes.npy', mmap_mode) if meta['pq_subspaces'] else None,
+            vectors=array('vectors.npy', mmap_mode),
+            ids=array('ids.npy', mmap_mode)
+        )
+
+    @classmethod
+    def load_if_exists(cls, path: str) -> Optional['CompressedVectorIndex']:
+        if not os.path.exists(os.path.join(path, 'index.json')):
+            return None
+        try:
+            return cls.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable compressed index {path}: {e}")
+            return None
+
+    # -- search ---------------------------------------------------------------
+
+    def _exact_distances(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        candidates = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.space == 'l2':
+            difference = candidates - query
+            return np.einsum('ij,ij->i', difference, difference)
+        return 1.0 - candidates @ query  # Chroma's cosine / ip distance
+
+    def _pq_distances(self, query: np.ndarray, lists: np.ndarray, ranges: List[Tuple[int, int]]) -> np.ndarray:
+        """Approximate squared L2 from the query to every vector of the probed lists."""
+        subspaces, ksub, dsub = self.codebooks.shape
+        residuals = query - self.centroids[lists]
+        # Lookup tables per list: |r_j - c|^2 = |r_j|^2 - 2 r_j.c + |c|^2, with |r|^2 summed over subspaces
+        dots = np.einsum('pmd,mkd->pmk', residuals.reshape(len(lists), subspaces, dsub), self.codebooks)
+        tables = (self._codebook_norms[None] - 2 * dots).reshape(len(lists), -1)
+        residual_norms = np.einsum('pd,pd->p', residuals, residuals)
+        return np.concatenate([
+            np.take(tables[i], np.asarray(self.codes[start:end]) + self._table_offsets).sum(axis=1)
+            + residual_norms[i]
+            for i, (start, end) in enumerate(ranges)
+        ])
+
+    def search(self, queries: np.ndarray, k: int, nprobe: int = 8,
+               rerank: int = 200) -> Tuple[List[List[str]], List[List[float]]]:
+        """Top-k ids and distances for each query (distances as Chroma reports them for the space)."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.space == 'cosine':
+            queries = _normalize(queries)
+        nprobe = max(1, min(nprobe, len(self.centroids)))
+        rerank = max(rerank, k)
+        coarse = np.sum(self.centroids ** 2, axis=1)[None, :] - 2 * queries @ self.centroids.T
+        probes = np.argsort(coarse, axis=1)[:, :nprobe]
+
+        all_ids, all_distances = [], []
+        for query, lists in zip(queries, probes):
+            ranges = [(int(self.list_offsets[l]), int(self.list_offsets[l + 1])) for l in lists]
+            rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+            if self.pq_subspaces and len(rows) > rerank:
+                approximate = self._pq_distances(query, lists, ranges)
+                keep = np.argpartition(approximate, rerank - 1)[:rerank]
+                rows = np.sort(rows[keep])  # sorted rows read the memory map sequentially
+            distances = self._exact_distances(query, rows)
+            top = np.argsort(distances)[:k]
+            all_ids.append([self.ids[r].decode('utf-8') for r in rows[top]])
+            all_distances.append([float(d) for d in distances[top]])
+        return all_ids, all_distances
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Bytes by component: 'resident' is always in memory, the rest is memory-mapped."""
+        def size(array) -> int:
+            return int(array.nbytes) if array is not None else 0
+
+        return {
+            'resident': size(self.centroids) + size(self.codebooks) + size(self.list_offsets),
+            'codes': size(self.codes),
+            'ids': size(self.ids),
+            'rerank_vectors': size(self.vectors)
+        }
+
+
+def build_from_collection(collection, path: str, config: Config = None, page_size: int = 10000,
+                          **kwargs) -> CompressedVectorIndex:
+    """Build the index from every embedding in a Chroma collection, read page by page."""
+    config = config or Config()
+    total = collection.count()
+    vectors = None
+    ids: List[str] = []
+    for offset in range(0, total, page_size):
+        page = collection.get(include=['embeddings'], limit=page_size, offset=offset)
+        embeddings = np.asarray(page['embeddings'], dtype=np.float32)
+        if vectors is None:
+            vectors = np.empty((total, embeddings.shape[1]), dtype=np.float32)
+        vectors[len(ids):len(ids) + len(embeddings)] = embeddings
+        ids.extend(page['ids'])
+    if vectors is None:
+        raise ValueError("Collection is empty; populate the knowledge base first")
+    kwargs.setdefault('space', config.HNSW_SPACE)
+    kwargs.setdefault('nlist', config.IVF_NLIST)
+    kwargs.setdefault('pq_subspaces', config.PQ_SUBSPACES)
+    return CompressedVectorIndex.build(vectors[:len(ids)], ids, path, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the compressed IVF-PQ index for RAG retrieval")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="build from the RAG Chroma collection")
+    build.add_argument('--out', default=Config.COMPRESSED_INDEX_DIR)
+    build.add_argument('--nlist', type=int, default=Config.IVF_NLIST, help="inverted lists (0: about sqrt(N))")
+    build.add_argument('--pq-subspaces', type=int, default=Config.PQ_SUBSPACES, help="0: float16 vectors only")
+    args = parser.parse_args()
+
+    import sqlite_fix  # noqa: F401  (must precede chromadb)
+    import chromadb
+
+    collection = chromadb.PersistentClient(path="./chroma_db").get_collection("atlan_docs")
+    start = time.perf_counter()
+    index = build_from_collection(collection, args.out, nlist=args.nlist, pq_subspaces=args.pq_subspaces)
+    print(f"Built {args.out}: {len(index)} vectors, {index.meta['nlist']} lists, "
+          f"{index.pq_subspaces} PQ subspaces in {time.perf_counter() - start:.1f}s")
+    print({name: f"{size / 1e6:.1f} MB" for name, size in index.memory_usage().items()})
+
+
+if __name__ == "__main__":
+    main()
@@ -7,14 +7,115 @@ load_dotenv()
 class Config:
     # API Configuration
     COHERE_API_KEY = os.getenv("COHERE_API_KEY", "")
+    COHERE_API_KEYS = [key.strip() for key in os.getenv("COHERE_API_KEYS", "").split(",") if key.strip()]  # extra keys
+    GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
     
     # Model Selection
     USE_COHERE = os.getenv("USE_COHERE", "true").lower() == "true"
+    USE_GEMINI = os.getenv("USE_GEMINI", "false").lower() == "true"  # adds Gemini to the LLM pool
+    GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-pro")
+    
+    # LLM Pool (each key/backend is rate limited separately; calls go to the least loaded one)
+    COHERE_CALLS_PER_MINUTE = float(os.getenv("COHERE_CALLS_PER_MINUTE", "10"))  # trial key limit
+    GEMINI_CALLS_PER_MINUTE = float(os.getenv("GEMINI_CALLS_PER_MINUTE", "60"))
     
     # RAG Configuration
     CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
     CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
     MAX_RETRIEVAL_DOCS = int(os.getenv("MAX_RETRIEVAL_DOCS", "5"))
+    ANSWER_SLA_SECONDS = float(os.getenv("ANSWER_SLA_SECONDS", "3"))  # quick answer first if the LLM is slower
+    
+    # FAQ Answer Index (canonical questions and answers generated per KB document, served without an LLM call)
+    FAQ_ENABLED = os.getenv("FAQ_ENABLED", "false").lower() == "true"
+    FAQ_INDEX_DIR = os.getenv("FAQ_INDEX_DIR", "./faq_index")
+    FAQ_QUESTIONS_PER_DOC = int(os.getenv("FAQ_QUESTIONS_PER_DOC", "5"))
+    FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", "0.8"))  # cosine similarity to a stored question
+    
+    # Classification Prompt (v1: original verbose prompt, v2: compact preamble and label codes)
+    PROMPT_TEMPLATE_VERSION = os.getenv("PROMPT_TEMPLATE_VERSION", "v1")
+    STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "true").lower() == "true"  # JSON schema if the client supports it
+    STRUCTURED_REPAIR = os.getenv("STRUCTURED_REPAIR", "true").lower() == "true"  # re-ask only invalid fields, once
+    
+    # Vector Index (HNSW) Configuration - applied when the collection is created
+    HNSW_SPACE = os.getenv("HNSW_SPACE", "l2")  # l2, cosine or ip
+    HNSW_M = int(os.getenv("HNSW_M", "16"))
+    HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "100"))
+    HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "10"))
+    
+    # Compressed Vector Index (IVF-PQ with exact re-ranking) - alternative to HNSW for large corpora
+    VECTOR_INDEX = os.getenv("VECTOR_INDEX", "chroma")  # chroma or compressed
+    COMPRESSED_INDEX_DIR = os.getenv("COMPRESSED_INDEX_DIR", "./vector_index")
+    IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))  # 0: about sqrt(chunks)
+    IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))  # lists scanned per query
+    PQ_SUBSPACES = int(os.getenv("PQ_SUBSPACES", "48"))  # bytes per vector; 0: float16 vectors only
+    RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "200"))  # re-scored exactly
+    
+    # LLM Resilience (circuit breaker and retries)
+    LLM_TIMEOUT_SECONDS = int(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1"))
+    LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30"))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "60"))
+    CIRCUIT_HALF_OPEN_PROBES = int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "1"))
+
+    # LLM Budget (per window; 0 = unlimited). Reserved shares can only be spent by that caller class
+    BUDGET_CALLS_PER_WINDOW = int(os.getenv("BUDGET_CALLS_PER_WINDOW", "0"))
+    BUDGET_TOKENS_PER_WINDOW = int(os.getenv("BUDGET_TOKENS_PER_WINDOW", "0"))
+    BUDGET_WINDOW_SECONDS = float(os.getenv("BUDGET_WINDOW_SECONDS", "86400"))
+    BUDGET_RESERVE_INTERACTIVE = float(os.getenv("BUDGET_RESERVE_INTERACTIVE", "0.15"))
+    BUDGET_RESERVE_RAG = float(os.getenv("BUDGET_RESERVE_RAG", "0.25"))
+    BUDGET_LOW_WATERMARK = float(os.getenv("BUDGET_LOW_WATERMARK", "0.2"))  # bulk goes local below this
+    BUDGET_STATE_PATH = os.getenv("BUDGET_STATE_PATH", "")  # persist usage across restarts
+    
+    # LLM Scheduling (urgent tickets first, with aging so bulk work is not starved)
+    LLM_SCHEDULER_WORKERS = int(os.getenv("LLM_SCHEDULER_WORKERS", "1"))
+    LLM_SCHEDULER_INTERACTIVE_WORKERS = int(os.getenv("LLM_SCHEDULER_INTERACTIVE_WORKERS", "1"))  # agent answers
+    LLM_SCHEDULER_AGING_SECONDS = float(os.getenv("LLM_SCHEDULER_AGING_SECONDS", "120"))  # per priority level
+    
+    # Distilled Local Classifier (served before Cohere when confident)
+    DISTILLED_ENABLED = os.getenv("DISTILLED_ENABLED", "true").lower() == "true"
+    DISTILLED_MODEL_DIR = os.getenv("DISTILLED_MODEL_DIR", "./models")
+    DISTILLED_MIN_CONFIDENCE = float(os.getenv("DISTILLED_MIN_CONFIDENCE", "0.8"))
+    
+    # Near-duplicate Clustering (classify one representative per cluster)
+    DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+    DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))  # estimated Jaccard similarity
+    DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "128"))
+    DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", "5"))
+    
+    # Shared Result Store (leave empty to keep results in memory only)
+    RESULT_STORE_DIR = os.getenv("RESULT_STORE_DIR", "")
+    
+    # Background Classification Jobs
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+    JOB_DIR = os.getenv("JOB_DIR", "./jobs")
+    JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+    
+    # Inbox Ingestion (directory of .jsonl drops or an append-only .jsonl file)
+    INBOX_PATH = os.getenv("INBOX_PATH", "")
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "8"))
+    INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", "2"))
+    INGEST_FLUSH_SECONDS = float(os.getenv("INGEST_FLUSH_SECONDS", "5"))
+    
+    # Headless HTTP API
+    API_HOST = os.getenv("API_HOST", "127.0.0.1")
+    API_PORT = int(os.getenv("API_PORT", "8000"))
+    API_MAX_BATCH_SIZE = int(os.getenv("API_MAX_BATCH_SIZE", "8"))
+    API_BATCH_WINDOW_MS = float(os.getenv("API_BATCH_WINDOW_MS", "5"))
+    
+    # Bulk Auto-reply Pipeline (workers per stage; bounded queues between stages apply backpressure)
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "64"))
+    PIPELINE_CLASSIFY_WORKERS = int(os.getenv("PIPELINE_CLASSIFY_WORKERS", "2"))
+    PIPELINE_CLASSIFY_BATCH = int(os.getenv("PIPELINE_CLASSIFY_BATCH", "8"))  # tickets per packed LLM call
+    PIPELINE_RETRIEVE_WORKERS = int(os.getenv("PIPELINE_RETRIEVE_WORKERS", "1"))
+    PIPELINE_RETRIEVE_BATCH = int(os.getenv("PIPELINE_RETRIEVE_BATCH", "16"))  # queries per embedding pass
+    PIPELINE_GENERATE_WORKERS = int(os.getenv("PIPELINE_GENERATE_WORKERS", "4"))
+    
+    # Request Profiling (cProfile + tracemalloc for the next N classify/answer requests)
+    PROFILE_REQUESTS = int(os.getenv("PROFILE_REQUESTS", "0"))  # requests to profile from startup; 0 = off
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+    PROFILE_TOP_ALLOCATIONS = int(os.getenv("PROFILE_TOP_ALLOCATIONS", "25"))  # allocation sites per report
     
     # Classification Labels
     TOPIC_TAGS = [
@@ -25,6 +126,9 @@ class Config:
     SENTIMENT_LABELS = ["Frustrated", "Curious", "Angry", "Neutral"]
     PRIORITY_LABELS = ["P0 (High)", "P1 (Medium)", "P2 (Low)"]
     
+    # Topics answered from the knowledge base; other tickets are routed to a team
+    RAG_TOPICS = ["How-to", "Product", "Best practices", "API/SDK", "SSO"]
+    
     # Knowledge Base URLs
     ATLAN_DOCS_URL = "https://docs.atlan.com/"
     ATLAN_DEVELOPER_URL = "https://developer.atlan.com/"
@@ -0,0 +1,178 @@
+"""
+Near-duplicate ticket clustering with MinHash and locality-sensitive hashing.
+
+Backlogs often contain bursts of near-identical tickets (e.g. many "Snowflake
+connection failing" reports after an incident). TicketDeduplicator groups
+tickets whose estimated Jaccard similarity over character shingles is at least
+DEDUP_THRESHOLD, so only one representative per cluster needs an LLM call and
+its labels are propagated to the other members.
+
+Propagated tickets carry an audit trail: `duplicate_of` (the representative's
+id) and `duplicate_similarity` (estimated Jaccard similarity to it).
+"""
+
+import re
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from metrics import METRICS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_REPRESENTATIVE_SAMPLE = 256
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r'\s+', ' ', re.sub(r'[^a-z0-9 ]', ' ', text.lower())).strip()
+
+
+def _lsh_params(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Pick (bands, rows) whose S-curve midpoint (1/b)^(1/r) is closest to threshold."""
+    candidates = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(candidates, key=lambda br: abs((1.0 / br[0]) ** (1.0 / br[1]) - threshold))
+
+
+class TicketDeduplicator:
+    def __init__(self, threshold: float = None, num_perm: int = None, shingle_size: int = None,
+                 seed: int = 1):
+        config = Config()
+        self.threshold = threshold if threshold is not None else config.DEDUP_THRESHOLD
+        self.num_perm = num_perm or config.DEDUP_NUM_PERM
+        self.shingle_size = shingle_size or config.DEDUP_SHINGLE_SIZE
+        self.bands, self.rows = _lsh_params(self.num_perm, self.threshold)
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MAX_HASH, size=self.num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MAX_HASH, size=self.num_perm, dtype=np.uint64)
+
+    def _shingles(self, ticket: Dict) -> np.ndarray:
+        text = _normalize(f"{ticket.get('subject', '')} {ticket.get('body', '')}")
+        k = self.shingle_size
+        grams = {text[i:i + k] for i in range(max(len(text) - k + 1, 1))}
+        return np.array([zlib.crc32(g.encode('utf-8')) for g in grams], dtype=np.uint64)
+
+    def signature(self, ticket: Dict) -> np.ndarray:
+        """MinHash signature of a ticket's subject and body."""
+        hashes = self._shingles(ticket)
+        # Universal hashing (a*x + b) mod p; a, x < 2^32 so the product fits in uint64
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+    def _split(self, members: List[int], signatures: np.ndarray) -> List[Dict]:
+        """Split a union-find group so every member passes the threshold against its representative.
+
+        Union-find links pairs (single linkage), so A~B and B~C can chain A and C
+        together below the threshold; members too far from the chosen
+        representative are clustered again among themselves.
+        """
+        clusters = []
+        while members:
+            if len(members) == 1:
+                clusters.append({'representative': members[0], 'members': members,
+                                 'similarity': {members[0]: 1.0}})
+                break
+            # Representative: the member most similar to the rest of the group
+            # (chosen among the first few hundred to bound the pairwise cost)
+            sample = signatures[members[:_REPRESENTATIVE_SAMPLE]]
+            pairwise = (sample[:, None, :] == sample[None, :, :]).mean(axis=2)
+            representative = members[int(pairwise.sum(axis=1).argmax())]
+            rep_row = (signatures[members] == signatures[representative]).mean(axis=1)
+
+            similarity = {m: round(float(rep_row[i]), 3) for i, m in enumerate(members) if rep_row[i] >= self.threshold}
+            clusters.append({'representative': representative, 'members': list(similarity), 'similarity': similarity})
+            members = [m for i, m in enumerate(members) if rep_row[i] < self.threshold]
+        return clusters
+
+    def cluster(self, tickets: List[Dict]) -> List[Dict]:
+        """Group near-duplicate tickets.
+
+        Returns one dict per cluster: {'representative': position, 'members': [positions],
+        'similarity': {position: estimated similarity to the representative}}.
+        Every member's similarity to its representative is at least the threshold.
+        Singletons are returned as clusters of one.
+        """
+        if not tickets:
+            return []
+
+        with METRICS.timer('dedup_cluster', component='dedup'):
+            signatures = np.vstack([self.signature(ticket) for ticket in tickets])
+
+            # Union-find over LSH candidate pairs that pass the similarity check
+            parent = list(range(len(tickets)))
+
+            def find(i):
+                while parent[i] != i:
+                    parent[i] = parent[parent[i]]
+                    i = parent[i]
+                return i
+
+            for band in range(self.bands):
+                buckets: Dict[bytes, List[int]] = {}
+                rows = signatures[:, band * self.rows:(band + 1) * self.rows]
+                for position in range(len(tickets)):
+                    buckets.setdefault(rows[position].tobytes(), []).append(position)
+                for bucket in buckets.values():
+                    for other in bucket[1:]:
+                        first, second = find(bucket[0]), find(other)
+                        if first != second and np.mean(signatures[bucket[0]] == signatures[other]) >= self.threshold:
+                            parent[second] = first
+
+            groups: Dict[int, List[int]] = {}
+            for position in range(len(tickets)):
+                groups.setdefault(find(position), []).append(position)
+
+            clusters = []
+            for members in groups.values():
+                clusters.extend(self._split(members, signatures))
+
+        clusters.sort(key=lambda c: c['representative'])
+        return clusters
+
+    @staticmethod
+    def propagate(ticket: Dict, classification: Dict, representative: Dict, similarity: float) -> Dict:
+        """Copy a representative's labels onto a duplicate, recording where they came from."""
+        METRICS.increment('dedup_propagated', component='dedup')
+        return {
+            **ticket,
+            **classification,
+            'duplicate_of': representative.get('id'),
+            'duplicate_similarity': similarity
+        }
+
+    def classify(self, tickets: List[Dict], classify_fn: Callable[[str, str], Dict],
+                 progress_callback=None) -> Tuple[List[Dict], List[Dict]]:
+        """Classify one representative per cluster and propagate its labels.
+
+        Returns (classified tickets in input order, audit records for propagated tickets).
+        """
+        clusters = self.cluster(tickets)
+        results: List[Optional[Dict]] = [None] * len(tickets)
+        audit = []
+        done = 0
+
+        for cluster in clusters:
+            rep_position = cluster['representative']
+            representative = tickets[rep_position]
+            classification = classify_fn(representative['subject'], representative['body'])
+            results[rep_position] = {**representative, **classification}
+
+            for position in cluster['members']:
+                if position == rep_position:
+                    continue
+                similarity = cluster['similarity'][position]
+                results[position] = self.propagate(tickets[position], classification, representative, similarity)
+                audit.append({
+                    'id': tickets[position].get('id'),
+                    'duplicate_of': representative.get('id'),
+                    'similarity': similarity,
+                    'cluster_size': len(cluster['members'])
+                })
+
+            done += len(cluster['members'])
+            if progress_callback:
+                progress_callback(done, len(tickets))
+
+        return results, audit
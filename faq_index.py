@@ -0,0 +1,188 @@
+"""
+Pre-generated FAQ answers, matched by question embedding before any live LLM call.
+
+Most agent-tab questions are one of a few canonical tasks per knowledge-base
+document (Snowflake permissions, SAML setup, bulk glossary import...). With
+FAQ_ENABLED (off by default), populating the knowledge base makes RAGSystem ask
+the LLM once per document for its FAQ_QUESTIONS_PER_DOC canonical questions
+with answers grounded in that document. Generation runs at the lowest priority on the shared LLM scheduler
+and is charged to the bulk budget class, so it only uses capacity interactive
+work leaves over. The questions are embedded and stored under FAQ_INDEX_DIR:
+
+    faq.json             KB version, per-document hashes and the question/answer entries
+    embeddings-<id>.npy  normalized question embeddings (entries x dim, float32), named in faq.json
+
+The index is tied to the knowledge-base version (a hash of every document and
+the embedding model): an index built for another version is never served, it
+is rebuilt, and entries of documents that did not change are reused rather
+than regenerated. generate_rag_response answers from the index when a query's
+cosine similarity to a stored question reaches FAQ_MATCH_THRESHOLD, without
+retrieval or an LLM call.
+
+    python faq_index.py build    # generate missing or changed documents' FAQs (e.g. off-peak from cron)
+    python faq_index.py show     # list the stored questions
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from structured_output import extract_json
+
+INDEX_FORMAT_VERSION = 1
+
+
+def document_hash(document: Dict) -> str:
+    content = json.dumps([document.get('url'), document.get('title'), document.get('content')])
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+
+def knowledge_base_version(documents: List[Dict], embedding_model: str) -> str:
+    """Identity of a knowledge base: its documents plus the model that embeds questions."""
+    digest = hashlib.sha256(embedding_model.encode('utf-8'))
+    for document in documents:
+        digest.update(document_hash(document).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def faq_generation_prompt(document: Dict, count: int) -> str:
+    return f"""
+List the {count} questions support customers most often ask that the following Atlan documentation answers,
+each with a complete answer based only on this documentation.
+
+Document title: {document['title']}
+Source: {document['url']}
+
+{document['content']}
+
+Instructions:
+- Phrase questions the way a customer would write them in a support ticket
+- Answers should be clear and actionable, with specific steps when relevant
+- Respond with JSON only: {{"faqs": [{{"question": "...", "answer": "..."}}]}}
+"""
+
+
+def parse_faqs(text: str) -> List[Dict]:
+    """Question/answer pairs from an LLM response; malformed entries are dropped."""
+    data = extract_json(text)
+    if isinstance(data, dict):
+        data = data.get('faqs')
+    if not isinstance(data, list):
+        return []
+    faqs = []
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        question, answer = item.get('question'), item.get('answer')
+        if isinstance(question, str) and isinstance(answer, str) and question.strip() and answer.strip():
+            faqs.append({'question': question.strip(), 'answer': answer.strip()})
+    return faqs
+
+
+class FAQIndex:
+    def __init__(self, kb_version: str, entries: List[Dict], embeddings: np.ndarray,
+                 document_hashes: Optional[List[str]] = None, missing: Optional[List[str]] = None):
+        if len(entries) != len(embeddings):
+            raise ValueError("FAQ index needs one embedding per entry")
+        self.kb_version = kb_version
+        self.entries = entries
+        self.embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(entries), -1) if entries else \
+            np.zeros((0, 0), dtype=np.float32)
+        self.document_hashes = document_hashes or []
+        self.missing = missing or []  # documents whose generation failed; retried on the next build
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def entries_for(self, doc_hash: str) -> List[Tuple[Dict, np.ndarray]]:
+        return [(entry, self.embeddings[i]) for i, entry in enumerate(self.entries) if entry['doc_hash'] == doc_hash]
+
+    def match(self, query_embeddings: np.ndarray, threshold: float) -> List[Optional[Tuple[Dict, float]]]:
+        """Best stored question per query, if its cosine similarity reaches the threshold."""
+        if not self.entries:
+            return [None] * len(query_embeddings)
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = queries @ self.embeddings.T
+        best = np.argmax(scores, axis=1)
+        return [
+            (self.entries[i], float(scores[q, i])) if scores[q, i] >= threshold else None
+            for q, i in enumerate(best)
+        ]
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        # New embeddings go to a new file that faq.json then points to, so a crash never mixes builds
+        embeddings_file = f"embeddings-{uuid.uuid4().hex[:12]}.npy"
+        np.save(os.path.join(path, embeddings_file), self.embeddings)
+        tmp_path = os.path.join(path, 'faq.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'version': INDEX_FORMAT_VERSION,
+                'kb_version': self.kb_version,
+                'embeddings_file': embeddings_file,
+                'document_hashes': self.document_hashes,
+                'missing': self.missing,
+                'entries': self.entries
+            }, f, indent=2)
+        os.replace(tmp_path, os.path.join(path, 'faq.json'))
+        for name in os.listdir(path):
+            if name.startswith('embeddings-') and name != embeddings_file:
+                os.remove(os.path.join(path, name))
+
+    @classmethod
+    def load(cls, path: str) -> Optional['FAQIndex']:
+        """The stored index (of whatever KB version), or None if there is no usable one."""
+        if not os.path.exists(os.path.join(path, 'faq.json')):
+            return None
+        try:
+            with open(os.path.join(path, 'faq.json'), 'r') as f:
+                data = json.load(f)
+            if data.get('version') != INDEX_FORMAT_VERSION:
+                raise ValueError(f"unsupported format version {data.get('version')}")
+            embeddings = np.load(os.path.join(path, data['embeddings_file']))
+            return cls(data['kb_version'], data['entries'], embeddings,
+                       data.get('document_hashes'), data.get('missing'))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable FAQ index {path}: {e}")
+            return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generated FAQ answers for the RAG agent")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="generate FAQs for new or changed knowledge-base documents")
+    build.add_argument('--regenerate', action='store_true', help="regenerate every document's FAQs")
+    subparsers.add_parser('show', help="list the stored questions")
+    args = parser.parse_args()
+
+    if args.command == 'show':
+        index = FAQIndex.load(Config.FAQ_INDEX_DIR)
+        if index is None:
+            print(f"No FAQ index in {Config.FAQ_INDEX_DIR}")
+            return
+        print(f"KB version {index.kb_version}: {len(index)} questions, {len(index.missing)} documents missing")
+        for entry in index.entries:
+            print(f"- [{entry['title']}] {entry['question']}")
+        return
+
+    import sqlite_fix  # noqa: F401  (must precede chromadb)
+    from rag_system import RAGSystem
+
+    rag_system = RAGSystem()
+    rag_system.populate_knowledge_base()
+    index = rag_system.build_faq_index(reuse=not args.regenerate)
+    if index is None:
+        print("FAQ index was not built (is an LLM configured?)")
+    else:
+        print(f"FAQ index: {len(index)} questions, {len(index.missing)} documents missing")
+
+
+if __name__ == "__main__":
+    main()
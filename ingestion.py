@@ -0,0 +1,305 @@
+"""
+Continuous inbox ingestion of new tickets.
+
+InboxIngestor tails either a directory of JSONL drops (every *.jsonl file, in
+name order) or a single append-only JSONL file. Each line is a ticket with at
+least "subject" and "body" (and ideally "id"). New, complete lines are
+classified in micro-batches with TicketClassifier.classify_packed and appended
+to the shared ResultStore under INBOX_VERSION, so the dashboard picks them up
+on its next rerun.
+
+Progress is tracked as a per-file byte-offset watermark. The watermark is saved
+(atomically) only right after the store has been flushed, and ticket ids already
+in the store or earlier in the same batch are skipped, so a crash never loses or
+duplicates tickets. A file that is truncated or replaced (new inode) is read
+again from the start. Synthetic ids for lines without an "id" include the file
+name and byte offset, so two customers sending the same text stay distinct.
+
+Only one ingestor may write to a store's inbox version: the app's Live inbox
+and the CLI watcher share the watermark, so each takes an exclusive lock on
+<watermark>.lock and a second one fails with IngestorLockedError.
+
+    python ingestion.py --source ./inbox            # directory of .jsonl drops
+    python ingestion.py --source ./tickets.jsonl    # append-only file
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no single-writer check
+    fcntl = None
+
+from budget import BULK
+from config import Config
+from metrics import METRICS
+from result_store import ResultStore
+
+INBOX_VERSION = "inbox"
+
+
+class IngestorLockedError(Exception):
+    """Raised when another ingestor already writes to the same watermark."""
+
+
+class InboxIngestor:
+    def __init__(self, classifier, result_store: ResultStore, source: str, version: str = INBOX_VERSION,
+                 state_path: Optional[str] = None, batch_size: int = None, poll_seconds: float = None,
+                 flush_seconds: float = None):
+        config = Config()
+        self.classifier = classifier
+        self.result_store = result_store
+        self.source = source
+        self.version = version
+        self.batch_size = batch_size or config.INGEST_BATCH_SIZE
+        self.poll_seconds = poll_seconds if poll_seconds is not None else config.INGEST_POLL_SECONDS
+        self.flush_seconds = flush_seconds if flush_seconds is not None else config.INGEST_FLUSH_SECONDS
+
+        # The watermark is only as durable as the results it describes
+        if result_store.persist_dir:
+            self.state_path = state_path or os.path.join(result_store.persist_dir, f"{version}.watermark.json")
+        else:
+            self.state_path = state_path
+            if self.state_path is None:
+                print("Result store is not persistent; inbox will be re-ingested from the start on restart")
+        self._lock_file = self._acquire_lock()
+
+        self._state = self._load_state()
+        self._pending_state = json.loads(json.dumps(self._state))
+        existing = result_store.get(version)
+        self._seen_ids = set(existing.ids) if existing is not None else set()
+        self._last_flush = time.monotonic()
+        self._dirty = False
+
+        self._stats = {'ingested': 0, 'duplicates': 0, 'malformed': 0, 'batches': 0,
+                       'last_batch_at': None, 'last_error': None}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # -- watermark ----------------------------------------------------------
+
+    def _acquire_lock(self):
+        """Hold an exclusive lock on <watermark>.lock for the ingestor's lifetime (released on exit)."""
+        if not self.state_path or fcntl is None:
+            return None
+        lock_file = open(f"{self.state_path}.lock", 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.seek(0)
+            holder = lock_file.read().strip() or "unknown"
+            lock_file.close()
+            raise IngestorLockedError(f"another inbox ingestor (pid {holder}) is already writing to {self.state_path}")
+        lock_file.truncate(0)
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        return lock_file
+
+    def close(self):
+        """Release the watermark lock so another ingestor can take over."""
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _load_state(self) -> Dict:
+        if self.state_path and os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, 'r') as f:
+                    return json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Ignoring unreadable watermark {self.state_path}: {e}")
+        return {'files': {}}
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._pending_state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _flush(self):
+        """Persist appended results, then the watermark that covers them."""
+        self.result_store.flush(self.version)
+        self._save_state()
+        self._state = json.loads(json.dumps(self._pending_state))
+        self._last_flush = time.monotonic()
+        self._dirty = False
+
+    # -- reading ------------------------------------------------------------
+
+    def _source_files(self) -> List[str]:
+        if os.path.isdir(self.source):
+            return sorted(glob.glob(os.path.join(self.source, '*.jsonl')))
+        return [self.source] if os.path.exists(self.source) else []
+
+    def _parse_line(self, line: bytes, name: str, offset: int) -> Optional[Dict]:
+        try:
+            ticket = json.loads(line.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            ticket = None
+        if not isinstance(ticket, dict) or not ticket.get('subject') or not ticket.get('body'):
+            with self._lock:
+                self._stats['malformed'] += 1
+            print(f"Skipping malformed inbox line in {name} at byte {offset}")
+            return None
+        if not ticket.get('id'):
+            # Position makes the id unique per line; the text keeps a rewritten file from reusing old ids
+            key = f"{name}\n{offset}\n{ticket['subject']}\n{ticket['body']}"
+            ticket['id'] = f"INBOX-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]}"
+        return ticket
+
+    def _read_new(self, limit: int) -> List[Dict]:
+        """Read up to `limit` new tickets, advancing the pending watermark past them."""
+        tickets: List[Dict] = []
+        files = self._pending_state.setdefault('files', {})
+
+        for path in self._source_files():
+            if len(tickets) >= limit:
+                break
+            name = os.path.basename(path) if os.path.isdir(self.source) else path
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            entry = files.get(name)
+            if entry is None or entry['inode'] != stat.st_ino or stat.st_size < entry['offset']:
+                # New, replaced or truncated file: read from the start
+                entry = files[name] = {'inode': stat.st_ino, 'offset': 0}
+            if stat.st_size == entry['offset']:
+                continue
+
+            with open(path, 'rb') as f:
+                f.seek(entry['offset'])
+                while len(tickets) < limit:
+                    line = f.readline()
+                    if not line or not line.endswith(b'\n'):
+                        break  # EOF, or a line still being written
+                    offset = entry['offset']
+                    entry['offset'] += len(line)
+                    if not line.strip():
+                        continue
+                    ticket = self._parse_line(line, name, offset)
+                    if ticket is not None:
+                        tickets.append(ticket)
+        return tickets
+
+    # -- processing ---------------------------------------------------------
+
+    def poll_once(self) -> int:
+        """Ingest at most one micro-batch of new lines; returns how many tickets were read."""
+        tickets = self._read_new(self.batch_size)
+        # Skip ids already stored and repeats within this batch (the first occurrence wins)
+        fresh, batch_ids = [], set()
+        for ticket in tickets:
+            if ticket['id'] not in self._seen_ids and ticket['id'] not in batch_ids:
+                batch_ids.add(ticket['id'])
+                fresh.append(ticket)
+        with self._lock:
+            self._stats['duplicates'] += len(tickets) - len(fresh)
+
+        if fresh:
+            try:
+                with METRICS.timer('ingest_batch', component='ingestion'):
+                    classifications = self.classifier.classify_packed(fresh, caller=BULK)
+                    self.result_store.append(self.version, [
+                        {**ticket, **classification} for ticket, classification in zip(fresh, classifications)
+                    ])
+            except Exception:
+                # Re-read from the last durable watermark; already appended tickets are skipped by id
+                self._pending_state = json.loads(json.dumps(self._state))
+                raise
+            self._seen_ids.update(ticket['id'] for ticket in fresh)
+            METRICS.increment('ingested_tickets', len(fresh), component='ingestion')
+            with self._lock:
+                self._stats['ingested'] += len(fresh)
+                self._stats['batches'] += 1
+                self._stats['last_batch_at'] = time.time()
+
+        if tickets:
+            self._dirty = True
+        if self._dirty and (time.monotonic() - self._last_flush >= self.flush_seconds or not tickets):
+            self._flush()
+        return len(tickets)
+
+    def run(self):
+        """Poll until stop() is called; drains backlogs without sleeping between full batches."""
+        while not self._stop.is_set():
+            try:
+                if self.poll_once() < self.batch_size:
+                    self._stop.wait(self.poll_seconds)
+            except Exception as e:
+                print(f"Inbox ingestion error: {e}")
+                with self._lock:
+                    self._stats['last_error'] = str(e)
+                self._stop.wait(self.poll_seconds)
+        if self._dirty:
+            self._flush()
+
+    def start(self) -> 'InboxIngestor':
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name="inbox-ingestor", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if not (self._thread and self._thread.is_alive()):
+            self.close()
+
+    def status(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['source'] = self.source
+        stats['running'] = bool(self._thread and self._thread.is_alive())
+        stats['files'] = len(self._state.get('files', {}))
+        return stats
+
+
+def main():
+    config = Config()
+    parser = argparse.ArgumentParser(description="Tail a JSONL inbox and classify new tickets into the result store")
+    parser.add_argument('--source', default=config.INBOX_PATH, help="directory of .jsonl drops or a .jsonl file")
+    parser.add_argument('--store-dir', default=config.RESULT_STORE_DIR or './result_store')
+    parser.add_argument('--once', action='store_true', help="ingest everything currently available, then exit")
+    args = parser.parse_args()
+    if not args.source:
+        raise SystemExit("Set --source or INBOX_PATH")
+
+    from ai_classifier import TicketClassifier
+    try:
+        ingestor = InboxIngestor(TicketClassifier(), ResultStore(args.store_dir), args.source)
+    except IngestorLockedError as e:
+        raise SystemExit(f"{e}; stop it (or the app's Live inbox) first")
+
+    if args.once:
+        while ingestor.poll_once():
+            pass
+        print(ingestor.status())
+        ingestor.close()
+        return
+
+    print(f"Watching {args.source} (results in {args.store_dir}, version '{ingestor.version}')")
+    ingestor.start()
+    try:
+        while True:
+            time.sleep(60)
+            print(ingestor.status())
+    except KeyboardInterrupt:
+        ingestor.stop()
+
+
+if __name__ == "__main__":
+    main()
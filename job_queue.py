@@ -0,0 +1,284 @@
+"""
+Background classification jobs decoupled from Streamlit reruns.
+
+Jobs run on a worker pool owned by the process (not by a script run), record
+each classified ticket into the shared ResultStore as it completes and append
+it to a partial-results file, so a rerun, a closed tab or even a restart does
+not throw away finished work. The UI polls get_status() for progress. A job
+cancelled on purpose keeps its partial results but leaves a marker, so a
+restart does not resume it on its own (was_cancelled()).
+
+Tickets are not classified in file order: a keyword pre-pass estimates each
+ticket's urgency and the LLM calls go through the shared LLMScheduler, so a P0
+ticket near the end of a large file is classified first. With a deduplicator,
+near-duplicate tickets share one LLM call and the labels are propagated.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from dedup import TicketDeduplicator
+from llm_scheduler import LLM_SCHEDULER, LLMScheduler, estimate_urgency
+from result_store import ResultStore
+
+# Job states
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class ClassificationJobQueue:
+    def __init__(self, classify_fn: Callable[[str, str], Dict], result_store: ResultStore,
+                 max_workers: int = 1, job_dir: Optional[str] = None,
+                 estimate_fn: Optional[Callable[[str, str], Dict]] = None,
+                 scheduler: Optional[LLMScheduler] = None,
+                 deduplicator: Optional[TicketDeduplicator] = None):
+        self.classify_fn = classify_fn
+        self.result_store = result_store
+        self.job_dir = job_dir
+        self.estimate_fn = estimate_fn  # cheap classification used only to order LLM work
+        self.scheduler = scheduler or LLM_SCHEDULER
+        self.deduplicator = deduplicator
+        self._partial_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="classify-job")
+        self._jobs: Dict[str, Dict] = {}
+        self._active_by_version: Dict[str, str] = {}
+        self._finished: Dict[str, threading.Event] = {}  # set when a job's worker exits
+        self._lock = threading.Lock()
+
+        if self.job_dir:
+            os.makedirs(self.job_dir, exist_ok=True)
+
+    def _partial_path(self, version: str) -> Optional[str]:
+        if not self.job_dir:
+            return None
+        return os.path.join(self.job_dir, f"{version}.partial.jsonl")
+
+    def _cancelled_path(self, version: str) -> Optional[str]:
+        if not self.job_dir:
+            return None
+        return os.path.join(self.job_dir, f"{version}.cancelled")
+
+    def _load_partial(self, version: str) -> Dict[int, Dict]:
+        """Load tickets already classified by an earlier, unfinished job."""
+        path = self._partial_path(version)
+        if not path or not os.path.exists(path):
+            return {}
+
+        done = {}
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash; everything before it is intact
+                    continue
+                done[entry['position']] = entry['ticket']
+        return done
+
+    def has_partial(self, version: str) -> bool:
+        """Whether an unfinished job left partial results for this version."""
+        path = self._partial_path(version)
+        return bool(path) and os.path.exists(path)
+
+    def was_cancelled(self, version: str) -> bool:
+        """Whether the last job for this version was cancelled (cleared when a new job starts)."""
+        path = self._cancelled_path(version)
+        return bool(path) and os.path.exists(path)
+
+    def submit(self, version: str, tickets: List[Dict], resume: bool = True) -> str:
+        """Queue a classification job for a dataset version.
+
+        If a job for the version is already pending or running, its id is
+        returned instead of starting a second one, unless resume=False: then
+        that job is cancelled and a new one starts from scratch once it exits.
+        """
+        with self._lock:
+            active_id = self._active_by_version.get(version)
+            if active_id is not None and resume:
+                return active_id
+            previous = None
+            if active_id is not None:
+                self._jobs[active_id]['cancel_requested'] = True
+                previous = self._finished[active_id]
+
+            job_id = uuid.uuid4().hex[:12]
+            self._jobs[job_id] = {
+                'id': job_id,
+                'version': version,
+                'status': PENDING,
+                'completed': 0,
+                'total': len(tickets),
+                'submitted_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'error': None,
+                'cancel_requested': False
+            }
+            self._active_by_version[version] = job_id
+            self._finished[job_id] = threading.Event()
+
+        self._executor.submit(self._run, job_id, tickets, resume, previous)
+        return job_id
+
+    def cancel(self, job_id: str):
+        """Ask a job to stop; tickets still queued on the scheduler are skipped."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job and job['status'] in (PENDING, RUNNING):
+                job['cancel_requested'] = True
+
+    def get_status(self, job_id: str) -> Optional[Dict]:
+        """Return a copy of a job's status for the UI to poll."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def active_job(self, version: str) -> Optional[Dict]:
+        """Return the status of the pending/running job for a version, if any."""
+        with self._lock:
+            job_id = self._active_by_version.get(version)
+            return dict(self._jobs[job_id]) if job_id else None
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _classify_cluster(self, job_id: str, version: str, members: List[int], tickets: List[Dict],
+                          similarity: Dict[int, float], partial_file):
+        """Classify a cluster's representative (members[0]) and record every member.
+
+        Runs on the scheduler in urgency order.
+        """
+        if self.get_status(job_id)['cancel_requested']:
+            return
+
+        representative = tickets[members[0]]
+        classification = self.classify_fn(representative['subject'], representative['body'])
+        for position in members:
+            if position == members[0]:
+                classified_ticket = {**representative, **classification}
+            else:
+                classified_ticket = TicketDeduplicator.propagate(
+                    tickets[position], classification, representative, similarity[position]
+                )
+            self.result_store.record(version, position, classified_ticket)
+
+            if partial_file:
+                with self._partial_lock:
+                    partial_file.write(json.dumps({'position': position, 'ticket': classified_ticket}) + "\n")
+                    partial_file.flush()
+
+        with self._lock:
+            self._jobs[job_id]['completed'] += len(members)
+
+    def _clusters(self, tickets: List[Dict], done: Dict[int, Dict]) -> List[Dict]:
+        """Group the not-yet-classified tickets; representative first in each member list."""
+        remaining = [position for position in range(len(tickets)) if position not in done]
+        if not self.deduplicator:
+            return [{'members': [position], 'similarity': {position: 1.0}} for position in remaining]
+
+        clusters = []
+        for cluster in self.deduplicator.cluster([tickets[position] for position in remaining]):
+            representative = remaining[cluster['representative']]
+            members = [representative] + [remaining[i] for i in cluster['members'] if remaining[i] != representative]
+            clusters.append({
+                'members': members,
+                'similarity': {remaining[i]: sim for i, sim in cluster['similarity'].items()}
+            })
+        return clusters
+
+    def _run(self, job_id: str, tickets: List[Dict], resume: bool = True,
+             previous: Optional[threading.Event] = None):
+        job = self.get_status(job_id)
+        version = job['version']
+        path = self._partial_path(version)
+
+        try:
+            if previous is not None:
+                # A restart: let the cancelled job finish writing before starting over
+                previous.wait()
+            self._update(job_id, status=RUNNING, started_at=time.time())
+            if not resume and path and os.path.exists(path):
+                os.remove(path)
+            if self.was_cancelled(version):
+                os.remove(self._cancelled_path(version))
+
+            # The keyword estimate seeds missing positions and ranks the LLM work; compute it once per ticket
+            estimates: Dict[int, Optional[Dict]] = {}
+
+            def estimate(position: int) -> Optional[Dict]:
+                if self.estimate_fn and position not in estimates:
+                    estimates[position] = self.estimate_fn(tickets[position]['subject'], tickets[position]['body'])
+                return estimates.get(position)
+
+            # Tickets complete in urgency order, so every position must exist before
+            # recording; seed any missing ones with the estimate (or unlabelled)
+            stored = self.result_store.get(version)
+            if stored is None or len(stored) < len(tickets):
+                stored_count = len(stored) if stored is not None else 0
+                for position in range(stored_count, len(tickets)):
+                    self.result_store.record(version, position, {**tickets[position], **(estimate(position) or {})})
+
+            done = self._load_partial(version)
+            for position, classified_ticket in done.items():
+                self.result_store.record(version, position, classified_ticket)
+            self._update(job_id, completed=len(done))
+
+            partial_file = open(path, 'a') if path else None
+            try:
+                futures = []
+                for cluster in self._clusters(tickets, done):
+                    # A cluster is as urgent as its most urgent member
+                    rank, tier = min(estimate_urgency(estimate(p)) for p in cluster['members'])
+                    futures.append(self.scheduler.submit(
+                        self._classify_cluster, job_id, version, cluster['members'], tickets,
+                        cluster['similarity'], partial_file, rank=rank, tier=tier, kind='classify'
+                    ))
+
+                # Wait for every ticket so none writes to the partial file after it is closed
+                first_error = None
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        if first_error is None:
+                            first_error = e
+                            # Let the job's remaining queued tickets skip their LLM call
+                            self._update(job_id, cancel_requested=True)
+                if first_error is not None:
+                    raise first_error
+            finally:
+                if partial_file:
+                    partial_file.close()
+
+            if self.get_status(job_id)['cancel_requested']:
+                cancelled_path = self._cancelled_path(version)
+                if cancelled_path:
+                    with open(cancelled_path, 'w') as f:
+                        f.write(job_id)
+                self._update(job_id, status=CANCELLED)
+                return
+
+            self.result_store.flush(version)
+            if path and os.path.exists(path):
+                os.remove(path)
+            self._update(job_id, status=COMPLETED)
+
+        except Exception as e:
+            print(f"Classification job {job_id} failed: {e}")
+            self._update(job_id, status=FAILED, error=str(e))
+
+        finally:
+            self._update(job_id, finished_at=time.time())
+            with self._lock:
+                if self._active_by_version.get(version) == job_id:
+                    del self._active_by_version[version]
+                self._finished.pop(job_id).set()
@@ -0,0 +1,235 @@
+"""
+Pool of LLM backends (several Cohere keys, optionally Gemini) behind one chat() call.
+
+Each backend has its own rate limiter and its own circuit breaker (health), so
+throughput scales with the number of configured credentials: a trial Cohere key
+allows 10 calls/min, three keys allow 30. Every call is routed least-loaded
+first, meaning to the healthy backend whose next free rate-limit slot comes
+soonest. A call that fails with a transient error (429, 5xx, network) marks
+that backend and is retried on the next one.
+
+LLMPool mirrors the cohere.Client.chat interface, so TicketClassifier and
+RAGSystem use it as their client; stub clients can be pooled the same way for
+tests and benchmarks:
+
+    pool = LLMPool([LLMBackend(f"stub-{i}", StubCohereClient(), calls_per_minute=10) for i in range(3)])
+    classifier = TicketClassifier(cohere_client=pool)
+"""
+
+import inspect
+import threading
+import time
+from typing import Dict, List, Optional
+
+from circuit_breaker import OPEN, CircuitBreaker, CircuitOpenError, is_transient_error
+from config import Config
+from metrics import METRICS
+
+
+class LLMBackendError(Exception):
+    """Provider error normalised to carry an HTTP status, so transient failures are recognised."""
+
+    def __init__(self, message: str, http_status: Optional[int] = None):
+        super().__init__(message)
+        self.http_status = http_status
+
+
+class GeminiChatResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.token_count = None  # not reported by this SDK version; callers estimate
+
+
+class GeminiChatClient:
+    """Adapter giving google.generativeai the chat(...) interface used for Cohere."""
+
+    def __init__(self, api_key: str, model: str):
+        # Optional dependency, only needed when a Gemini backend is configured
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)  # process-wide in this SDK, so one Gemini key is supported
+        self._genai = genai
+        self._model = genai.GenerativeModel(model)
+
+    def chat(self, message: str = "", model: str = None, max_tokens: int = None,
+             temperature: float = None, preamble_override: Optional[str] = None, **kwargs) -> GeminiChatResponse:
+        # No system instructions in this SDK version: the preamble leads the prompt
+        prompt = f"{preamble_override}\n\n{message}" if preamble_override else message
+        try:
+            response = self._model.generate_content(
+                prompt,
+                generation_config=self._genai.types.GenerationConfig(
+                    max_output_tokens=max_tokens, temperature=temperature
+                )
+            )
+            return GeminiChatResponse(response.text)
+        except Exception as e:
+            status = getattr(e, 'code', None)
+            raise LLMBackendError(f"Gemini error: {e}", status if isinstance(status, int) else None) from e
+
+
+class LLMBackend:
+    def __init__(self, name: str, client, calls_per_minute: float, breaker: CircuitBreaker = None):
+        self.name = name
+        self.client = client
+        self.min_interval = 60.0 / calls_per_minute if calls_per_minute else 0.0
+        # Health per credential; retries happen across backends, not on the same one
+        self.breaker = breaker or CircuitBreaker(f"llm:{name}", max_retries=0)
+        try:
+            self.accepts_response_format = 'response_format' in inspect.signature(client.chat).parameters
+        except (TypeError, ValueError):
+            self.accepts_response_format = False
+        self.next_slot = 0.0
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+
+
+class LLMPool:
+    # Callers can skip their own single-key rate limiting: each backend is limited here
+    handles_rate_limits = True
+
+    def __init__(self, backends: List[LLMBackend]):
+        if not backends:
+            raise ValueError("LLMPool needs at least one backend")
+        self.backends = backends
+        self._lock = threading.Lock()
+
+    def _acquire(self, exclude: set) -> Optional[LLMBackend]:
+        """Reserve the earliest rate-limit slot among healthy backends; returns None if none is usable."""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [b for b in self.backends if b.name not in exclude and b.breaker.state != OPEN]
+            if not candidates:
+                return None
+            backend = min(candidates, key=lambda b: (max(b.next_slot, now), b.in_flight))
+            slot = max(backend.next_slot, now)
+            backend.next_slot = slot + backend.min_interval
+            backend.in_flight += 1
+
+        wait = slot - time.monotonic()
+        if wait > 0:
+            with METRICS.timer('rate_limit_wait', component='llm_pool'):
+                time.sleep(wait)
+        return backend
+
+    def estimated_wait(self) -> float:
+        """Seconds until the soonest healthy backend could take a new call."""
+        with self._lock:
+            now = time.monotonic()
+            slots = [max(b.next_slot - now, 0.0) for b in self.backends if b.breaker.state != OPEN]
+        return min(slots) if slots else 0.0
+
+    def chat(self, message: str = "", response_format: Optional[Dict] = None, **kwargs):
+        tried = set()
+        last_error: Optional[Exception] = None
+        while len(tried) < len(self.backends):
+            backend = self._acquire(tried)
+            if backend is None:
+                break
+            tried.add(backend.name)
+            try:
+                if not backend.breaker.allow_request():
+                    continue
+                call_kwargs = dict(kwargs)
+                if response_format and backend.accepts_response_format:
+                    call_kwargs['response_format'] = response_format
+                with METRICS.timer('llm_call', component='llm_pool', backend=backend.name):
+                    response = backend.client.chat(message=message, **call_kwargs)
+                backend.breaker.record_success()
+                with self._lock:
+                    backend.calls += 1
+                METRICS.increment('pool_calls', backend=backend.name)
+                return response
+            except Exception as e:
+                # Rejected credentials are the backend's fault too; other errors are the request's
+                if not (is_transient_error(e) or getattr(e, 'http_status', None) in (401, 403)):
+                    backend.breaker.record_ignored()
+                    raise
+                backend.breaker.record_failure()
+                with self._lock:
+                    backend.failures += 1
+                METRICS.increment('pool_failures', backend=backend.name)
+                last_error = e
+                print(f"LLM backend '{backend.name}' failed ({e}); trying another backend")
+            finally:
+                with self._lock:
+                    backend.in_flight -= 1
+
+        if last_error is not None:
+            raise last_error
+        raise CircuitOpenError("all LLM backends are unavailable")
+
+    def reset(self):
+        """Close every backend's circuit and clear slots and counters (tests, benchmarks)."""
+        with self._lock:
+            for backend in self.backends:
+                backend.breaker.reset()
+                backend.next_slot = 0.0
+                backend.calls = backend.failures = 0
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            now = time.monotonic()
+            backends = [(b, b.in_flight, b.calls, b.failures, max(b.next_slot - now, 0.0)) for b in self.backends]
+        return [
+            {
+                'backend': backend.name,
+                'state': backend.breaker.state,
+                'in_flight': in_flight,
+                'calls': calls,
+                'failures': failures,
+                'next_slot_s': round(next_slot, 2)
+            }
+            for backend, in_flight, calls, failures, next_slot in backends
+        ]
+
+
+def build_llm_pool(config: Config = None) -> Optional[LLMPool]:
+    """Pool of every configured credential, or None when no LLM backend is configured."""
+    config = config or Config()
+    if not config.USE_COHERE:
+        return None  # USE_COHERE switches LLM calls on or off as a whole
+    backends = []
+
+    import cohere
+    keys = [config.COHERE_API_KEY] + [key for key in config.COHERE_API_KEYS if key != config.COHERE_API_KEY]
+    for i, key in enumerate(k for k in keys if k):
+        try:
+            # Retries are handled by the pool (other keys) and the shared circuit breaker
+            client = cohere.Client(key, max_retries=0, timeout=config.LLM_TIMEOUT_SECONDS)
+        except Exception as e:
+            print(f"Failed to initialize Cohere client {i + 1}: {e}")
+            continue
+        backends.append(LLMBackend(f"cohere-{i + 1}", client, config.COHERE_CALLS_PER_MINUTE))
+
+    if config.USE_GEMINI and config.GOOGLE_API_KEY:
+        try:
+            client = GeminiChatClient(config.GOOGLE_API_KEY, config.GEMINI_MODEL)
+            backends.append(LLMBackend("gemini", client, config.GEMINI_CALLS_PER_MINUTE))
+        except Exception as e:
+            print(f"Failed to initialize Gemini client: {e}")
+
+    return LLMPool(backends) if backends else None
+
+
+_DEFAULT_POOL: Optional[LLMPool] = None
+_DEFAULT_POOL_BUILT = False
+_DEFAULT_POOL_LOCK = threading.Lock()
+
+
+def get_llm_pool() -> Optional[LLMPool]:
+    """Process-wide pool shared by TicketClassifier and RAGSystem (so keys are not double-booked)."""
+    global _DEFAULT_POOL, _DEFAULT_POOL_BUILT
+    with _DEFAULT_POOL_LOCK:
+        if not _DEFAULT_POOL_BUILT:
+            _DEFAULT_POOL = build_llm_pool()
+            _DEFAULT_POOL_BUILT = True
+        return _DEFAULT_POOL
+
+
+def set_llm_pool(pool: Optional[LLMPool]):
+    """Replace the process-wide pool, e.g. with stub backends for load tests."""
+    global _DEFAULT_POOL, _DEFAULT_POOL_BUILT
+    with _DEFAULT_POOL_LOCK:
+        _DEFAULT_POOL = pool
+        _DEFAULT_POOL_BUILT = True
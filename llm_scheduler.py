@@ -0,0 +1,171 @@
+"""
+Priority-aware scheduling of rate-limited LLM work.
+
+Under the trial rate limit only a handful of LLM calls run per minute, so the
+order they run in decides how long an urgent ticket waits. LLMScheduler runs
+submitted calls in urgency order, estimated from a cheap keyword pre-pass:
+P0 before P1 before P2, frustrated/angry tickets slightly ahead within a tier,
+and interactive requests ahead of bulk work.
+
+Interactive calls (agent-tab answers) get their own lane with dedicated
+workers (LLM_SCHEDULER_INTERACTIVE_WORKERS), so they never queue behind bulk
+classification or FAQ generation already in flight; the lanes still share the
+provider's rate limit. estimated_wait() gives the expected queueing delay of a
+lane from its depth and recent call durations.
+
+Aging prevents starvation: an item's effective rank improves by one level for
+every `aging_seconds` it has waited. Because every queued item ages at the same
+rate, ordering by (rank + enqueued_at / aging_seconds) is equivalent and stays
+fixed, so a plain heap suffices.
+
+Time from submission to completion is recorded per tier as the
+`time_to_<kind>` histogram (e.g. time_to_classify{tier="P0"}).
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import Config
+from metrics import METRICS
+
+_PRIORITY_RANKS = {"P0 (High)": 0.0, "P1 (Medium)": 1.0, "P2 (Low)": 2.0}
+_URGENT_SENTIMENTS = ("Frustrated", "Angry")
+_BULK_LANE = 'bulk'
+_INTERACTIVE_LANE = 'interactive'
+_SERVICE_TIME_SMOOTHING = 0.2  # weight of the newest call in the running average duration
+
+
+def estimate_urgency(classification: Optional[Dict], interactive: bool = False) -> Tuple[float, str]:
+    """Map a (usually keyword) classification to a scheduling rank and tier label.
+
+    Lower ranks run first. Unknown priorities are treated as P2.
+    """
+    classification = classification or {}
+    priority = classification.get('priority', "P2 (Low)")
+    rank = _PRIORITY_RANKS.get(priority, 2.0)
+    if classification.get('sentiment') in _URGENT_SENTIMENTS:
+        rank -= 0.5
+    if interactive:
+        rank -= 1.0
+    tier = priority.split(" ", 1)[0] if priority in _PRIORITY_RANKS else "P2"
+    return rank, tier
+
+
+class LLMScheduler:
+    def __init__(self, workers: int = None, aging_seconds: float = None, interactive_workers: int = None):
+        config = Config()
+        self.workers = workers or config.LLM_SCHEDULER_WORKERS
+        self.aging_seconds = aging_seconds or config.LLM_SCHEDULER_AGING_SECONDS
+        # 0 puts interactive calls in the bulk lane (ahead of bulk work, but behind calls in flight)
+        self.interactive_workers = (interactive_workers if interactive_workers is not None
+                                    else config.LLM_SCHEDULER_INTERACTIVE_WORKERS)
+        self._heaps: Dict[str, List] = {_BULK_LANE: [], _INTERACTIVE_LANE: []}
+        self._running: Dict[str, int] = {_BULK_LANE: 0, _INTERACTIVE_LANE: 0}
+        self._service_time: Dict[str, Optional[float]] = {_BULK_LANE: None, _INTERACTIVE_LANE: None}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+
+    def _ensure_started(self):
+        # Started lazily so importing the module does not spawn threads
+        if not self._threads:
+            lanes = [(_BULK_LANE, self.workers), (_INTERACTIVE_LANE, self.interactive_workers)]
+            for lane, count in lanes:
+                for i in range(count):
+                    thread = threading.Thread(target=self._worker, args=(lane,), name=f"llm-scheduler-{lane}-{i}",
+                                              daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+    def _lane(self, interactive: bool) -> str:
+        return _INTERACTIVE_LANE if interactive and self.interactive_workers > 0 else _BULK_LANE
+
+    def _lane_workers(self, lane: str) -> int:
+        return self.interactive_workers if lane == _INTERACTIVE_LANE else self.workers
+
+    def submit(self, fn: Callable, *args, rank: float = 2.0, tier: str = "P2",
+               kind: str = "classify", interactive: bool = False, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) to run in urgency order; returns a Future.
+
+        interactive=True runs it on the interactive lane's own workers.
+        """
+        future = Future()
+        enqueued_at = time.monotonic()
+        key = rank + enqueued_at / self.aging_seconds
+        with self._condition:
+            self._ensure_started()
+            heapq.heappush(self._heaps[self._lane(interactive)],
+                           (key, next(self._sequence), enqueued_at, tier, kind, fn, args, kwargs, future))
+            self._condition.notify_all()
+        return future
+
+    def queue_depth(self, interactive: Optional[bool] = None) -> int:
+        """Queued calls in one lane, or in both when interactive is None."""
+        with self._condition:
+            if interactive is None:
+                return sum(len(heap) for heap in self._heaps.values())
+            return len(self._heaps[self._lane(interactive)])
+
+    def estimated_wait(self, interactive: bool = False) -> float:
+        """Seconds a call submitted now would queue before a worker of its lane picks it up."""
+        lane = self._lane(interactive)
+        with self._condition:
+            ahead = len(self._heaps[lane]) + self._running[lane]
+            service_time = self._service_time[lane] or 0.0
+        workers = self._lane_workers(lane)
+        return max(0, ahead + 1 - workers) / workers * service_time
+
+    def _worker(self, lane: str):
+        heap = self._heaps[lane]
+        while True:
+            with self._condition:
+                while not heap:
+                    self._condition.wait()
+                _, _, enqueued_at, tier, kind, fn, args, kwargs, future = heapq.heappop(heap)
+                self._running[lane] += 1
+
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                started = time.monotonic()
+                METRICS.observe('scheduler_wait', started - enqueued_at, kind=kind, tier=tier)
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+                finished = time.monotonic()
+                METRICS.observe(f'time_to_{kind}', finished - enqueued_at, tier=tier)
+                with self._condition:
+                    previous = self._service_time[lane]
+                    duration = finished - started
+                    self._service_time[lane] = duration if previous is None else (
+                        previous + _SERVICE_TIME_SMOOTHING * (duration - previous))
+            finally:
+                with self._condition:
+                    self._running[lane] -= 1
+
+
+def tier_report(kind: str = "classify") -> List[Dict]:
+    """Time-to-<kind> percentiles per priority tier, from the metrics registry."""
+    rows = [
+        {
+            'tier': h['labels'].get('tier', ''),
+            'count': h['count'],
+            'p50_s': round(h['p50'], 2),
+            'p95_s': round(h['p95'], 2),
+            'p99_s': round(h['p99'], 2)
+        }
+        for h in METRICS.snapshot()['histograms']
+        if h['name'] == f'time_to_{kind}'
+    ]
+    return sorted(rows, key=lambda row: row['tier'])
+
+
+# Shared by background classification jobs and deferred answer generation
+LLM_SCHEDULER = LLMScheduler()
@@ -0,0 +1,344 @@
+"""
+Concurrent-session load test for the Streamlit app.
+
+Starts app.py under a real `streamlit run` server and connects N browser-less
+clients to it over Streamlit's websocket protocol. Each client loads the page
+(dashboard and agent tabs), submits tickets on the agent tab and reruns, with
+think time in between, so script runs from different sessions overlap exactly
+as they do for real users of one container. The server's LLM is a pool of
+StubCohereClient backends, so no quota is used and latency is configurable;
+@st.cache_resource objects (embedding model, Chroma, result store, job queue)
+are shared by all sessions as in production. A warm-up session loads them
+before anything is measured.
+
+Reported per session count, from the server process:
+
+    rerun latency   p50/p95/p99 from sending a rerun to the script finishing (including any reruns
+                    the app triggers itself), overall and for agent submissions
+    memory          server RSS growth per connected session
+    CPU             server CPU seconds per wall second, as a share of the available cores
+
+    python load_test.py --sessions 1,5,10,20 --iterations 3
+    python load_test.py --sessions 10 --llm-latency-ms 800 --output load_test.json
+
+Run it from the repository root (the app reads sample_tickets.json and
+./chroma_db); server stats are read from /proc, so it needs Linux (as in the
+container). The largest session count whose p95 stays under --p95-target-ms,
+with CPU below saturation, is the per-replica capacity for sizing
+docker-compose.yml.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import runpy
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List, Tuple
+
+from benchmark import _percentile, make_synthetic_tickets
+
+_SUBJECT_LABEL = "Ticket Subject"
+_BODY_LABEL = "Ticket Body"
+_SUBMIT_LABEL = "🚀 Analyze Ticket"
+_SAMPLE_SECONDS = 0.25
+
+
+def serve_app():
+    """Entry point inside the streamlit server: install the stub LLM pool once, then run the app."""
+    import streamlit as st
+
+    @st.cache_resource(show_spinner=False)  # the app must still be first to call set_page_config
+    def install_stub_pool():
+        from llm_pool import LLMBackend, LLMPool, set_llm_pool
+        from stub_llm import StubCohereClient
+        client = StubCohereClient(latency_ms=float(os.environ['LOAD_TEST_LLM_LATENCY_MS']),
+                                  seed=int(os.environ['LOAD_TEST_SEED']))
+        per_key_rpm = float(os.environ['LOAD_TEST_PER_KEY_RPM'])
+        set_llm_pool(LLMPool([
+            LLMBackend(f"stub-{i + 1}", client, per_key_rpm) for i in range(int(os.environ['LOAD_TEST_POOL_SIZE']))
+        ]))
+
+    install_stub_pool()
+    runpy.run_path(os.environ['LOAD_TEST_APP'], run_name='__main__')
+
+
+def process_stats(pid: int) -> Tuple[int, float]:
+    """Resident set size (bytes) and CPU time used so far (seconds) of a process."""
+    with open(f'/proc/{pid}/statm', 'r') as f:
+        rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    with open(f'/proc/{pid}/stat', 'r') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')  # utime + stime
+    return rss, cpu_seconds
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class AppServer:
+    """`streamlit run` of this module, serving the app with the stub LLM pool."""
+
+    def __init__(self, app_path: str, llm_latency_ms: float, pool_size: int, per_key_rpm: float, seed: int):
+        self.port = _free_port()
+        self.log = tempfile.NamedTemporaryFile(prefix='load_test_server_', suffix='.log', delete=False)
+        env = dict(os.environ, LOAD_TEST_APP=os.path.abspath(app_path), LOAD_TEST_LLM_LATENCY_MS=str(llm_latency_ms),
+                   LOAD_TEST_POOL_SIZE=str(max(1, pool_size)), LOAD_TEST_PER_KEY_RPM=str(per_key_rpm),
+                   LOAD_TEST_SEED=str(seed))
+        # The module's directory (the repository) is on the script path, so the app's imports resolve
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', os.path.abspath(__file__), '--server.headless', 'true',
+             '--server.port', str(self.port), '--browser.gatherUsageStats', 'false'],
+            stdout=self.log, stderr=subprocess.STDOUT, env=env
+        )
+
+    @property
+    def stream_url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}/_stcore/stream"
+
+    def wait_ready(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise SystemExit(f"Streamlit server exited; see {self.log.name}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/_stcore/health", timeout=2) as response:
+                    if response.status == 200:
+                        return
+            except OSError:
+                time.sleep(0.5)
+        raise SystemExit(f"Streamlit server did not start within {timeout:.0f}s; see {self.log.name}")
+
+    def stats(self) -> Tuple[int, float]:
+        return process_stats(self.process.pid)
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class ClientSession:
+    """One simulated user: a websocket session driving the app like a browser tab."""
+
+    def __init__(self, url: str, tickets: List[Dict], think_seconds: float, timeout: float, seed: int):
+        self.url = url
+        self.tickets = tickets
+        self.think_seconds = think_seconds
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.latencies: Dict[str, List[float]] = {'load': [], 'agent_submit': [], 'rerun': []}
+        self.errors: List[str] = []
+        self._widget_ids: Dict[str, str] = {}
+        self._form_values: Dict[str, str] = {}
+        self._ws = None
+
+    async def _rerun(self, action: str, widgets: List = ()):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        message.rerun_script.widget_states.widgets.extend(widgets)
+        started = time.perf_counter()
+        await self._ws.write_message(message.SerializeToString(), binary=True)
+
+        deadline = started + self.timeout
+        while True:
+            data = await asyncio.wait_for(self._ws.read_message(), timeout=max(deadline - time.perf_counter(), 0.01))
+            if data is None:
+                raise ConnectionError("server closed the session")
+            forward = ForwardMsg()
+            forward.ParseFromString(data)
+            kind = forward.WhichOneof('type')
+            if kind == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+                self._collect(forward.delta.new_element)
+            elif kind == 'script_finished' and forward.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                break
+        self.latencies[action].append(time.perf_counter() - started)
+
+    def _collect(self, element):
+        kind = element.WhichOneof('type')
+        if kind in ('text_input', 'text_area', 'button'):
+            widget = getattr(element, kind)
+            self._widget_ids[widget.label] = widget.id
+        elif kind == 'exception':
+            self.errors.append(element.exception.message)
+
+    def _text_states(self) -> List:
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+        states = []
+        for label, value in self._form_values.items():
+            state = WidgetState(id=self._widget_ids[label])
+            state.string_value = value
+            states.append(state)
+        return states
+
+    async def _think(self):
+        if self.think_seconds:
+            await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.think_seconds)
+
+    async def _submit_ticket(self):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+        if not all(label in self._widget_ids for label in (_SUBJECT_LABEL, _BODY_LABEL, _SUBMIT_LABEL)):
+            self.errors.append("agent form not found")
+            return
+        ticket = self.rng.choice(self.tickets)
+        self._form_values = {_SUBJECT_LABEL: ticket['subject'], _BODY_LABEL: ticket['body']}
+        submit = WidgetState(id=self._widget_ids[_SUBMIT_LABEL])
+        submit.trigger_value = True
+        await self._rerun('agent_submit', self._text_states() + [submit])
+
+    async def run(self, iterations: int):
+        from tornado.websocket import websocket_connect
+        try:
+            self._ws = await websocket_connect(self.url, max_message_size=256 * 1024 * 1024)
+            await self._rerun('load')
+            for _ in range(iterations):
+                await self._think()
+                await self._submit_ticket()
+                await self._think()
+                await self._rerun('rerun', self._text_states())
+        except Exception as e:
+            self.errors.append(f"{type(e).__name__}: {e}")
+        finally:
+            if self._ws is not None:
+                self._ws.close()  # ends the server-side session, as closing the tab would
+
+
+async def _run_sessions(sessions: List[ClientSession], iterations: int, server: AppServer) -> int:
+    """Run every session concurrently; returns the server's peak RSS while they were connected."""
+    peak_rss = 0
+    tasks = [asyncio.ensure_future(session.run(iterations)) for session in sessions]
+    while not all(task.done() for task in tasks):
+        peak_rss = max(peak_rss, server.stats()[0])
+        await asyncio.wait(tasks, timeout=_SAMPLE_SECONDS)
+    return max(peak_rss, server.stats()[0])
+
+
+def run_level(server: AppServer, sessions: int, iterations: int, tickets: List[Dict], think_seconds: float,
+              timeout: float, seed: int) -> Dict:
+    """Connect `sessions` concurrent clients, run their scripted visits and summarise."""
+    rss_before, cpu_before = server.stats()
+    clients = [ClientSession(server.stream_url, tickets, think_seconds, timeout, seed + i) for i in range(sessions)]
+    wall_started = time.perf_counter()
+    peak_rss = asyncio.run(_run_sessions(clients, iterations, server))
+    wall_seconds = time.perf_counter() - wall_started
+    cpu_seconds = server.stats()[1] - cpu_before
+
+    latencies = {action: [x for c in clients for x in c.latencies[action]] for action in clients[0].latencies}
+    all_runs = [x for samples in latencies.values() for x in samples]
+    return {
+        'sessions': sessions,
+        'script_runs': len(all_runs),
+        'runs_per_sec': round(len(all_runs) / wall_seconds, 2) if wall_seconds else 0.0,
+        'p50_ms': round(_percentile(all_runs, 0.50) * 1000, 1),
+        'p95_ms': round(_percentile(all_runs, 0.95) * 1000, 1),
+        'p99_ms': round(_percentile(all_runs, 0.99) * 1000, 1),
+        'by_action': {
+            action: {
+                'p50_ms': round(_percentile(samples, 0.50) * 1000, 1),
+                'p95_ms': round(_percentile(samples, 0.95) * 1000, 1)
+            }
+            for action, samples in latencies.items()
+        },
+        'cpu_percent_of_cores': round(100 * cpu_seconds / (wall_seconds * available_cores()), 1),
+        'server_rss_mb': round(peak_rss / 1e6, 1),
+        'rss_per_session_mb': round(max(peak_rss - rss_before, 0) / sessions / 1e6, 2),
+        'errors': [error for c in clients for error in c.errors]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent Streamlit sessions against app.py")
+    parser.add_argument('--app', default='app.py')
+    parser.add_argument('--sessions', default='1,5,10', help="comma-separated concurrent session counts")
+    parser.add_argument('--iterations', type=int, default=3, help="agent submissions per session")
+    parser.add_argument('--think-ms', type=float, default=500.0, help="mean pause between a user's actions")
+    parser.add_argument('--llm-latency-ms', type=float, default=300.0)
+    parser.add_argument('--pool-size', type=int, default=1, help="stub LLM backends")
+    parser.add_argument('--per-key-rpm', type=float, default=0.0, help="calls per minute per backend (0: unlimited)")
+    parser.add_argument('--timeout', type=float, default=120.0, help="seconds allowed per script run")
+    parser.add_argument('--startup-timeout', type=float, default=120.0)
+    parser.add_argument('--p95-target-ms', type=float, default=2000.0)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', metavar='PATH', help="also write the results as JSON")
+    args = parser.parse_args()
+
+    tickets = make_synthetic_tickets(50, seed=args.seed)
+    levels = [int(level) for level in args.sessions.split(',') if level.strip()]
+
+    server = AppServer(args.app, args.llm_latency_ms, args.pool_size, args.per_key_rpm, args.seed)
+    try:
+        server.wait_ready(args.startup_timeout)
+        rss_start = server.stats()[0]
+
+        # Warm-up: load cached resources (embedding model, vector store) before measuring
+        started = time.perf_counter()
+        warmup = ClientSession(server.stream_url, tickets, 0.0, max(args.timeout, args.startup_timeout), args.seed)
+        asyncio.run(warmup.run(iterations=1))
+        if warmup.errors:
+            raise SystemExit(f"Warm-up session failed: {warmup.errors[0]} (server log: {server.log.name})")
+        rss_shared = server.stats()[0]
+        print(f"Warm-up {time.perf_counter() - started:.1f}s; shared resources {(rss_shared - rss_start) / 1e6:.0f} MB "
+              f"(server {rss_shared / 1e6:.0f} MB), {available_cores()} core(s)")
+
+        results = []
+        print(f"{'sessions':>8}{'runs/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'submit p95':>11}"
+              f"{'CPU %':>7}{'MB/sess':>9}{'errors':>7}")
+        for sessions in levels:
+            r = run_level(server, sessions, args.iterations, tickets, args.think_ms / 1000.0, args.timeout, args.seed)
+            results.append(r)
+            print(f"{r['sessions']:>8}{r['runs_per_sec']:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}"
+                  f"{r['by_action']['agent_submit']['p95_ms']:>11}{r['cpu_percent_of_cores']:>7}"
+                  f"{r['rss_per_session_mb']:>9}{len(r['errors']):>7}")
+            for error in sorted(set(r['errors']))[:5]:
+                print(f"  error: {error}")
+    finally:
+        server.stop()
+
+    within_target = [r['sessions'] for r in results if r['p95_ms'] <= args.p95_target_ms and not r['errors']]
+    if within_target:
+        print(f"Up to {max(within_target)} concurrent sessions per replica keep p95 under {args.p95_target_ms:.0f} ms")
+    else:
+        print(f"No tested session count keeps p95 under {args.p95_target_ms:.0f} ms")
+
+    if args.output:
+        settings = {k: v for k, v in vars(args).items() if k != 'output'}
+        with open(args.output, 'w') as f:
+            json.dump({'settings': settings, 'shared_resources_mb': round((rss_shared - rss_start) / 1e6, 1),
+                       'results': results}, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+
+def _running_in_streamlit() -> bool:
+    try:
+        from streamlit import runtime
+        return runtime.exists()
+    except ImportError:
+        return False
+
+
+if __name__ == "__main__":
+    if _running_in_streamlit():
+        serve_app()
+    else:
+        main()
@@ -0,0 +1,189 @@
+"""
+Staged processing pipeline with bounded queues and per-stage concurrency.
+
+Each Stage runs its own worker threads that take batches (up to batch_size
+items) from the stage's bounded input queue, call the stage function on the
+batch and put the results on the next stage's queue. A full queue blocks the
+stage feeding it, so a slow stage (e.g. LLM generation) throttles the stages
+before it instead of letting items pile up in memory. Stages are tuned
+independently: more workers for I/O-bound LLM calls, larger batches for
+embedding passes.
+
+    pipeline = Pipeline([
+        Stage('classify', classify_batch, workers=2, batch_size=8),
+        Stage('write', write_batch),
+    ])
+    stats = pipeline.run(items)
+
+A stage function takes a list of items and returns a list of the same length.
+When it raises, the batch's items are marked with 'pipeline_error' and passed
+straight to the last stage (the sink), so failures are still recorded.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from metrics import METRICS
+
+_DONE = object()  # end-of-input marker, one per downstream worker
+
+
+def _failed(item: Any) -> bool:
+    return isinstance(item, dict) and 'pipeline_error' in item
+
+
+class Stage:
+    def __init__(self, name: str, fn: Callable[[List[Any]], List[Any]], workers: int = 1,
+                 batch_size: int = 1, queue_size: int = 64):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+        self._stats_lock = threading.Lock()
+        self._stats = {'items_in': 0, 'items_out': 0, 'errors': 0, 'batches': 0, 'busy_seconds': 0.0,
+                       'max_queue_depth': 0}
+        self._active_workers = 0
+
+    def _take_batch(self) -> Tuple[List[Any], bool]:
+        """Block for the first item, then take whatever else is queued up to batch_size; True once input ended."""
+        batch = []
+        item = self.queue.get()
+        while item is not _DONE:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                return batch, False
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return batch, False
+        return batch, True
+
+    def put(self, item: Any):
+        self.queue.put(item)  # blocks while the queue is full (backpressure)
+        if item is _DONE:
+            return
+        depth = self.queue.qsize()
+        with self._stats_lock:
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], depth)
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['workers'] = self.workers
+        stats['batch_size'] = self.batch_size
+        stats['queue_depth'] = self.queue.qsize()
+        return stats
+
+
+class Pipeline:
+    def __init__(self, stages: List[Stage]):
+        if not stages:
+            raise ValueError("Pipeline needs at least one stage")
+        self.stages = stages
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    def _run_batch(self, stage: Stage, batch: List[Any]) -> List[Any]:
+        is_sink = stage is self.stages[-1]
+        # Items that failed upstream skip straight to the sink
+        failed = [] if is_sink else [item for item in batch if _failed(item)]
+        todo = batch if is_sink else [item for item in batch if not _failed(item)]
+        results = []
+        if todo:
+            started = time.monotonic()
+            try:
+                with METRICS.timer('pipeline_stage', stage=stage.name):
+                    results = stage.fn(todo)
+                if len(results) != len(todo):
+                    raise ValueError(f"{stage.name}: stage returned {len(results)} results for {len(todo)} items")
+            except Exception as e:
+                print(f"Pipeline stage '{stage.name}' failed on a batch of {len(todo)}: {e}")
+                METRICS.increment('pipeline_errors', stage=stage.name)
+                with stage._stats_lock:
+                    stage._stats['errors'] += len(todo)
+                for item in todo:
+                    if isinstance(item, dict):
+                        item['pipeline_error'] = f"{stage.name}: {e}"
+                results = [] if is_sink else todo
+            with stage._stats_lock:
+                stage._stats['busy_seconds'] += time.monotonic() - started
+        with stage._stats_lock:
+            stage._stats['items_in'] += len(batch)
+            stage._stats['batches'] += 1
+            stage._stats['items_out'] += len(results) + len(failed)
+        return results + failed
+
+    def _forward(self, index: int, items: List[Any]):
+        if index + 1 >= len(self.stages):
+            return
+        downstream = self.stages[index + 1]
+        for item in items:
+            # Errors jump to the sink rather than through the remaining stages
+            target = self.stages[-1] if _failed(item) else downstream
+            target.put(item)
+
+    def _worker(self, index: int):
+        stage = self.stages[index]
+        done = False
+        while not done:
+            batch, done = stage._take_batch()
+            if batch:
+                self._forward(index, self._run_batch(stage, batch))
+        with stage._stats_lock:
+            stage._active_workers -= 1
+            last = stage._active_workers == 0
+        if last and index + 1 < len(self.stages):
+            downstream = self.stages[index + 1]
+            for _ in range(downstream.workers):
+                downstream.put(_DONE)
+
+    def _feed(self, items: Iterable[Any]):
+        first = self.stages[0]
+        for item in items:
+            first.put(item)
+        for _ in range(first.workers):
+            first.put(_DONE)
+
+    def run(self, items: Iterable[Any], progress: Callable[[Dict], None] = None,
+            progress_interval: float = 2.0) -> Dict:
+        """Push every item through all stages; returns the final stats."""
+        self._started = time.monotonic()
+        self._finished = None
+        threads = [threading.Thread(target=self._feed, args=(items,), name="pipeline-feed", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            stage._active_workers = stage.workers
+            threads.extend(
+                threading.Thread(target=self._worker, args=(index,), name=f"pipeline-{stage.name}-{i}", daemon=True)
+                for i in range(stage.workers)
+            )
+        for thread in threads:
+            thread.start()
+
+        sink_threads = threads[-self.stages[-1].workers:]
+        for thread in sink_threads:
+            while thread.is_alive():
+                thread.join(timeout=progress_interval)
+                if progress and thread.is_alive():
+                    progress(self.stats())
+        for thread in threads:
+            thread.join()
+        self._finished = time.monotonic()
+        return self.stats()
+
+    def stats(self) -> Dict:
+        """Elapsed time plus per-stage throughput, utilisation and queue depth."""
+        if self._started is None:
+            return {'elapsed_seconds': 0.0, 'stages': []}
+        elapsed = (self._finished or time.monotonic()) - self._started
+        stages = []
+        for stage in self.stages:
+            stats = stage.stats()
+            stats['name'] = stage.name
+            stats['items_per_second'] = stats['items_out'] / elapsed if elapsed > 0 else 0.0
+            # Share of the stage's worker time spent inside the stage function
+            stats['busy_percent'] = 100.0 * stats['busy_seconds'] / (elapsed * stage.workers) if elapsed > 0 else 0.0
+            stages.append(stats)
+        return {'elapsed_seconds': elapsed, 'stages': stages}
@@ -0,0 +1,142 @@
+"""
+On-demand profiling of live classify/answer requests.
+
+PROFILER.arm(n) (the sidebar's Profiling panel, POST /profile on the API, or
+PROFILE_REQUESTS at startup) makes the next n requests run under cProfile and
+tracemalloc. Each capture writes to PROFILE_DIR:
+
+    <time>-<name>-<n>.prof  cProfile stats; open with snakeviz, or render a flamegraph with flameprof
+    <time>-<name>-<n>.txt   slowest functions by cumulative time and top allocation sites
+
+When nothing is armed, capture() costs a single counter check. Only one request
+is profiled at a time (concurrent requests run unprofiled), and cProfile sees the
+calling thread only: work handed to the LLM scheduler shows up as the time spent
+waiting for its result, while tracemalloc covers allocations from every thread.
+
+    with PROFILER.capture('agent_request'):
+        classification = classifier.classify_ticket(subject, body)
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+from config import Config
+
+_TRACEMALLOC_FRAMES = 10
+
+
+class RequestProfiler:
+    def __init__(self, output_dir: str, top_allocations: int = 25, history: int = 20):
+        self.output_dir = output_dir
+        self.top_allocations = top_allocations
+        self._remaining = 0
+        self._lock = threading.Lock()
+        self._active = threading.Lock()  # held for the duration of a capture
+        self._sequence = 0
+        self._captures = deque(maxlen=history)
+
+    def arm(self, requests: int):
+        """Profile the next `requests` requests (0 disarms)."""
+        with self._lock:
+            self._remaining = max(0, int(requests))
+
+    @property
+    def remaining(self) -> int:
+        return self._remaining
+
+    def _claim(self) -> bool:
+        if self._remaining <= 0:
+            return False  # fast path while profiling is off
+        with self._lock:
+            if self._remaining <= 0 or not self._active.acquire(blocking=False):
+                return False
+            self._remaining -= 1
+            self._sequence += 1
+            return True
+
+    @contextmanager
+    def capture(self, name: str):
+        """Profile the enclosed block if a capture is armed; otherwise run it untouched."""
+        if not self._claim():
+            yield
+            return
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(_TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            try:
+                after = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                if started_tracing:
+                    tracemalloc.stop()
+                self._save(name, profiler, before, after, elapsed, peak)
+            except Exception as e:
+                print(f"Failed to save profile for '{name}': {e}")
+            finally:
+                self._active.release()
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        """fn, with each call profiled while a capture is armed (e.g. a micro-batch function)."""
+        def profiled(*args, **kwargs):
+            with self.capture(name):
+                return fn(*args, **kwargs)
+        return profiled
+
+    def _save(self, name: str, profiler: cProfile.Profile, before: tracemalloc.Snapshot,
+              after: tracemalloc.Snapshot, elapsed: float, peak: int):
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{self._sequence}")
+        profiler.dump_stats(base + '.prof')
+
+        report = io.StringIO()
+        report.write(f"{name}: {elapsed * 1000:.1f} ms, peak traced memory {peak / 1e6:.2f} MB\n\n")
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(30)
+        # Allocations the request made (and still held at the end), by source line
+        own_traces = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        sites = after.filter_traces(own_traces).compare_to(before.filter_traces(own_traces), 'lineno')
+        sites = sites[:self.top_allocations]
+        report.write(f"Top {len(sites)} allocation sites (net size during the request):\n")
+        for stat in sites:
+            report.write(f"  {stat}\n")
+        with open(base + '.txt', 'w') as f:
+            f.write(report.getvalue())
+
+        with self._lock:
+            self._captures.appendleft({
+                'name': name,
+                'elapsed_ms': round(elapsed * 1000, 1),
+                'peak_mb': round(peak / 1e6, 2),
+                'profile': base + '.prof',
+                'report': base + '.txt'
+            })
+
+    def captures(self) -> List[Dict]:
+        """Most recent captures first."""
+        with self._lock:
+            return list(self._captures)
+
+    def status(self) -> Dict:
+        return {'remaining': self._remaining, 'output_dir': self.output_dir, 'captures': self.captures()}
+
+
+# Process-wide profiler, armed at startup with PROFILE_REQUESTS
+PROFILER = RequestProfiler(Config.PROFILE_DIR, Config.PROFILE_TOP_ALLOCATIONS)
+PROFILER.arm(Config.PROFILE_REQUESTS)
@@ -0,0 +1,327 @@
+"""
+Versioned prompt templates for ticket classification.
+
+A template owns everything version-specific about a classification call: the
+static instructions (sent once as the chat preamble instead of inside every
+message), how tickets are rendered, how large max_tokens needs to be for the
+expected answer, and how the answer is mapped back to the full labels the rest
+of the app uses.
+
+    v1  the original verbose prompt: full glossary in every message, full label
+        names in the answer, max_tokens=500 per ticket
+    v2  compact: glossary in a preamble built once, short label codes
+        ({"t": ["CON"], "s": "F", "p": "P0", "r": "..."}), max_tokens sized
+        from the answer schema
+
+PROMPT_TEMPLATE_VERSION selects the template (v1 unless set), so token counts
+and latency (recorded per template by TicketClassifier) can be compared between
+versions.
+"""
+
+import abc
+import json
+import math
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+
+_TOPIC_CODES = {
+    "How-to": "HOW", "Product": "PRD", "Connector": "CON", "Lineage": "LIN", "API/SDK": "API",
+    "SSO": "SSO", "Glossary": "GLO", "Best practices": "BP", "Sensitive data": "PII"
+}
+_SENTIMENT_CODES = {"Frustrated": "F", "Curious": "C", "Angry": "A", "Neutral": "N"}
+_PRIORITY_CODES = {"P0 (High)": "P0", "P1 (Medium)": "P1", "P2 (Low)": "P2"}
+# Every short code by label, for parsers that accept codes in place of full labels
+LABEL_CODES = {**_TOPIC_CODES, **_SENTIMENT_CODES, **_PRIORITY_CODES}
+
+_MAX_TOPICS = 3
+_REASON_MAX_WORDS = 15
+
+
+def estimate_tokens(text: str) -> int:
+    """Conservative token estimate for short JSON answers (about 3 characters per token)."""
+    return math.ceil(len(text) / 3)
+
+
+def _codes_for(labels: List[str], codes: Dict[str, str]) -> Dict[str, str]:
+    # Labels added to Config without a short code are sent as-is
+    return {label: codes.get(label, label) for label in labels}
+
+
+class PromptTemplate(abc.ABC):
+    """Base template: no preamble, answer uses the full label names."""
+
+    version = "base"
+    preamble: Optional[str] = None
+
+    def __init__(self, config: Config):
+        self.config = config
+
+    @abc.abstractmethod
+    def render(self, subject: str, body: str) -> str:
+        """Prompt for a single ticket."""
+
+    @abc.abstractmethod
+    def render_packed(self, tickets: List[Dict]) -> str:
+        """Prompt classifying several tickets in one call."""
+
+    @abc.abstractmethod
+    def max_tokens(self, ticket_count: int = 1) -> int:
+        """Completion budget for an answer covering ticket_count tickets."""
+
+    def answer_schema(self) -> Dict:
+        """JSON schema of one answer object, for providers with structured output."""
+        return {
+            'type': 'object',
+            'properties': {
+                'topic_tags': {'type': 'array', 'items': {'type': 'string', 'enum': self.config.TOPIC_TAGS}},
+                'sentiment': {'type': 'string', 'enum': self.config.SENTIMENT_LABELS},
+                'priority': {'type': 'string', 'enum': self.config.PRIORITY_LABELS},
+                'reasoning': {'type': 'string'}
+            },
+            'required': ['topic_tags', 'sentiment', 'priority', 'reasoning']
+        }
+
+    def response_schema(self, ticket_count: int = 1) -> Dict:
+        """Schema for a whole response; packed answers are wrapped as {"answers": [...]}."""
+        if ticket_count == 1:
+            return self.answer_schema()
+        return {
+            'type': 'object',
+            'properties': {'answers': {'type': 'array', 'items': self.answer_schema()}},
+            'required': ['answers']
+        }
+
+    def render_repair(self, items: List[Tuple[Dict, List[str]]]) -> str:
+        """Re-ask only the failed fields of each (ticket, failed fields) pair, with full labels."""
+        allowed = {
+            'topic_tags': f"one or more of {', '.join(self.config.TOPIC_TAGS)}",
+            'sentiment': f"one of {', '.join(self.config.SENTIMENT_LABELS)}",
+            'priority': f"one of {', '.join(self.config.PRIORITY_LABELS)}"
+        }
+        fields = sorted({field for _, failed in items for field in failed})
+        blocks = "\n\n".join(
+            f"Ticket {i + 1} (fields: {', '.join(failed)}):\nSubject: {ticket['subject']}\nBody: {ticket['body']}"
+            for i, (ticket, failed) in enumerate(items)
+        )
+        values = "\n".join(f"- {field}: {allowed[field]}" for field in fields)
+        if len(items) == 1:
+            answer = "Respond with one JSON object containing only those fields."
+        else:
+            answer = f"Respond with a JSON array of exactly {len(items)} objects, in ticket order, each containing only its fields."
+        return f"Your previous answer was missing or had invalid values for some fields.\n{values}\n\n{blocks}\n\n{answer}"
+
+    def repair_max_tokens(self, items: List[Tuple[Dict, List[str]]]) -> int:
+        return sum(12 * len(failed) + 6 for _, failed in items) + 4
+
+    def decode(self, item: Dict) -> Dict:
+        """Map one parsed answer object to the classification dict used by the app."""
+        return item
+
+    def encode(self, classification: Dict) -> Dict:
+        """Inverse of decode; used by the stub client to answer in this template's format."""
+        return classification
+
+
+class VerbosePromptTemplate(PromptTemplate):
+    version = "v1"
+
+    def render(self, subject: str, body: str) -> str:
+        return f"""
+Analyze the following customer support ticket and classify it according to these categories:
+
+**TOPIC TAGS** (select one or more from): {', '.join(self.config.TOPIC_TAGS)}
+- How-to: Questions about using features or functionality
+- Product: General product questions, feature requests
+- Connector: Issues with data source connections (Snowflake, dbt, etc.)
+- Lineage: Data lineage tracking, mapping, visualization
+- API/SDK: Programming interfaces, automation, integrations
+- SSO: Single Sign-On, authentication issues
+- Glossary: Business terms, metadata management
+- Best practices: Guidance on optimal usage patterns
+- Sensitive data: PII, data privacy, security concerns
+
+**SENTIMENT** (select one): {', '.join(self.config.SENTIMENT_LABELS)}
+- Frustrated: User is blocked or facing repeated issues
+- Curious: User is exploring or learning
+- Angry: User is upset about service/product
+- Neutral: Matter-of-fact inquiry
+
+**PRIORITY** (select one): {', '.join(self.config.PRIORITY_LABELS)}
+- P0 (High): Urgent, business-critical, blocking workflows
+- P1 (Medium): Important but not immediately blocking
+- P2 (Low): Nice to have, general inquiries
+
+**Ticket:**
+Subject: {subject}
+Body: {body}
+
+Respond in JSON format:
+{{
+  "topic_tags": ["tag1", "tag2"],
+  "sentiment": "sentiment_label",
+  "priority": "priority_label",
+  "reasoning": "Brief explanation of your classification"
+}}
+"""
+
+    def render_packed(self, tickets: List[Dict]) -> str:
+        ticket_blocks = "\n\n".join(
+            f"Ticket {i + 1}:\nSubject: {ticket['subject']}\nBody: {ticket['body']}"
+            for i, ticket in enumerate(tickets)
+        )
+        return f"""
+Classify each of the following customer support tickets.
+
+**TOPIC TAGS** (select one or more from): {', '.join(self.config.TOPIC_TAGS)}
+**SENTIMENT** (select one): {', '.join(self.config.SENTIMENT_LABELS)}
+**PRIORITY** (select one): {', '.join(self.config.PRIORITY_LABELS)}
+- P0 (High): Urgent, business-critical, blocking workflows
+- P1 (Medium): Important but not immediately blocking
+- P2 (Low): Nice to have, general inquiries
+
+{ticket_blocks}
+
+Respond with a JSON array containing exactly {len(tickets)} objects, in ticket order:
+[
+  {{"topic_tags": ["tag1"], "sentiment": "sentiment_label", "priority": "priority_label", "reasoning": "Brief explanation"}}
+]
+"""
+
+    def max_tokens(self, ticket_count: int = 1) -> int:
+        return 500 if ticket_count == 1 else 150 * ticket_count
+
+
+class CompactPromptTemplate(PromptTemplate):
+    version = "v2"
+
+    def __init__(self, config: Config):
+        super().__init__(config)
+        self.topic_codes = _codes_for(config.TOPIC_TAGS, _TOPIC_CODES)
+        self.sentiment_codes = _codes_for(config.SENTIMENT_LABELS, _SENTIMENT_CODES)
+        self.priority_codes = _codes_for(config.PRIORITY_LABELS, _PRIORITY_CODES)
+        self._labels = {
+            field: {code: label for label, code in codes.items()}
+            for field, codes in (('t', self.topic_codes), ('s', self.sentiment_codes), ('p', self.priority_codes))
+        }
+
+        # Static instructions, built once and sent as the preamble of every call
+        self.preamble = self._build_preamble()
+
+        # Longest possible answer object, used to size max_tokens
+        worst_case = {
+            't': sorted(self.topic_codes.values(), key=len)[-_MAX_TOPICS:],
+            's': max(self.sentiment_codes.values(), key=len),
+            'p': max(self.priority_codes.values(), key=len),
+            'r': ""
+        }
+        self._tokens_per_answer = estimate_tokens(json.dumps(worst_case)) + 2 * _REASON_MAX_WORDS
+
+    def _build_preamble(self) -> str:
+        c = {**self.topic_codes, **self.sentiment_codes, **self.priority_codes}
+        if set(c) != set(_TOPIC_CODES) | set(_SENTIMENT_CODES) | set(_PRIORITY_CODES):
+            return self._generic_preamble()
+        return (
+            "You classify Atlan customer support tickets. Reply with JSON only.\n"
+            f"Topics (1-{_MAX_TOPICS}): "
+            f"{c['How-to']}=how to use a feature; {c['Product']}=general product question or feature request; "
+            f"{c['Connector']}=data source connection (Snowflake, dbt...); {c['Lineage']}=data lineage; "
+            f"{c['API/SDK']}=API, SDK, automation; {c['SSO']}=single sign-on, authentication; "
+            f"{c['Glossary']}=business glossary, metadata terms; {c['Best practices']}=best-practice guidance; "
+            f"{c['Sensitive data']}=PII, privacy, security.\n"
+            f"Sentiment: {c['Frustrated']}=frustrated (blocked, repeated issues); {c['Curious']}=curious; "
+            f"{c['Angry']}=angry; {c['Neutral']}=neutral.\n"
+            f"Priority: {c['P0 (High)']}=urgent, business-critical, blocking; "
+            f"{c['P1 (Medium)']}=important, not blocking; {c['P2 (Low)']}=general inquiry.\n"
+            f'Answer per ticket: {{"t":["{c["Connector"]}"],"s":"{c["Frustrated"]}","p":"{c["P0 (High)"]}",'
+            f'"r":"reason, at most {_REASON_MAX_WORDS} words"}}'
+        )
+
+    def _generic_preamble(self) -> str:
+        """Code table without descriptions, for label sets customised in Config."""
+        def table(codes):
+            return ", ".join(f"{code}={label}" for label, code in codes.items())
+
+        return (
+            "You classify customer support tickets. Reply with JSON only.\n"
+            f"Topics (1-{_MAX_TOPICS}): {table(self.topic_codes)}.\n"
+            f"Sentiment: {table(self.sentiment_codes)}.\n"
+            f"Priority: {table(self.priority_codes)}.\n"
+            f'Answer per ticket: {{"t":[topic codes],"s":sentiment code,"p":priority code,'
+            f'"r":"reason, at most {_REASON_MAX_WORDS} words"}}'
+        )
+
+    def render(self, subject: str, body: str) -> str:
+        return f"Subject: {subject}\nBody: {body}"
+
+    def render_packed(self, tickets: List[Dict]) -> str:
+        ticket_blocks = "\n\n".join(
+            f"Ticket {i + 1}:\nSubject: {ticket['subject']}\nBody: {ticket['body']}"
+            for i, ticket in enumerate(tickets)
+        )
+        return f"{ticket_blocks}\n\nRespond with a JSON array of exactly {len(tickets)} answers, in ticket order."
+
+    def max_tokens(self, ticket_count: int = 1) -> int:
+        # Array brackets and separators for packed answers
+        return self._tokens_per_answer * ticket_count + (4 if ticket_count > 1 else 0)
+
+    def answer_schema(self) -> Dict:
+        return {
+            'type': 'object',
+            'properties': {
+                't': {'type': 'array', 'items': {'type': 'string', 'enum': list(self.topic_codes.values())}},
+                's': {'type': 'string', 'enum': list(self.sentiment_codes.values())},
+                'p': {'type': 'string', 'enum': list(self.priority_codes.values())},
+                'r': {'type': 'string'}
+            },
+            'required': ['t', 's', 'p', 'r']
+        }
+
+    def decode(self, item: Dict) -> Dict:
+        def label(field, code):
+            return self._labels[field].get(code, code) if isinstance(code, str) else code
+
+        # Full-label keys (repair answers, or a model ignoring the codes) pass through
+        result = {key: value for key, value in item.items() if key not in ('t', 's', 'p', 'r')}
+        if 't' in item:
+            codes = item['t'] if isinstance(item['t'], list) else [item['t']]
+            result['topic_tags'] = [label('t', code) for code in codes]
+        if 's' in item:
+            result['sentiment'] = label('s', item['s'])
+        if 'p' in item:
+            result['priority'] = label('p', item['p'])
+        if 'r' in item:
+            result['reasoning'] = item['r']
+        return result
+
+    def encode(self, classification: Dict) -> Dict:
+        return {
+            't': [self.topic_codes.get(tag, tag) for tag in classification.get('topic_tags', [])],
+            's': self.sentiment_codes.get(classification.get('sentiment'), classification.get('sentiment')),
+            'p': self.priority_codes.get(classification.get('priority'), classification.get('priority')),
+            'r': classification.get('reasoning', "")
+        }
+
+
+_TEMPLATE_CLASSES = {cls.version: cls for cls in (VerbosePromptTemplate, CompactPromptTemplate)}
+_TEMPLATES: Dict[str, PromptTemplate] = {}
+
+
+def get_prompt_template(version: str = None) -> PromptTemplate:
+    """Return the (cached) template for a version, defaulting to PROMPT_TEMPLATE_VERSION."""
+    config = Config()
+    version = version or config.PROMPT_TEMPLATE_VERSION
+    if version not in _TEMPLATE_CLASSES:
+        print(f"Unknown prompt template '{version}', using {VerbosePromptTemplate.version}")
+        version = VerbosePromptTemplate.version
+    if version not in _TEMPLATES:
+        _TEMPLATES[version] = _TEMPLATE_CLASSES[version](config)
+    return _TEMPLATES[version]
+
+
+def template_for_preamble(preamble: Optional[str]) -> PromptTemplate:
+    """Find the template a call was rendered with (used by the stub client)."""
+    for template in _TEMPLATES.values():
+        if template.preamble and template.preamble == preamble:
+            return template
+    return get_prompt_template(VerbosePromptTemplate.version)
@@ -1,57 +1,127 @@
 import chromadb
 from chromadb.config import Settings
-import cohere
 import json
+import threading
 import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import numpy as np
 from sentence_transformers import SentenceTransformer
 from typing import Dict, List, Optional
 import re
+from budget import BULK, LLM_BUDGET, RAG, BudgetExceededError
+from circuit_breaker import COHERE_BREAKER, OPEN, CircuitOpenError
+from compressed_index import CompressedVectorIndex, build_from_collection
 from config import Config
+from faq_index import FAQIndex, document_hash, faq_generation_prompt, knowledge_base_version, parse_faqs
+from llm_pool import get_llm_pool
+from llm_scheduler import LLM_SCHEDULER, estimate_urgency
+from metrics import METRICS
+from prompt_templates import estimate_tokens
+
+# Chroma's defaults for collections created without explicit HNSW metadata
+CHROMA_HNSW_DEFAULTS = {"hnsw:space": "l2", "hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 10}
+
+# Pending LLM answer upgrades kept for polling; oldest are dropped beyond this
+_MAX_PENDING_UPGRADES = 256
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+# Scheduler rank for FAQ generation: behind every ticket, including P2 bulk work
+_FAQ_RANK = 4.0
 
 class RAGSystem:
-    def __init__(self):
+    def __init__(self, cohere_client=None, circuit_breaker=None, scheduler=None, budget=None):
         self.config = Config()
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedding_model = SentenceTransformer(EMBEDDING_MODEL)
         self.chroma_client = chromadb.PersistentClient(path="./chroma_db")
         self.collection = None
         self.last_api_call_time = 0
         self.min_delay_between_calls = 6  # 6 seconds for 10 calls/min limit
+        self._rate_limit_lock = threading.Lock()
+        self.circuit_breaker = circuit_breaker or COHERE_BREAKER  # shared with TicketClassifier
+        self.budget = budget or LLM_BUDGET  # shared with TicketClassifier
         
-        # Initialize AI clients
-        self.cohere_client = None
+        # LLM answers run on the shared priority scheduler; late ones are delivered as upgrades
+        self.scheduler = scheduler or LLM_SCHEDULER
+        self._upgrades = OrderedDict()
+        self._upgrades_lock = threading.Lock()
         
-        if self.config.USE_COHERE and self.config.COHERE_API_KEY:
-            try:
-                import cohere
-                self.cohere_client = cohere.Client(self.config.COHERE_API_KEY)
-            except Exception as e:
-                print(f"Failed to initialize Cohere client: {e}")
+        # Initialize AI clients (injectable, e.g. a stub client for local testing)
+        self.cohere_client = cohere_client or get_llm_pool()  # pool shared with TicketClassifier
+        if getattr(self.cohere_client, 'handles_rate_limits', False):
+            self.min_delay_between_calls = 0  # the pool limits each key itself
+        
+        # Pre-generated answers for common questions, built in the background by populate_knowledge_base
+        self.faq_index = None
+        self._faq_lock = threading.Lock()
+        self._faq_thread = None
         
+        # IVF-PQ index queried instead of Chroma's HNSW when VECTOR_INDEX=compressed
+        self.compressed_index = None
         self._setup_vector_db()
+        if self.config.VECTOR_INDEX == 'compressed' and self.compressed_index is None:
+            self.compressed_index = CompressedVectorIndex.load_if_exists(self.config.COMPRESSED_INDEX_DIR)
     
     def _wait_for_rate_limit(self):
         """Ensure we respect the API rate limit (10 calls/min for trial keys)."""
-        current_time = time.time()
-        time_since_last_call = current_time - self.last_api_call_time
-        
-        if time_since_last_call < self.min_delay_between_calls:
-            wait_time = self.min_delay_between_calls - time_since_last_call
-            print(f"Rate limiting: waiting {wait_time:.1f} seconds...")
-            time.sleep(wait_time)
-        
-        self.last_api_call_time = time.time()
+        with METRICS.timer('rate_limit_wait', component='rag'), self._rate_limit_lock:
+            current_time = time.time()
+            time_since_last_call = current_time - self.last_api_call_time
+            
+            if time_since_last_call < self.min_delay_between_calls:
+                wait_time = self.min_delay_between_calls - time_since_last_call
+                print(f"Rate limiting: waiting {wait_time:.1f} seconds...")
+                time.sleep(wait_time)
+            
+            self.last_api_call_time = time.time()
+    
+    def _estimated_rate_limit_wait(self) -> float:
+        """Seconds the next LLM call would wait for the rate limiter (ignoring queued callers)."""
+        if hasattr(self.cohere_client, 'estimated_wait'):
+            return self.cohere_client.estimated_wait()
+        return max(0.0, self.min_delay_between_calls - (time.time() - self.last_api_call_time))
+    
+    def _estimated_answer_wait(self) -> float:
+        """Seconds before an interactive answer's LLM call could start: its scheduler queue, then the rate limit."""
+        return self.scheduler.estimated_wait(interactive=True) + self._estimated_rate_limit_wait()
+    
+    def _chat(self, **kwargs):
+        """One rate-limited Cohere chat call; retried by the circuit breaker."""
+        self._wait_for_rate_limit()  # Respect API rate limit
+        with METRICS.timer('llm_call', component='rag'):
+            return self.cohere_client.chat(**kwargs)
+    
+    def hnsw_metadata(self) -> Dict:
+        """HNSW index parameters for new collections, from Config."""
+        return {
+            "hnsw:space": self.config.HNSW_SPACE,
+            "hnsw:M": self.config.HNSW_M,
+            "hnsw:construction_ef": self.config.HNSW_EF_CONSTRUCTION,
+            "hnsw:search_ef": self.config.HNSW_EF_SEARCH
+        }
     
     def _setup_vector_db(self):
         """Setup ChromaDB collection for storing document embeddings."""
         try:
             self.collection = self.chroma_client.get_collection("atlan_docs")
             print("Existing ChromaDB collection found")
+            
+            # Index parameters are fixed at creation time; flag drift from Config
+            existing = self.collection.metadata or {}
+            drift = {
+                k: v for k, v in self.hnsw_metadata().items()
+                if existing.get(k, CHROMA_HNSW_DEFAULTS[k]) != v
+            }
+            if drift:
+                print(f"Collection HNSW settings differ from Config {drift}; delete ./chroma_db to rebuild")
         except Exception as e:
             print(f"No existing collection found, creating new one: {e}")
             try:
                 self.collection = self.chroma_client.create_collection(
                     name="atlan_docs",
-                    metadata={"description": "Atlan documentation embeddings"}
+                    metadata={"description": "Atlan documentation embeddings", **self.hnsw_metadata()}
                 )
                 print("Created new ChromaDB collection")
                 # Initialize the knowledge base after creating collection
@@ -322,6 +392,8 @@ Reference: Navigate to Atlan Docs > Security > Data Classification for detailed
             # Check if collection already has documents
             if self.collection.count() > 0:
                 print(f"Knowledge base already populated with {self.collection.count()} documents")
+                self._ensure_compressed_index()
+                self._ensure_faq_index()
                 return
             
             print("Populating knowledge base...")
@@ -355,10 +427,151 @@ Reference: Navigate to Atlan Docs > Security > Data Classification for detailed
                 )
                 
                 print(f"Added {len(chunks)} chunks to knowledge base")
+                self._ensure_compressed_index()
+                self._ensure_faq_index()
             
         except Exception as e:
             print(f"Error populating knowledge base: {e}")
     
+    def _ensure_compressed_index(self):
+        """Load the compressed index, rebuilding it if it does not match the collection."""
+        if self.config.VECTOR_INDEX != 'compressed':
+            return
+        index = self.compressed_index or CompressedVectorIndex.load_if_exists(self.config.COMPRESSED_INDEX_DIR)
+        if index is None or len(index) != self.collection.count() or index.space != self.config.HNSW_SPACE:
+            print("Building compressed vector index...")
+            try:
+                index = build_from_collection(self.collection, self.config.COMPRESSED_INDEX_DIR, self.config)
+            except Exception as e:
+                print(f"Error building compressed index, using Chroma: {e}")
+                index = None
+        self.compressed_index = index
+    
+    def knowledge_base_version(self) -> str:
+        return knowledge_base_version(self.create_knowledge_base(), EMBEDDING_MODEL)
+    
+    def _ensure_faq_index(self):
+        """Serve the stored FAQ index if it matches the knowledge base; otherwise (re)build it in the background."""
+        if not self.config.FAQ_ENABLED:
+            return
+        version = self.knowledge_base_version()
+        if self.faq_index is None or self.faq_index.kb_version != version:
+            stored = FAQIndex.load(self.config.FAQ_INDEX_DIR)
+            self.faq_index = stored if stored and stored.kb_version == version else None
+        if self.faq_index is None or self.faq_index.missing:
+            self.build_faq_index(background=True)
+    
+    def build_faq_index(self, background: bool = False, reuse: bool = True) -> Optional[FAQIndex]:
+        """Generate canonical questions and answers per KB document and save them as the FAQ index.
+        
+        Only one build runs at a time; a synchronous call joins a build already in progress.
+        """
+        if not (self.config.USE_COHERE and self.cohere_client):
+            return self.faq_index
+        with self._faq_lock:
+            thread = self._faq_thread
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(target=self._build_faq_index, args=(reuse,), daemon=True,
+                                          name="faq-builder")
+                self._faq_thread = thread
+                thread.start()
+        if not background:
+            thread.join()
+        return self.faq_index
+    
+    def _build_faq_index(self, reuse: bool):
+        try:
+            documents = self.create_knowledge_base()
+            version = knowledge_base_version(documents, EMBEDDING_MODEL)
+            previous = FAQIndex.load(self.config.FAQ_INDEX_DIR) if reuse else None
+            hashes = [document_hash(doc) for doc in documents]
+            
+            # Unchanged documents keep their entries; the rest run at the lowest scheduler priority
+            reused = {h: previous.entries_for(h) for h in hashes if previous and h in previous.document_hashes
+                      and h not in previous.missing}
+            futures = {
+                h: self.scheduler.submit(self._generate_faqs, doc, rank=_FAQ_RANK, tier="FAQ", kind='faq')
+                for doc, h in zip(documents, hashes) if h not in reused
+            }
+            
+            entries, embeddings, missing = [], [], []
+            for doc, h in zip(documents, hashes):
+                if h in reused:
+                    for entry, embedding in reused[h]:
+                        entries.append(entry)
+                        embeddings.append(embedding)
+                    continue
+                faqs = futures[h].result()
+                if not faqs:
+                    missing.append(h)
+                    continue
+                new_entries = [{**faq, 'url': doc['url'], 'title': doc['title'], 'doc_hash': h} for faq in faqs]
+                entries.extend(new_entries)
+                embeddings.extend(self.embedding_model.encode([e['question'] for e in new_entries],
+                                                              normalize_embeddings=True))
+            
+            index = FAQIndex(version, entries, np.array(embeddings, dtype=np.float32), hashes, missing)
+            index.save(self.config.FAQ_INDEX_DIR)
+            self.faq_index = index
+            print(f"FAQ index built: {len(entries)} questions from {len(documents) - len(missing)} documents "
+                  f"({len(futures)} generated, {len(missing)} failed)")
+        except Exception as e:
+            print(f"Error building FAQ index: {e}")
+    
+    def _generate_faqs(self, doc: Dict) -> Optional[List[Dict]]:
+        """Ask the LLM for one document's canonical questions and answers (bulk budget class)."""
+        if self.budget.should_degrade(BULK):
+            return None
+        prompt = faq_generation_prompt(doc, self.config.FAQ_QUESTIONS_PER_DOC)
+        max_tokens = 200 * self.config.FAQ_QUESTIONS_PER_DOC
+        try:
+            reservation = self.budget.reserve(BULK, estimate_tokens(prompt) + max_tokens)
+            try:
+                response = self.circuit_breaker.call(
+                    self._chat,
+                    model='command-r-plus-08-2024',
+                    message=prompt,
+                    max_tokens=max_tokens,
+                    temperature=0.1
+                )
+            except CircuitOpenError:
+                self.budget.release(reservation)
+                raise
+            except Exception:
+                self.budget.commit(reservation)
+                raise
+            usage = getattr(response, 'token_count', None) or {}
+            self.budget.commit(reservation, usage.get('total_tokens'))
+            return parse_faqs(response.text)
+        except (CircuitOpenError, BudgetExceededError):
+            return None
+        except Exception as e:
+            print(f"Error generating FAQs for '{doc['title']}': {e}")
+            METRICS.increment('llm_errors', component='faq')
+            return None
+    
+    def _faq_responses(self, query_embeddings: np.ndarray) -> List[Optional[Dict]]:
+        """Responses for the queries that closely match a pre-generated FAQ question."""
+        index = self.faq_index
+        if index is None:
+            return [None] * len(query_embeddings)
+        responses = []
+        for match in index.match(query_embeddings, self.config.FAQ_MATCH_THRESHOLD):
+            if match is None:
+                METRICS.increment('faq_misses', component='rag')
+                responses.append(None)
+                continue
+            entry, similarity = match
+            METRICS.increment('faq_hits', component='rag')
+            responses.append({
+                'answer': entry['answer'],
+                'sources': [entry['url']],
+                'confidence': 'high',
+                'faq_question': entry['question'],
+                'faq_similarity': round(similarity, 3)
+            })
+        return responses
+    
     def _chunk_document(self, doc: Dict) -> List[Dict]:
         """Split document into smaller chunks."""
         content = doc['content']
@@ -398,40 +611,74 @@ Reference: Navigate to Atlan Docs > Security > Data Classification for detailed
     
     def retrieve_relevant_docs(self, query: str) -> List[Dict]:
         """Retrieve relevant documents for a query."""
+        return self.retrieve_relevant_docs_batch([query])[0]
+    
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        with METRICS.timer('embedding_encode', component='rag'):
+            return self.embedding_model.encode(queries)
+    
+    def retrieve_relevant_docs_batch(self, queries: List[str],
+                                     query_embeddings: Optional[np.ndarray] = None) -> List[List[Dict]]:
+        """Retrieve relevant documents for several queries with one embedding pass."""
         try:
-            query_embedding = self.embedding_model.encode([query]).tolist()[0]
+            if query_embeddings is None:
+                query_embeddings = self._encode_queries(queries)
             
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=self.config.MAX_RETRIEVAL_DOCS
-            )
+            with METRICS.timer('vector_query', component='rag'):
+                if self.compressed_index is not None:
+                    results = self._query_compressed_index(query_embeddings)
+                else:
+                    results = self.collection.query(
+                        query_embeddings=query_embeddings.tolist(),
+                        n_results=self.config.MAX_RETRIEVAL_DOCS
+                    )
             
-            relevant_docs = []
-            for i, doc in enumerate(results['documents'][0]):
-                relevant_docs.append({
-                    'content': doc,
-                    'metadata': results['metadatas'][0][i],
-                    'distance': results['distances'][0][i] if 'distances' in results else 0
-                })
+            all_docs = []
+            for q in range(len(queries)):
+                relevant_docs = []
+                for i, doc in enumerate(results['documents'][q]):
+                    relevant_docs.append({
+                        'content': doc,
+                        'metadata': results['metadatas'][q][i],
+                        'distance': results['distances'][q][i] if 'distances' in results else 0
+                    })
+                all_docs.append(relevant_docs)
             
-            return relevant_docs
+            return all_docs
             
         except Exception as e:
             print(f"Error retrieving documents: {e}")
-            return []
+            return [[] for _ in queries]
     
-    def generate_answer_with_cohere(self, query: str, context_docs: List[Dict]) -> Optional[str]:
-        """Generate answer using Cohere API."""
-        if not self.cohere_client:
-            return None
+    def _query_compressed_index(self, query_embeddings: np.ndarray) -> Dict:
+        """Search the compressed index and fetch the hits from Chroma, in collection.query's format."""
+        ids, distances = self.compressed_index.search(
+            query_embeddings, self.config.MAX_RETRIEVAL_DOCS,
+            nprobe=self.config.IVF_NPROBE, rerank=self.config.RERANK_CANDIDATES
+        )
+        unique_ids = list(dict.fromkeys(i for row in ids for i in row))
+        stored = self.collection.get(ids=unique_ids, include=['documents', 'metadatas']) if unique_ids else {
+            'ids': [], 'documents': [], 'metadatas': []
+        }
+        by_id = dict(zip(stored['ids'], zip(stored['documents'], stored['metadatas'])))
         
-        try:
-            context = "\n\n".join([
-                f"Source: {doc['metadata']['title']} ({doc['metadata']['url']})\n{doc['content']}"
-                for doc in context_docs
-            ])
-            
-            prompt = f"""
+        results = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        for row_ids, row_distances in zip(ids, distances):
+            hits = [(i, d) for i, d in zip(row_ids, row_distances) if i in by_id]  # skip ids deleted since the build
+            results['ids'].append([i for i, _ in hits])
+            results['documents'].append([by_id[i][0] for i, _ in hits])
+            results['metadatas'].append([by_id[i][1] for i, _ in hits])
+            results['distances'].append([d for _, d in hits])
+        return results
+    
+    def _create_answer_prompt(self, query: str, context_docs: List[Dict]) -> str:
+        """Create the answer-generation prompt from retrieved documentation."""
+        context = "\n\n".join([
+            f"Source: {doc['metadata']['title']} ({doc['metadata']['url']})\n{doc['content']}"
+            for doc in context_docs
+        ])
+        
+        return f"""
 Based on the following Atlan documentation, provide a helpful and accurate answer to the user's question.
 
 Context:
@@ -447,26 +694,170 @@ Instructions:
 
 Answer:
 """
+    
+    def generate_answer_with_cohere(self, query: str, context_docs: List[Dict], caller: str = RAG) -> Optional[str]:
+        """Generate answer using Cohere API."""
+        if not self.cohere_client or self.budget.should_degrade(caller):
+            return None
+        
+        try:
+            with METRICS.timer('prompt_build', component='rag'):
+                prompt = self._create_answer_prompt(query, context_docs)
             
-            self._wait_for_rate_limit()  # Respect API rate limit
-            response = self.cohere_client.chat(
-                model='command-r-plus-08-2024',
-                message=prompt,
-                max_tokens=800,
-                temperature=0.1
-            )
+            # Charged to the RAG budget class, so bulk classification cannot starve answers
+            reservation = self.budget.reserve(caller, estimate_tokens(prompt) + 800)
+            try:
+                response = self.circuit_breaker.call(
+                    self._chat,
+                    model='command-r-plus-08-2024',
+                    message=prompt,
+                    max_tokens=800,
+                    temperature=0.1
+                )
+            except CircuitOpenError:
+                self.budget.release(reservation)
+                raise
+            except Exception:
+                self.budget.commit(reservation)
+                raise
+            usage = getattr(response, 'token_count', None) or {}
+            self.budget.commit(reservation, usage.get('total_tokens'))
             
             return response.text.strip()
             
+        except (CircuitOpenError, BudgetExceededError):
+            # Outage detected or budget spent: skip the rate-limit wait and use the extractive answer
+            return None
         except Exception as e:
             print(f"Error generating answer with Cohere: {e}")
+            METRICS.increment('llm_errors', component='rag')
             return None
     
     
+    def _answer_from_faq(self, queries: List[str]):
+        """(FAQ response or None per query, query embeddings for retrieval or None if encoding failed)."""
+        if self.faq_index is None:
+            return [None] * len(queries), None
+        try:
+            query_embeddings = self._encode_queries(queries)
+        except Exception as e:
+            print(f"Error encoding queries: {e}")
+            return [None] * len(queries), None
+        return self._faq_responses(query_embeddings), query_embeddings
+    
     def generate_rag_response(self, query: str, max_docs: int = 5) -> Dict:
         """Generate a complete RAG response with sources."""
-        # Retrieve relevant documents
-        relevant_docs = self.retrieve_relevant_docs(query)
+        return self.generate_rag_responses([query])[0]
+    
+    def generate_rag_responses(self, queries: List[str]) -> List[Dict]:
+        """Generate RAG responses for several queries, sharing one retrieval pass."""
+        return [
+            prepared['response'] or self._build_rag_response(query, prepared['docs'])
+            for query, prepared in zip(queries, self.retrieve_for_answers(queries))
+        ]
+    
+    def retrieve_for_answers(self, queries: List[str]) -> List[Dict]:
+        """One embedding pass for several queries: a finished FAQ 'response', or retrieved 'docs' to answer from."""
+        # Close matches to a pre-generated FAQ question are answered without retrieval or an LLM call
+        responses, query_embeddings = self._answer_from_faq(queries)
+        prepared = [{'response': response, 'docs': []} for response in responses]
+        pending = [i for i, response in enumerate(responses) if response is None]
+        if pending:
+            docs_per_query = self.retrieve_relevant_docs_batch(
+                [queries[i] for i in pending],
+                query_embeddings[pending] if query_embeddings is not None else None
+            )
+            for i, docs in zip(pending, docs_per_query):
+                prepared[i]['docs'] = docs
+        return prepared
+    
+    def generate_rag_response_with_deadline(self, query: str, sla_seconds: float = None,
+                                            classification: Optional[Dict] = None) -> Dict:
+        """Answer within sla_seconds, upgrading to the LLM answer later if it is slower.
+        
+        If the LLM answer is ready in time it is returned directly. Otherwise the caller
+        gets an extractive answer immediately, with 'upgrade_pending' set and an
+        'upgrade_id' to poll via get_answer_upgrade(). The ticket's classification, if
+        given, sets the LLM call's place in the scheduler queue.
+        """
+        sla_seconds = sla_seconds if sla_seconds is not None else self.config.ANSWER_SLA_SECONDS
+        start = time.perf_counter()
+        faq_responses, query_embeddings = self._answer_from_faq([query])
+        if faq_responses[0]:
+            return faq_responses[0]
+        relevant_docs = self.retrieve_relevant_docs_batch([query], query_embeddings)[0]
+        
+        llm_available = (self.config.USE_COHERE and self.cohere_client
+                         and self.circuit_breaker.state != OPEN)
+        if not relevant_docs or not llm_available:
+            return self._build_rag_response(query, relevant_docs)
+        
+        rank, tier = estimate_urgency(classification, interactive=True)
+        expected_wait = self._estimated_answer_wait()
+        # Interactive lane: never queued behind bulk classification or FAQ generation in flight
+        future = self.scheduler.submit(self._build_rag_response, query, relevant_docs,
+                                       rank=rank, tier=tier, kind='answer', interactive=True)
+        remaining = sla_seconds - (time.perf_counter() - start)
+        # Don't wait at all when queueing and the rate limiter alone would blow the budget
+        if remaining > 0 and expected_wait < remaining:
+            try:
+                return future.result(timeout=remaining)
+            except FutureTimeoutError:
+                pass
+        
+        METRICS.increment('answer_deadline_misses', component='rag')
+        upgrade_id = uuid.uuid4().hex
+        with self._upgrades_lock:
+            self._upgrades[upgrade_id] = future
+            while len(self._upgrades) > _MAX_PENDING_UPGRADES:
+                self._upgrades.popitem(last=False)
+        
+        response = self._format_rag_response(self._extractive_answer(query, relevant_docs), relevant_docs)
+        response['upgrade_id'] = upgrade_id
+        response['upgrade_pending'] = True
+        return response
+    
+    def get_answer_upgrade(self, upgrade_id: str) -> Optional[Dict]:
+        """Return the final response for a pending upgrade once ready, else None."""
+        with self._upgrades_lock:
+            future = self._upgrades.get(upgrade_id)
+            if future is None or not future.done():
+                return None
+            del self._upgrades[upgrade_id]
+        
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Error generating upgraded answer: {e}")
+            return None
+    
+    def has_pending_upgrade(self, upgrade_id: str) -> bool:
+        with self._upgrades_lock:
+            return upgrade_id in self._upgrades
+    
+    def _extractive_answer(self, query: str, relevant_docs: List[Dict], max_sentences: int = 4) -> str:
+        """Pick the retrieved sentences most similar to the query, in document order."""
+        sentences = []
+        for doc in relevant_docs[:3]:
+            for piece in re.split(r'(?<=[.!?])\s+|\n+', doc['content']):
+                piece = piece.strip(" -•\t")
+                if len(piece) > 20 and piece not in sentences:
+                    sentences.append(piece)
+        
+        if not sentences:
+            return "Based on the available documentation:\n\n" + "\n\n".join(
+                [doc['content'][:400] for doc in relevant_docs[:2]]
+            )
+        
+        with METRICS.timer('extractive_answer', component='rag'):
+            embeddings = self.embedding_model.encode([query] + sentences, normalize_embeddings=True)
+            scores = embeddings[1:] @ embeddings[0]
+            top = sorted(np.argsort(-scores)[:max_sentences])
+        
+        return "Based on the available documentation:\n\n" + "\n".join(f"- {sentences[i]}" for i in top)
+    
+    def _build_rag_response(self, query: str, relevant_docs: List[Dict], caller: str = RAG) -> Dict:
+        """Answer a query from already retrieved documents."""
         if not relevant_docs:
             return {
                 'answer': "I couldn't find relevant information in the Atlan documentation to answer your question.",
@@ -478,13 +869,16 @@ Answer:
         answer = None
         
         if self.config.USE_COHERE and self.cohere_client:
-            answer = self.generate_answer_with_cohere(query, relevant_docs)
+            answer = self.generate_answer_with_cohere(query, relevant_docs, caller)
         
         if not answer:
-            # Direct response from documentation
-            answer = f"Based on the available documentation:\n\n"
-            answer += "\n\n".join([doc['content'][:400] for doc in relevant_docs[:2]])
+            # Direct response from the most relevant documentation sentences
+            METRICS.increment('fallback_answers', component='rag')
+            answer = self._extractive_answer(query, relevant_docs)
         
+        return self._format_rag_response(answer, relevant_docs)
+    
+    def _format_rag_response(self, answer: str, relevant_docs: List[Dict]) -> Dict:
         # Extract unique sources
         sources = list(set([doc['metadata']['url'] for doc in relevant_docs]))
         
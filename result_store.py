@@ -0,0 +1,232 @@
+"""
+Process-wide store for classified ticket results.
+
+Results are shared by every Streamlit session and keyed by a dataset version
+(a hash of the raw tickets), so opening a new tab reuses the existing
+classification instead of re-running it. Classification runs are single-flight:
+concurrent callers asking for the same version wait on one run.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+from aggregates import TicketAggregates
+from columnar_store import ColumnarTickets
+from metrics import METRICS
+from ticket_index import TicketIndex
+
+
+def compute_dataset_version(tickets: List[Dict]) -> str:
+    """Return a short, stable version key for a list of raw tickets."""
+    payload = json.dumps(tickets, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+class ResultStore:
+    def __init__(self, persist_dir: Optional[str] = None):
+        self.persist_dir = persist_dir
+        self._results: Dict[str, ColumnarTickets] = {}
+        self._indexes: Dict[str, TicketIndex] = {}
+        self._aggregates: Dict[str, TicketAggregates] = {}
+        self._inflight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+        if self.persist_dir:
+            os.makedirs(self.persist_dir, exist_ok=True)
+
+    def _path_for(self, version: str) -> str:
+        return os.path.join(self.persist_dir, f"{version}.json")
+
+    def _load_from_disk(self, version: str) -> Optional[List[Dict]]:
+        """Load persisted results for a version, if any."""
+        if not self.persist_dir:
+            return None
+
+        path = self._path_for(version)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error loading stored results for {version}: {e}")
+            return None
+
+    def _save_to_disk(self, version: str, records: List[Dict]):
+        """Atomically persist results for a version."""
+        if not self.persist_dir:
+            return
+
+        path = self._path_for(version)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(records, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error persisting results for {version}: {e}")
+
+    def get(self, version: str) -> Optional[ColumnarTickets]:
+        """Return stored results for a version without triggering classification."""
+        with self._lock:
+            results = self._results.get(version)
+        if results is not None:
+            return results
+
+        records = self._load_from_disk(version)
+        if records is not None:
+            results = ColumnarTickets.from_tickets(records)
+            index = TicketIndex(results)
+            aggregates = TicketAggregates.from_tickets(results)
+            with self._lock:
+                if version not in self._results:
+                    self._results[version] = results
+                    self._indexes[version] = index
+                    self._aggregates[version] = aggregates
+                results = self._results[version]
+        return results
+
+    def get_index(self, version: str) -> Optional[TicketIndex]:
+        """Return the inverted index built when this version's results were stored."""
+        if self.get(version) is None:
+            return None
+        with self._lock:
+            return self._indexes.get(version)
+
+    def get_aggregates(self, version: str) -> Optional[TicketAggregates]:
+        """Return the incrementally maintained dashboard counters for a version."""
+        if self.get(version) is None:
+            return None
+        with self._lock:
+            return self._aggregates.get(version)
+
+    def put(self, version: str, tickets: List[Dict]) -> ColumnarTickets:
+        """Replace the stored results for a version and rebuild its index and aggregates."""
+        results = tickets if isinstance(tickets, ColumnarTickets) else ColumnarTickets.from_tickets(tickets)
+        index = TicketIndex(results)
+        aggregates = TicketAggregates.from_tickets(results)
+        with self._lock:
+            self._results[version] = results
+            self._indexes[version] = index
+            self._aggregates[version] = aggregates
+        if self.persist_dir:
+            self._save_to_disk(version, results.to_records())
+        return results
+
+    def record(self, version: str, position: int, classified_ticket: Dict):
+        """Store one (re-)classified ticket, updating the index and aggregates in place.
+
+        Appends when position equals the current result count; positions past
+        that raise IndexError. Persisted results are loaded first so a later
+        flush() keeps them. Call flush() to persist a batch of recorded tickets.
+        """
+        self.get(version)
+        with self._lock:
+            results = self._results.setdefault(version, ColumnarTickets())
+            index = self._indexes.setdefault(version, TicketIndex(results))
+            aggregates = self._aggregates.setdefault(version, TicketAggregates())
+
+            if position > len(results):
+                raise IndexError(f"position {position} is past the end of {len(results)} stored tickets")
+            old_ticket = results[position] if position < len(results) else None
+            index.update(position, classified_ticket)
+            aggregates.replace(old_ticket, classified_ticket)
+
+    def append(self, version: str, classified_tickets: List[Dict]) -> int:
+        """Append newly classified tickets to a version in place; returns the new count.
+
+        Persisted results are loaded first so a later flush() keeps them. Call
+        flush() to persist the appended tickets.
+        """
+        self.get(version)
+        with self._lock:
+            results = self._results.setdefault(version, ColumnarTickets())
+            index = self._indexes.setdefault(version, TicketIndex(results))
+            aggregates = self._aggregates.setdefault(version, TicketAggregates())
+
+            for ticket in classified_tickets:
+                index.update(len(results), ticket)
+                aggregates.add(ticket)
+            return len(results)
+
+    def flush(self, version: str):
+        """Persist the current results for a version."""
+        with self._lock:
+            results = self._results.get(version)
+            records = results.to_records() if results is not None else None
+        if records is not None:
+            self._save_to_disk(version, records)
+
+    def is_refreshing(self, version: str) -> bool:
+        """Whether a classification run for this version is in flight."""
+        with self._lock:
+            return version in self._inflight
+
+    def _run_single_flight(self, version: str, classify_fn: Callable[[], List[Dict]],
+                           force: bool) -> ColumnarTickets:
+        """Run classify_fn at most once at a time per version; followers wait for the leader."""
+        while True:
+            with self._lock:
+                event = self._inflight.get(version)
+                if event is None:
+                    if not force and version in self._results:
+                        return self._results[version]
+                    event = threading.Event()
+                    self._inflight[version] = event
+                    break
+
+            # Another caller is already classifying this version: share its result
+            event.wait()
+            with self._lock:
+                if version in self._results:
+                    return self._results[version]
+            # The leader failed; retry and possibly become the leader ourselves
+
+        try:
+            results = None if force else self._load_from_disk(version)
+            if results is None:
+                results = classify_fn()
+            return self.put(version, results)
+        finally:
+            with self._lock:
+                self._inflight.pop(version, None)
+            event.set()
+
+    def get_or_classify(self, version: str, classify_fn: Callable[[], List[Dict]]) -> ColumnarTickets:
+        """Return stored results, classifying once across all sessions if missing."""
+        results = self.get(version)
+        if results is not None:
+            METRICS.increment('cache_hits', cache='result_store')
+            return results
+        METRICS.increment('cache_misses', cache='result_store')
+        return self._run_single_flight(version, classify_fn, force=False)
+
+    def refresh(self, version: str, classify_fn: Callable[[], List[Dict]]) -> ColumnarTickets:
+        """Re-classify a version, joining an in-flight refresh instead of starting another."""
+        with self._lock:
+            event = self._inflight.get(version)
+        if event is not None:
+            event.wait()
+            results = self.get(version)
+            if results is not None:
+                return results
+        return self._run_single_flight(version, classify_fn, force=True)
+
+    def refresh_in_background(self, version: str, classify_fn: Callable[[], List[Dict]]) -> bool:
+        """Start a background refresh unless one is already running. Returns True if started."""
+        with self._lock:
+            if version in self._inflight:
+                return False
+
+        def _run():
+            try:
+                self._run_single_flight(version, classify_fn, force=True)
+            except Exception as e:
+                print(f"Background refresh for {version} failed: {e}")
+
+        threading.Thread(target=_run, name=f"refresh-{version}", daemon=True).start()
+        return True
@@ -0,0 +1,269 @@
+"""
+Retrieval latency/recall/memory benchmark for the Chroma HNSW and compressed indexes.
+
+Builds a labelled query -> expected-chunk set from RAGSystem.create_knowledge_base
+(document titles and individual content lines as queries), optionally scales
+the corpus up with synthetic distractor vectors, and compares HNSW settings
+against an exact (brute-force numpy) search baseline.
+
+For each (corpus size, space, M, ef_construction, ef_search) combination it
+reports:
+    - ann_recall@k:   overlap of HNSW top-k with exact top-k
+    - label_recall@k: fraction of queries whose expected chunk is in the top-k
+    - p50/p95 query latency for HNSW and for exact search
+
+With --compressed it also builds the IVF-PQ index (compressed_index.py) for
+each corpus size and (nprobe, pq_subspaces) combination, reporting the same
+recall and latency figures plus memory per million chunks: 'hot' is the PQ
+codes and ids a query scans, 'disk' includes the memory-mapped float16
+re-ranking vectors. For comparison, full-precision vectors take
+dim * 4 bytes each before HNSW's graph links (about M * 8 bytes more).
+
+    python retrieval_benchmark.py --sizes 0,10000,50000 --m 16,32 --ef-search 10,50,100
+    python retrieval_benchmark.py --sizes 100000 --ef-search 50 --compressed --nprobe 4,8,16
+"""
+
+import argparse
+import random
+import tempfile
+import time
+import uuid
+from typing import Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+
+import sqlite_fix  # noqa: F401  (must precede chromadb)
+import chromadb
+
+from compressed_index import CompressedVectorIndex
+from rag_system import RAGSystem
+
+
+def _parse_list(value: str, cast=int) -> List:
+    return [cast(v) for v in value.split(',') if v.strip()]
+
+
+def build_labelled_set(rag_system: RAGSystem, lines_per_chunk: int = 2,
+                       seed: int = 7) -> Tuple[List[Dict], List[Tuple[str, Set[str]]]]:
+    """Chunk the knowledge base and derive (query, expected chunk ids) pairs."""
+    rng = random.Random(seed)
+    chunks = []
+    for doc in rag_system.create_knowledge_base():
+        chunks.extend(rag_system._chunk_document(doc))
+    for i, chunk in enumerate(chunks):
+        chunk['id'] = f"chunk_{i}"
+
+    queries: List[Tuple[str, Set[str]]] = []
+    chunks_by_title: Dict[str, Set[str]] = {}
+    for chunk in chunks:
+        chunks_by_title.setdefault(chunk['title'], set()).add(chunk['id'])
+
+    for title, ids in chunks_by_title.items():
+        queries.append((title, ids))
+
+    for chunk in chunks:
+        lines = [line.strip(" -:") for line in chunk['content'].split('\n') if len(line.strip()) > 25]
+        for line in rng.sample(lines, k=min(lines_per_chunk, len(lines))):
+            queries.append((line, {chunk['id']}))
+
+    return chunks, queries
+
+
+def make_distractors(base: np.ndarray, count: int, seed: int = 7, noise: float = 0.35) -> np.ndarray:
+    """Synthetic corpus vectors: noisy copies of real chunks mixed with random directions."""
+    if count <= 0:
+        return np.zeros((0, base.shape[1]), dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    near = count // 2
+    copies = base[rng.integers(0, len(base), size=near)] + rng.normal(0, noise / np.sqrt(base.shape[1]),
+                                                                      size=(near, base.shape[1]))
+    random_dirs = rng.normal(size=(count - near, base.shape[1]))
+    vectors = np.vstack([copies, random_dirs]).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_search(corpus: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """Brute-force top-k indices under the given distance."""
+    if space == 'l2':
+        scores = -(np.sum(corpus ** 2, axis=1)[None, :] - 2 * queries @ corpus.T)
+    elif space == 'cosine':
+        corpus_n = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        queries_n = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        scores = queries_n @ corpus_n.T
+    else:  # inner product
+        scores = queries @ corpus.T
+    top = np.argpartition(-scores, kth=min(k, scores.shape[1] - 1), axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+
+def _percentile_ms(samples: Sequence[float], q: float) -> float:
+    return round(float(np.percentile(samples, q * 100)) * 1000, 3) if len(samples) else 0.0
+
+
+def run_compressed_benchmark(corpus: np.ndarray, ids: List[str], query_vectors: np.ndarray,
+                             expected: List[Set[str]], exact_top: List[np.ndarray], k: int, space: str,
+                             nlist: int, pq_subspaces: int, nprobes: List[int], rerank: int) -> List[Dict]:
+    """Build one compressed index and measure it at each nprobe."""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        build_start = time.perf_counter()
+        index = CompressedVectorIndex.build(corpus, ids, f"{tmp}/index", space=space, nlist=nlist,
+                                            pq_subspaces=pq_subspaces)
+        build_seconds = time.perf_counter() - build_start
+        memory = index.memory_usage()
+
+        for nprobe in nprobes:
+            latencies = []
+            ann_hits = 0
+            label_hits = 0
+            for i, vector in enumerate(query_vectors):
+                t = time.perf_counter()
+                returned, _ = index.search(vector[None, :], k, nprobe=nprobe, rerank=rerank)
+                latencies.append(time.perf_counter() - t)
+
+                returned = set(returned[0])
+                ann_hits += len(returned & {ids[j] for j in exact_top[i]})
+                label_hits += bool(returned & expected[i])
+
+            results.append({
+                'corpus': len(ids),
+                'space': space,
+                'nlist': index.meta['nlist'],
+                'pq_subspaces': pq_subspaces,
+                'nprobe': nprobe,
+                'rerank': rerank,
+                'build_s': round(build_seconds, 2),
+                f'ann_recall@{k}': round(ann_hits / (k * len(query_vectors)), 4),
+                f'label_recall@{k}': round(label_hits / len(query_vectors), 4),
+                'p50_ms': _percentile_ms(latencies, 0.50),
+                'p95_ms': _percentile_ms(latencies, 0.95),
+                # Bytes per chunk equal MB per million chunks; without PQ the float16 vectors are scanned
+                'hot_mb_per_m': round((memory['codes'] if pq_subspaces else memory['rerank_vectors'])
+                                      / len(ids) + memory['ids'] / len(ids), 1),
+                'disk_mb_per_m': round(sum(memory.values()) / len(ids), 1),
+                'float32_mb_per_m': corpus.shape[1] * 4
+            })
+    return results
+
+
+def run_benchmark(corpus: np.ndarray, ids: List[str], query_vectors: np.ndarray,
+                  expected: List[Set[str]], k: int, space: str, m: int,
+                  ef_construction: int, ef_search: int) -> Dict:
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(
+        name=f"bench_{uuid.uuid4().hex[:8]}",
+        metadata={"hnsw:space": space, "hnsw:M": m,
+                  "hnsw:construction_ef": ef_construction, "hnsw:search_ef": ef_search}
+    )
+
+    build_start = time.perf_counter()
+    batch = 5000
+    for start in range(0, len(ids), batch):
+        collection.add(ids=ids[start:start + batch], embeddings=corpus[start:start + batch].tolist())
+    build_seconds = time.perf_counter() - build_start
+
+    exact_latencies = []
+    exact_top = []
+    for vector in query_vectors:
+        t = time.perf_counter()
+        exact_top.append(exact_search(corpus, vector[None, :], k, space)[0])
+        exact_latencies.append(time.perf_counter() - t)
+
+    ann_latencies = []
+    ann_hits = 0
+    label_hits = 0
+    for i, vector in enumerate(query_vectors):
+        t = time.perf_counter()
+        result = collection.query(query_embeddings=[vector.tolist()], n_results=k)
+        ann_latencies.append(time.perf_counter() - t)
+
+        returned = set(result['ids'][0])
+        ann_hits += len(returned & {ids[j] for j in exact_top[i]})
+        label_hits += bool(returned & expected[i])
+
+    client.delete_collection(collection.name)
+    return {
+        'corpus': len(ids),
+        'space': space,
+        'M': m,
+        'ef_construction': ef_construction,
+        'ef_search': ef_search,
+        'build_s': round(build_seconds, 2),
+        f'ann_recall@{k}': round(ann_hits / (k * len(query_vectors)), 4),
+        f'label_recall@{k}': round(label_hits / len(query_vectors), 4),
+        'hnsw_p50_ms': _percentile_ms(ann_latencies, 0.50),
+        'hnsw_p95_ms': _percentile_ms(ann_latencies, 0.95),
+        'exact_p50_ms': _percentile_ms(exact_latencies, 0.50),
+        'exact_p95_ms': _percentile_ms(exact_latencies, 0.95)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW recall/latency benchmark for the RAG vector index")
+    parser.add_argument('--sizes', default="0,10000", help="synthetic distractor counts added to the real chunks")
+    parser.add_argument('--space', default="l2", help="comma-separated: l2,cosine,ip")
+    parser.add_argument('--m', default="16")
+    parser.add_argument('--ef-construction', default="100")
+    parser.add_argument('--ef-search', default="10,50,100")
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--compressed', action='store_true', help="also benchmark the IVF-PQ compressed index")
+    parser.add_argument('--nlist', type=int, default=0, help="compressed index lists (0: about sqrt(N))")
+    parser.add_argument('--nprobe', default="8")
+    parser.add_argument('--pq-subspaces', default="48", help="comma-separated; 0 means float16 vectors only")
+    parser.add_argument('--rerank', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rag_system = RAGSystem()
+    chunks, labelled = build_labelled_set(rag_system, seed=args.seed)
+    chunk_vectors = rag_system.embedding_model.encode([c['content'] for c in chunks]).astype(np.float32)
+    query_vectors = rag_system.embedding_model.encode([q for q, _ in labelled]).astype(np.float32)
+    expected = [ids for _, ids in labelled]
+    print(f"{len(chunks)} chunks, {len(labelled)} labelled queries")
+
+    results = []
+    compressed_results = []
+    for size in _parse_list(args.sizes):
+        distractors = make_distractors(chunk_vectors, size, seed=args.seed)
+        corpus = np.vstack([chunk_vectors, distractors])
+        ids = [c['id'] for c in chunks] + [f"synthetic_{i}" for i in range(size)]
+
+        for space in _parse_list(args.space, str):
+            for m in _parse_list(args.m):
+                for ef_construction in _parse_list(args.ef_construction):
+                    for ef_search in _parse_list(args.ef_search):
+                        result = run_benchmark(corpus, ids, query_vectors, expected, args.k,
+                                               space, m, ef_construction, ef_search)
+                        results.append(result)
+                        print(result)
+
+        if args.compressed:
+            for space in _parse_list(args.space, str):
+                exact_top = [exact_search(corpus, vector[None, :], args.k, space)[0] for vector in query_vectors]
+                for pq_subspaces in _parse_list(args.pq_subspaces):
+                    for result in run_compressed_benchmark(corpus, ids, query_vectors, expected, exact_top, args.k,
+                                                           space, args.nlist, pq_subspaces,
+                                                           _parse_list(args.nprobe), args.rerank):
+                        compressed_results.append(result)
+                        print(result)
+
+    k = args.k
+    print(f"\n{'corpus':>8}{'space':>8}{'M':>5}{'efC':>6}{'efS':>6}{'ann@k':>8}{'label@k':>9}"
+          f"{'hnsw p50':>10}{'hnsw p95':>10}{'exact p50':>11}")
+    for r in results:
+        print(f"{r['corpus']:>8}{r['space']:>8}{r['M']:>5}{r['ef_construction']:>6}{r['ef_search']:>6}"
+              f"{r[f'ann_recall@{k}']:>8}{r[f'label_recall@{k}']:>9}{r['hnsw_p50_ms']:>10}"
+              f"{r['hnsw_p95_ms']:>10}{r['exact_p50_ms']:>11}")
+
+    if compressed_results:
+        print(f"\n{'corpus':>8}{'space':>8}{'nlist':>7}{'pq':>5}{'nprobe':>8}{'ann@k':>8}{'label@k':>9}"
+              f"{'p50 ms':>9}{'p95 ms':>9}{'hot MB/M':>10}{'disk MB/M':>11}{'f32 MB/M':>10}")
+        for r in compressed_results:
+            print(f"{r['corpus']:>8}{r['space']:>8}{r['nlist']:>7}{r['pq_subspaces']:>5}{r['nprobe']:>8}"
+                  f"{r[f'ann_recall@{k}']:>8}{r[f'label_recall@{k}']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+                  f"{r['hot_mb_per_m']:>10}{r['disk_mb_per_m']:>11}{r['float32_mb_per_m']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Structured classification output: JSON schema requests, parsing and label coercion.
+
+extract_json() finds the first complete JSON value in a model response
+(tracking brace depth and string escapes), so prose, code fences, stray braces
+or trailing text around the answer don't matter. coerce_classification()
+validates the decoded fields against the labels in Config, fixing common
+near-misses ("high", "p1", "api", "frustrated.", "connectors") and accepting
+the v2 prompt's exact codes ("F", "PII"); anything shorter or more ambiguous
+("n", "data") is reported as failed so only those fields are re-asked.
+
+Clients whose chat() accepts a `response_format` argument are sent the
+template's JSON schema (provider-enforced structured output); others rely on
+the prompt and this parser.
+"""
+
+import inspect
+import json
+import re
+from typing import Dict, List, Optional, Tuple, Union
+
+from config import Config
+from prompt_templates import LABEL_CODES
+
+CLASSIFICATION_FIELDS = ('topic_tags', 'sentiment', 'priority')
+
+_OPENERS = {'{': '}', '[': ']'}
+_OPENER_RE = re.compile(r'[{\[]')
+_MIN_PREFIX = 4  # shorter fragments ("n", "data") are too ambiguous to guess a label from
+
+
+def _balanced_end(text: str, start: int) -> Optional[int]:
+    """Index of the bracket closing the one at `start`, or None if it never closes."""
+    stack: List[str] = []
+    in_string = escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in _OPENERS:
+            stack.append(_OPENERS[char])
+        elif stack and char == stack[-1]:
+            stack.pop()
+            if not stack:
+                return i
+    return None
+
+
+def extract_json(text: str, expect: type = None) -> Optional[Union[Dict, List]]:
+    """Return the first balanced JSON object/array in text (of type `expect` if given).
+
+    A candidate that does not parse or never closes (a stray "{" in prose) is
+    skipped and scanning resumes at the next bracket after its opening one.
+    """
+    if not text:
+        return None
+    position = 0
+    while True:
+        opener = _OPENER_RE.search(text, position)
+        if opener is None:
+            return None
+        start = opener.start()
+        end = _balanced_end(text, start)
+        if end is not None:
+            try:
+                value = json.loads(text[start:end + 1])
+            except json.JSONDecodeError:
+                pass
+            else:
+                if expect is None or isinstance(value, expect):
+                    return value
+                position = end + 1  # a complete value of the wrong type: look past it
+                continue
+        position = start + 1
+
+
+def _normalize(label: str) -> str:
+    return re.sub(r'[^a-z0-9]', '', str(label).lower())
+
+
+def _label_lookup(labels: List[str]) -> Dict[str, str]:
+    """Map normalized spellings (full label, its head, its parenthesised part, slash alternatives) to the label."""
+    lookup = {}
+    for label in labels:
+        lookup[_normalize(label)] = label
+        match = re.match(r'^(.*?)\s*\((.*)\)$', label)  # "P0 (High)" -> "P0", "High"
+        if match:
+            lookup.setdefault(_normalize(match.group(1)), label)
+            lookup.setdefault(_normalize(match.group(2)), label)
+        if '/' in label:  # "API/SDK" -> "API", "SDK"
+            for part in label.split('/'):
+                lookup.setdefault(_normalize(part), label)
+    return lookup
+
+
+def _code_lookup(labels: List[str]) -> Dict[str, str]:
+    """Map the v2 prompt's short codes ("F", "PII") to the labels they stand for."""
+    return {LABEL_CODES[label]: label for label in labels if label in LABEL_CODES}
+
+
+def _match(value, lookup: Dict[str, str], codes: Dict[str, str]) -> Optional[str]:
+    """Exact label or alias (case-insensitive), exact v2 code, or an unambiguous prefix/suffix variant."""
+    text = str(value).strip().rstrip('.')
+    if text in codes:
+        return codes[text]
+    key = _normalize(text)
+    if not key:
+        return None
+    if key in lookup:
+        return lookup[key]
+    if len(key) < _MIN_PREFIX:
+        return None
+    # Plurals, small suffixes and truncations ("connectors", "howto guide", "frustr")
+    candidates = {label for norm, label in lookup.items()
+                  if len(norm) >= _MIN_PREFIX and (key.startswith(norm) or norm.startswith(key))}
+    return candidates.pop() if len(candidates) == 1 else None
+
+
+def coerce_classification(item: Optional[Dict], config: Config = None) -> Tuple[Dict, List[str]]:
+    """Validate a decoded classification against Config labels.
+
+    Returns (classification with the fields that could be coerced, names of fields
+    that are missing or invalid).
+    """
+    config = config or Config()
+    item = item if isinstance(item, dict) else {}
+    result: Dict = {}
+
+    tags = item.get('topic_tags')
+    if isinstance(tags, str):
+        tags = re.split(r'\s*,\s*', tags)
+    if isinstance(tags, list):
+        lookup, codes = _label_lookup(config.TOPIC_TAGS), _code_lookup(config.TOPIC_TAGS)
+        coerced = [_match(tag, lookup, codes) for tag in tags]
+        coerced = list(dict.fromkeys(tag for tag in coerced if tag))
+        if coerced:
+            result['topic_tags'] = coerced
+
+    for field, labels in (('sentiment', config.SENTIMENT_LABELS), ('priority', config.PRIORITY_LABELS)):
+        value = item.get(field)
+        if isinstance(value, list) and value:
+            value = value[0]
+        if isinstance(value, str):
+            label = _match(value, _label_lookup(labels), _code_lookup(labels))
+            if label:
+                result[field] = label
+
+    reasoning = item.get('reasoning')
+    if isinstance(reasoning, str) and reasoning.strip():
+        result['reasoning'] = reasoning.strip()
+
+    failed = [field for field in CLASSIFICATION_FIELDS if field not in result]
+    return result, failed
+
+
+def supports_response_format(client) -> bool:
+    """Whether the client's chat() accepts a response_format (JSON schema) argument."""
+    try:
+        return 'response_format' in inspect.signature(client.chat).parameters
+    except (TypeError, ValueError):
+        return False
@@ -0,0 +1,134 @@
+"""
+Stub Cohere client for local testing and benchmarks without API keys or quota.
+
+StubCohereClient mirrors the subset of cohere.Client used by TicketClassifier
+and RAGSystem (chat(...) returning an object with .text). Classification
+prompts are answered with keyword-based labels in the JSON shape the real
+model is asked for (wrapped as {"answers": [...]} when a response_format
+schema asks for it); answer prompts get a short canned answer and FAQ
+generation prompts two canned questions about the document.
+
+Latency, server errors, 429 rate-limit errors and malformed JSON can be
+injected to exercise retry, fallback and parsing paths.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from cohere.error import CohereAPIError
+
+from prompt_templates import estimate_tokens, template_for_preamble
+
+_TICKET_PATTERN = re.compile(r"Subject: (.*?)\nBody: (.*?)(?=\n\n|\nRespond|\Z)", re.DOTALL)
+
+
+class StubChatResponse:
+    def __init__(self, text: str, prompt_tokens: int = 0):
+        self.text = text
+        completion_tokens = estimate_tokens(text)
+        self.token_count = {
+            'prompt_tokens': prompt_tokens,
+            'response_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens
+        }
+        self.meta = {'billed_units': {'input_tokens': prompt_tokens, 'output_tokens': completion_tokens}}
+
+
+class StubCohereClient:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, malformed_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.malformed = 0
+        self.call_durations: List[float] = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._labeller = None
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls = self.errors = self.rate_limited = self.malformed = 0
+            self.call_durations = []
+
+    def _classify(self, subject: str, body: str) -> Dict:
+        if self._labeller is None:
+            # Imported lazily to avoid a circular import with ai_classifier
+            from ai_classifier import TicketClassifier
+            self._labeller = TicketClassifier(cohere_client=self, distilled_model=False)
+        result = self._labeller._keyword_classification(subject, body)
+        result['reasoning'] = "Stub classification"
+        return result
+
+    def _respond(self, message: str, preamble: Optional[str] = None, response_format: Optional[Dict] = None) -> str:
+        if "Document title:" in message:
+            title = message.split("Document title:", 1)[1].split("\n", 1)[0].strip()
+            return json.dumps({'faqs': [
+                {'question': f"How do I set up {title}?", 'answer': f"Stub FAQ answer: setting up {title}."},
+                {'question': f"What does {title} require?", 'answer': f"Stub FAQ answer: requirements for {title}."}
+            ]})
+        if "Question:" in message:
+            question = message.split("Question:", 1)[1].split("\n", 1)[0].strip()
+            return f"Stub answer for: {question}"
+
+        # Answer in the format (e.g. compact label codes) of the template that rendered the prompt
+        template = template_for_preamble(preamble)
+        tickets: List[Dict] = [
+            template.encode(self._classify(subject.strip(), body.strip()))
+            for subject, body in _TICKET_PATTERN.findall(message)
+        ]
+        if response_format and "answers" in response_format.get('schema', {}).get('properties', {}):
+            return json.dumps({'answers': tickets})
+        if "JSON array" in message:
+            return json.dumps(tickets)
+        return json.dumps(tickets[0] if tickets else {})
+
+    @staticmethod
+    def _malform(text: str) -> str:
+        """Corrupt a JSON response the way real models occasionally do."""
+        return "Sure! Here is the classification:\n" + text[:max(len(text) // 2, 1)]
+
+    def chat(self, message: str = "", model: str = None, max_tokens: int = None,
+             temperature: float = None, response_format: Optional[Dict] = None, **kwargs) -> StubChatResponse:
+        start = time.perf_counter()
+        with self._lock:
+            self.calls += 1
+            roll_rate_limit = self._random.random()
+            roll_error = self._random.random()
+            roll_malformed = self._random.random()
+            delay = max(self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms), 0.0)
+
+        try:
+            if roll_rate_limit < self.rate_limit_rate:
+                with self._lock:
+                    self.rate_limited += 1
+                raise CohereAPIError("too many requests", http_status=429)
+
+            time.sleep(delay / 1000.0)
+
+            if roll_error < self.error_rate:
+                with self._lock:
+                    self.errors += 1
+                raise CohereAPIError("internal server error", http_status=500)
+
+            preamble = kwargs.get('preamble_override')
+            text = self._respond(message, preamble, response_format)
+            if roll_malformed < self.malformed_rate and "Question:" not in message:
+                with self._lock:
+                    self.malformed += 1
+                text = self._malform(text)
+
+            return StubChatResponse(text, prompt_tokens=estimate_tokens((preamble or "") + message))
+        finally:
+            with self._lock:
+                self.call_durations.append(time.perf_counter() - start)
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from circuit_breaker import COHERE_BREAKER  # noqa: E402
+from stub_llm import StubCohereClient  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def closed_breaker():
+    """Tests share the process-wide breaker; start each one with it closed."""
+    COHERE_BREAKER.reset()
+    yield
+    COHERE_BREAKER.reset()
+
+
+@pytest.fixture
+def stub_client():
+    return StubCohereClient(seed=7)
+
+
+@pytest.fixture
+def classifier(stub_client):
+    from ai_classifier import TicketClassifier
+    classifier = TicketClassifier(cohere_client=stub_client, distilled_model=False)
+    classifier.min_delay_between_calls = 0  # stub clients have no quota to protect
+    return classifier
+
@@ -0,0 +1,89 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from api_server import CopilotAPI, create_server
+
+
+@pytest.fixture
+def api(classifier):
+    api = CopilotAPI(classifier, rag_system=None, batch_window_ms=20)
+    server = create_server(api, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield api
+    server.shutdown()
+    server.server_close()
+
+
+def request(api, path, body=None):
+    data = body.encode('utf-8') if isinstance(body, str) else None
+    req = urllib.request.Request(api.base_url + path, data=data, method='POST' if data is not None else 'GET')
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_classify_returns_labels(api):
+    status, result = request(api, '/classify', json.dumps({'subject': "SSO login", 'body': "SAML login fails"}))
+    assert status == 200
+    assert result['topic_tags'] == ['SSO']
+    assert set(result) >= {'sentiment', 'priority', 'reasoning'}
+
+
+def test_classify_batch_keeps_ticket_order(api):
+    tickets = [{'id': 'a', 'subject': "Lineage", 'body': "lineage graph is empty"},
+               {'id': 'b', 'subject': "SSO", 'body': "Okta SSO login loops"}]
+    status, result = request(api, '/classify/batch', json.dumps({'tickets': tickets}))
+    assert status == 200
+    assert [r['id'] for r in result['results']] == ['a', 'b']
+    assert [r['topic_tags'] for r in result['results']] == [['Lineage'], ['SSO']]
+
+
+@pytest.mark.parametrize('path,body', [
+    ('/classify/batch', '[{"subject": "a", "body": "b"}]'),  # not an object
+    ('/classify/batch', '{"tickets": []}'),
+    ('/classify/batch', '{"tickets": [{"subject": "a"}]}'),
+    ('/classify', '{"subject": "a"}'),
+    ('/classify', '{not json'),
+    ('/profile', '{"requests": -1}'),
+])
+def test_invalid_requests_are_400(api, path, body):
+    status, result = request(api, path, body)
+    assert status == 400
+    assert 'error' in result
+
+
+def test_errors_while_classifying_are_500(api):
+    def broken(tickets):
+        raise ValueError("bug in the batch function")
+    api.classify_batcher.batch_fn = broken
+
+    status, result = request(api, '/classify', json.dumps({'subject': "a", 'body': "b"}))
+    assert status == 500
+    assert result == {'error': "internal error"}
+    assert api.metrics()['endpoints']['/classify']['errors'] == 1
+
+
+def test_answer_without_rag_is_404(api):
+    status, _ = request(api, '/answer', json.dumps({'query': "How do I set up SSO?"}))
+    assert status == 404
+
+
+def test_unknown_path_is_404(api):
+    assert request(api, '/nope', '{}')[0] == 404
+    assert request(api, '/nope')[0] == 404
+
+
+def test_health_and_metrics(api):
+    request(api, '/classify', json.dumps({'subject': "a", 'body': "b"}))
+    assert request(api, '/health') == (200, {'status': 'ok'})
+    status, metrics = request(api, '/metrics')
+    assert status == 200
+    assert metrics['endpoints']['/classify']['requests'] == 1
+    assert metrics['batchers']['answer'] is None
@@ -0,0 +1,69 @@
+import pytest
+
+from budget import BULK, INTERACTIVE, RAG, BudgetExceededError, BudgetManager
+
+
+def make_budget(**kwargs):
+    settings = dict(call_limit=10, token_limit=0, window_seconds=3600, reserved={INTERACTIVE: 0.3},
+                    low_watermark=0.25, state_path='')
+    settings.update(kwargs)
+    return BudgetManager(**settings)
+
+
+def test_bulk_work_cannot_spend_the_interactive_reservation():
+    budget = make_budget()
+    for _ in range(7):
+        budget.commit(budget.reserve(BULK, 100))
+    with pytest.raises(BudgetExceededError):
+        budget.reserve(BULK, 100)
+
+    for _ in range(3):
+        budget.commit(budget.reserve(INTERACTIVE, 100))
+    with pytest.raises(BudgetExceededError):
+        budget.reserve(INTERACTIVE, 100)
+    assert budget.snapshot()['usage'][BULK]['calls'] == 7
+
+
+def test_bulk_degrades_at_the_low_watermark():
+    budget = make_budget()
+    for _ in range(5):
+        budget.commit(budget.reserve(BULK, 100))
+    assert not budget.should_degrade(BULK)
+
+    budget.commit(budget.reserve(RAG, 100))  # 1 of the 7 shared calls left, below 25%
+    assert budget.should_degrade(BULK)
+    assert budget.snapshot()['bulk_degraded']
+    assert not budget.should_degrade(INTERACTIVE)
+
+
+def test_commit_uses_measured_tokens_and_release_returns_the_reservation():
+    budget = make_budget(call_limit=0, token_limit=1000)
+    reservation = budget.reserve(BULK, 300)
+    budget.commit(reservation, tokens=120)
+    budget.commit(reservation, tokens=999)  # settling twice is a no-op
+    budget.release(budget.reserve(BULK, 500))
+
+    assert budget.snapshot()['usage'][BULK] == {'calls': 1, 'tokens': 120}
+
+
+def test_usage_survives_a_restart_within_the_window(tmp_path):
+    state_path = str(tmp_path / 'budget.json')
+    budget = make_budget(state_path=state_path)
+    for _ in range(2):
+        budget.commit(budget.reserve(RAG, 50))
+
+    restarted = make_budget(state_path=state_path)
+    assert restarted.snapshot()['usage'][RAG] == {'calls': 2, 'tokens': 100}
+
+
+def test_zero_limits_are_unlimited():
+    budget = make_budget(call_limit=0, token_limit=0)
+    for _ in range(100):
+        budget.commit(budget.reserve(BULK, 10_000))
+    assert not budget.should_degrade(BULK)
+    assert not budget.snapshot()['enabled']
+
+
+def test_reservations_cannot_exceed_the_budget():
+    with pytest.raises(ValueError):
+        make_budget(reserved={INTERACTIVE: 0.7, RAG: 0.5})
@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, is_transient_error
+from llm_pool import LLMBackendError
+
+
+def make_breaker(**kwargs):
+    settings = dict(failure_threshold=2, reset_timeout=0.05, half_open_max_calls=1, max_retries=0,
+                    backoff_base=0, backoff_max=0)
+    settings.update(kwargs)
+    return CircuitBreaker('test', **settings)
+
+
+def fail(status):
+    def call():
+        raise LLMBackendError(f"HTTP {status}", http_status=status)
+    return call
+
+
+def test_opens_after_threshold_and_rejects_calls():
+    breaker = make_breaker()
+    for _ in range(2):
+        with pytest.raises(LLMBackendError):
+            breaker.call(fail(503))
+    assert breaker.state == OPEN
+
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: calls.append(1))
+    assert calls == []
+
+
+def test_half_open_probe_success_closes():
+    breaker = make_breaker(failure_threshold=1)
+    with pytest.raises(LLMBackendError):
+        breaker.call(fail(500))
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_failure_reopens():
+    breaker = make_breaker(failure_threshold=1)
+    with pytest.raises(LLMBackendError):
+        breaker.call(fail(500))
+    time.sleep(0.06)
+    with pytest.raises(LLMBackendError):
+        breaker.call(fail(429))
+    assert breaker.snapshot()['state'] == OPEN
+
+
+def test_non_transient_errors_leave_the_breaker_alone():
+    breaker = make_breaker(failure_threshold=1)
+    for _ in range(3):
+        with pytest.raises(LLMBackendError):
+            breaker.call(fail(400))
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()['consecutive_failures'] == 0
+
+
+def test_non_transient_probe_frees_the_probe_slot():
+    breaker = make_breaker(failure_threshold=1)
+    with pytest.raises(LLMBackendError):
+        breaker.call(fail(500))
+    time.sleep(0.06)
+    with pytest.raises(LLMBackendError):
+        breaker.call(fail(400))
+    assert breaker.state == HALF_OPEN
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == CLOSED
+
+
+def test_retries_transient_errors():
+    breaker = make_breaker(failure_threshold=5, max_retries=2)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("reset")
+        return 'ok'
+
+    assert breaker.call(flaky) == 'ok'
+    assert len(attempts) == 3
+    assert breaker.state == CLOSED
+
+
+def test_open_error_keeps_the_transient_error_that_opened_the_circuit():
+    breaker = make_breaker(failure_threshold=1)
+    with pytest.raises(LLMBackendError):
+        breaker.call(fail(500))
+    time.sleep(0.06)
+
+    # The failed probe re-opens the circuit before the retry, which is then rejected
+    breaker.max_retries = 1
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.call(fail(503))
+    assert isinstance(excinfo.value.__cause__, LLMBackendError)
+    assert excinfo.value.__cause__.http_status == 503
+
+
+def test_transient_error_classification():
+    assert is_transient_error(LLMBackendError("rate limited", http_status=429))
+    assert is_transient_error(LLMBackendError("unavailable", http_status=503))
+    assert is_transient_error(TimeoutError())
+    assert not is_transient_error(LLMBackendError("bad request", http_status=400))
+    assert not is_transient_error(ValueError("bad JSON"))
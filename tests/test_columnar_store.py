@@ -0,0 +1,63 @@
+import pytest
+
+from columnar_store import ColumnarTickets, TextColumn
+
+
+def classified(i, **overrides):
+    ticket = {'id': f"T-{i}", 'subject': f"Subject {i}", 'body': f"Body {i} – café",
+              'topic_tags': ['Product', 'API/SDK'], 'sentiment': 'Neutral', 'priority': 'P2 (Low)',
+              'reasoning': "test"}
+    ticket.update(overrides)
+    return ticket
+
+
+def test_rows_round_trip_including_unknown_labels_and_extras():
+    records = [classified(0), classified(1, priority='P9 (Custom)', topic_tags=['Brand New']),
+               classified(2, sentiment=None, duplicate_of='T-0')]
+    columns = ColumnarTickets.from_tickets(records)
+
+    assert len(columns) == 3
+    assert columns.to_records() == records
+    assert columns[-1] == records[2]
+    with pytest.raises(IndexError):
+        columns[3]
+
+
+def test_overwriting_rows_keeps_text_consistent():
+    columns = ColumnarTickets.from_tickets([classified(i) for i in range(4)])
+    columns[1] = classified(1, body="a much longer body than the original one " * 10)
+    columns[2] = classified(2, body="short", reasoning="updated")
+
+    assert columns[1]['body'].startswith("a much longer body")
+    assert columns[2]['body'] == "short"
+    assert columns[2]['reasoning'] == "updated"
+    assert columns[3] == classified(3)
+
+
+def test_text_column_compacts_dead_bytes():
+    column = TextColumn(capacity=1)
+    for text in ("alpha", "beta", "gamma"):
+        column.append(text)
+    column[0] = "a replacement longer than alpha"
+    column[0] = "x"
+    column.compact()
+
+    assert list(column) == ["x", "beta", "gamma"]
+    assert len(column.data) == len("xbetagamma")
+
+
+def test_arrow_export_matches_rows():
+    pa = pytest.importorskip('pyarrow')
+    records = [classified(0), classified(1, priority=None, duplicate_of='T-0')]
+    columns = ColumnarTickets.from_tickets(records)
+    columns[0] = classified(0, subject="A subject longer than before")
+
+    table = columns.to_arrow()
+    assert isinstance(table, pa.Table)
+    assert table.column('subject').to_pylist() == ["A subject longer than before", "Subject 1"]
+    assert table.column('priority').to_pylist() == ['P2 (Low)', None]
+    assert table.column('topic_tags').to_pylist() == [['Product', 'API/SDK']] * 2
+    assert table.column('duplicate_of').to_pylist() == [None, 'T-0']
+    # The text buffer stays appendable after export
+    columns.append(classified(2))
+    assert columns[2]['subject'] == "Subject 2"
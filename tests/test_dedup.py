@@ -0,0 +1,64 @@
+import numpy as np
+
+from dedup import TicketDeduplicator
+
+
+class FixedSignatures(TicketDeduplicator):
+    """Uses each ticket's 'signature' as given, so similarities are exact."""
+
+    def signature(self, ticket):
+        return ticket['signature']
+
+
+def chained_signatures(count, step=10, width=100):
+    """Each signature differs from the previous one in `step` more slots: neighbours are 0.9 similar."""
+    signatures, current = [], np.arange(width, dtype=np.uint64)
+    for i in range(count):
+        if i:
+            current = current.copy()
+            current[(i - 1) * step:i * step] += 1000 * i
+        signatures.append(current)
+    return signatures
+
+
+def test_chained_tickets_are_split_below_the_threshold():
+    # A~B, B~C and C~D are 0.9 similar, but A~C and B~D only 0.8 and A~D 0.7
+    tickets = [{'id': name, 'subject': name, 'body': '', 'signature': signature}
+               for name, signature in zip("ABCD", chained_signatures(4))]
+    deduplicator = FixedSignatures(threshold=0.85, num_perm=100)
+
+    clusters = deduplicator.cluster(tickets)
+
+    # B or C represents its neighbours; the far end of the chain is split off
+    assert sorted(len(c['members']) for c in clusters) == [1, 3]
+    for cluster in clusters:
+        assert all(similarity >= 0.85 for similarity in cluster['similarity'].values())
+        assert cluster['similarity'][cluster['representative']] == 1.0
+
+
+def test_near_duplicates_share_one_llm_call():
+    body = "Our Snowflake connection keeps failing with a timeout when the crawler starts the nightly sync job."
+    tickets = [
+        {'id': 'T-1', 'subject': "Snowflake connection failing", 'body': body},
+        {'id': 'T-2', 'subject': "Snowflake connection failing", 'body': body + " Thanks!"},
+        {'id': 'T-3', 'subject': "How do I add a glossary term?", 'body': "Where is the glossary editor in the UI?"},
+        {'id': 'T-4', 'subject': "Snowflake connection failing", 'body': body},
+    ]
+    calls = []
+
+    def classify_fn(subject, body):
+        calls.append(subject)
+        return {'topic_tags': ['Connector'], 'sentiment': 'Frustrated', 'priority': 'P0 (High)', 'reasoning': "llm"}
+
+    results, audit = TicketDeduplicator().classify(tickets, classify_fn)
+
+    assert len(calls) == 2
+    assert [r['id'] for r in results] == ['T-1', 'T-2', 'T-3', 'T-4']
+    assert all(r['priority'] == 'P0 (High)' for r in results)
+    assert len(audit) == 2
+    assert all(entry['cluster_size'] == 3 and entry['similarity'] >= 0.85 for entry in audit)
+    assert 'duplicate_of' not in results[2]
+
+
+def test_empty_input():
+    assert TicketDeduplicator().cluster([]) == []
@@ -0,0 +1,165 @@
+import json
+import os
+
+import pytest
+
+from ingestion import INBOX_VERSION, InboxIngestor, IngestorLockedError
+from result_store import ResultStore
+
+
+class CountingClassifier:
+    """Stands in for TicketClassifier.classify_packed, recording what it was asked to classify."""
+
+    def __init__(self, classifier):
+        self.classifier = classifier
+        self.classified_ids = []
+
+    def classify_packed(self, tickets, caller=None):
+        self.classified_ids.extend(ticket['id'] for ticket in tickets)
+        return self.classifier.classify_packed(tickets, caller=caller)
+
+
+@pytest.fixture
+def counting(classifier):
+    return CountingClassifier(classifier)
+
+
+def write_lines(path, tickets, mode='a', newline=True):
+    with open(path, mode) as f:
+        for i, ticket in enumerate(tickets):
+            last = i == len(tickets) - 1
+            f.write(json.dumps(ticket) + ("\n" if newline or not last else ""))
+
+
+def ticket(i):
+    return {'id': f"T-{i}", 'subject': f"SSO issue {i}", 'body': f"SAML login fails for user {i}"}
+
+
+def ingest_all(ingestor):
+    while ingestor.poll_once():
+        pass
+
+
+def test_ingests_and_persists_a_watermark(tmp_path, counting):
+    inbox = tmp_path / 'inbox.jsonl'
+    write_lines(inbox, [ticket(i) for i in range(5)])
+    store_dir = tmp_path / 'store'
+
+    ingestor = InboxIngestor(counting, ResultStore(str(store_dir)), str(inbox), batch_size=2, flush_seconds=0)
+    ingest_all(ingestor)
+
+    assert counting.classified_ids == [f"T-{i}" for i in range(5)]
+    with open(store_dir / f"{INBOX_VERSION}.watermark.json") as f:
+        watermark = json.load(f)
+    assert watermark['files'][str(inbox)]['offset'] == os.path.getsize(inbox)
+    results = ResultStore(str(store_dir)).get(INBOX_VERSION)
+    assert [r['topic_tags'] for r in results] == [['SSO']] * 5
+
+
+def test_restart_resumes_after_the_watermark(tmp_path, counting):
+    inbox = tmp_path / 'inbox.jsonl'
+    store_dir = tmp_path / 'store'
+    write_lines(inbox, [ticket(i) for i in range(3)])
+    first = InboxIngestor(counting, ResultStore(str(store_dir)), str(inbox), flush_seconds=0)
+    ingest_all(first)
+    first.close()
+
+    write_lines(inbox, [ticket(i) for i in range(3, 5)])
+    restarted = InboxIngestor(counting, ResultStore(str(store_dir)), str(inbox), flush_seconds=0)
+    ingest_all(restarted)
+
+    assert counting.classified_ids == [f"T-{i}" for i in range(5)]
+    assert len(ResultStore(str(store_dir)).get(INBOX_VERSION)) == 5
+
+
+def test_incomplete_line_waits_for_its_newline(tmp_path, counting):
+    inbox = tmp_path / 'inbox.jsonl'
+    write_lines(inbox, [ticket(0), ticket(1)], newline=False)
+    ingestor = InboxIngestor(counting, ResultStore(str(tmp_path / 'store')), str(inbox), flush_seconds=0)
+
+    ingest_all(ingestor)
+    assert counting.classified_ids == ["T-0"]
+
+    with open(inbox, 'a') as f:
+        f.write("\n")
+    ingest_all(ingestor)
+    assert counting.classified_ids == ["T-0", "T-1"]
+
+
+def test_ids_already_stored_are_skipped(tmp_path, counting):
+    inbox_dir = tmp_path / 'inbox'
+    os.makedirs(inbox_dir)
+    write_lines(inbox_dir / '001.jsonl', [ticket(0), ticket(1)])
+    write_lines(inbox_dir / '002.jsonl', [ticket(1), ticket(2)])
+
+    ingestor = InboxIngestor(counting, ResultStore(str(tmp_path / 'store')), str(inbox_dir), batch_size=2,
+                             flush_seconds=0)
+    ingest_all(ingestor)
+
+    assert counting.classified_ids == ["T-0", "T-1", "T-2"]
+    assert ingestor.status()['duplicates'] == 1
+
+
+def test_truncated_file_is_read_from_the_start(tmp_path, counting):
+    inbox = tmp_path / 'inbox.jsonl'
+    write_lines(inbox, [ticket(0), ticket(1)])
+    ingestor = InboxIngestor(counting, ResultStore(str(tmp_path / 'store')), str(inbox), flush_seconds=0)
+    ingest_all(ingestor)
+
+    write_lines(inbox, [ticket(2)], mode='w')
+    ingest_all(ingestor)
+
+    assert counting.classified_ids == ["T-0", "T-1", "T-2"]
+
+
+def test_malformed_lines_are_counted_and_skipped(tmp_path, counting):
+    inbox = tmp_path / 'inbox.jsonl'
+    with open(inbox, 'w') as f:
+        f.write("not json\n" + json.dumps({'subject': "no body"}) + "\n" + json.dumps(ticket(0)) + "\n")
+    ingestor = InboxIngestor(counting, ResultStore(str(tmp_path / 'store')), str(inbox), flush_seconds=0)
+    ingest_all(ingestor)
+
+    assert counting.classified_ids == ["T-0"]
+    assert ingestor.status()['malformed'] == 2
+
+
+def test_repeated_ids_within_a_batch_are_ingested_once(tmp_path, counting):
+    inbox = tmp_path / 'inbox.jsonl'
+    write_lines(inbox, [ticket(0), ticket(1), ticket(0), ticket(1)])
+    ingestor = InboxIngestor(counting, ResultStore(str(tmp_path / 'store')), str(inbox), batch_size=8,
+                             flush_seconds=0)
+    ingest_all(ingestor)
+
+    assert counting.classified_ids == ["T-0", "T-1"]
+    assert ingestor.status()['duplicates'] == 2
+    assert len(ingestor.result_store.get(INBOX_VERSION)) == 2
+
+
+def test_same_text_without_ids_gets_distinct_synthetic_ids(tmp_path, counting):
+    inbox_dir = tmp_path / 'inbox'
+    os.makedirs(inbox_dir)
+    message = {'subject': "Cannot log in", 'body': "SSO redirect loops"}
+    write_lines(inbox_dir / 'customer-a.jsonl', [message, message])
+    write_lines(inbox_dir / 'customer-b.jsonl', [message])
+
+    ingestor = InboxIngestor(counting, ResultStore(str(tmp_path / 'store')), str(inbox_dir), flush_seconds=0)
+    ingest_all(ingestor)
+
+    assert len(set(counting.classified_ids)) == 3
+    assert all(ticket_id.startswith("INBOX-") for ticket_id in counting.classified_ids)
+    assert ingestor.status()['duplicates'] == 0
+
+
+def test_only_one_ingestor_may_write_a_store(tmp_path, counting):
+    inbox = tmp_path / 'inbox.jsonl'
+    write_lines(inbox, [ticket(0)])
+    store_dir = str(tmp_path / 'store')
+    first = InboxIngestor(counting, ResultStore(store_dir), str(inbox), flush_seconds=0)
+
+    with pytest.raises(IngestorLockedError):
+        InboxIngestor(counting, ResultStore(store_dir), str(inbox), flush_seconds=0)
+
+    first.close()
+    second = InboxIngestor(counting, ResultStore(store_dir), str(inbox), flush_seconds=0)
+    ingest_all(second)
+    assert counting.classified_ids == ["T-0"]
@@ -0,0 +1,130 @@
+import json
+import os
+import threading
+import time
+
+from job_queue import CANCELLED, COMPLETED, ClassificationJobQueue
+from llm_scheduler import LLMScheduler
+from result_store import ResultStore
+
+
+def ticket(i, **labels):
+    return {'id': f"T-{i}", 'subject': f"Subject {i}", 'body': f"Body {i}", **labels}
+
+
+def classified(i, priority='P2 (Low)'):
+    return ticket(i, topic_tags=['Product'], sentiment='Neutral', priority=priority, reasoning="test")
+
+
+def wait_for(queue, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = queue.get_status(job_id)
+        if status['finished_at'] is not None:
+            return status
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_resumes_from_partial_results(tmp_path):
+    tickets = [ticket(i) for i in range(5)]
+    store_dir, job_dir = tmp_path / 'store', tmp_path / 'jobs'
+    os.makedirs(job_dir)
+    # An earlier run classified positions 0 and 3 before the process died mid-write
+    with open(job_dir / 'v1.partial.jsonl', 'w') as f:
+        for position in (0, 3):
+            f.write(json.dumps({'position': position, 'ticket': classified(position, priority='P0 (High)')}) + "\n")
+        f.write('{"position": 4, "tick')
+
+    classified_subjects = []
+
+    def classify_fn(subject, body):
+        classified_subjects.append(subject)
+        return {'topic_tags': ['Product'], 'sentiment': 'Neutral', 'priority': 'P1 (Medium)', 'reasoning': "llm"}
+
+    queue = ClassificationJobQueue(classify_fn, ResultStore(str(store_dir)), job_dir=str(job_dir))
+    status = wait_for(queue, queue.submit('v1', tickets))
+
+    assert status['status'] == COMPLETED
+    assert sorted(classified_subjects) == ["Subject 1", "Subject 2", "Subject 4"]
+    assert not os.path.exists(job_dir / 'v1.partial.jsonl')
+    records = ResultStore(str(store_dir)).get('v1').to_records()
+    assert [r['priority'] for r in records] == ['P0 (High)', 'P1 (Medium)', 'P1 (Medium)', 'P0 (High)', 'P1 (Medium)']
+
+
+def test_cancelled_job_is_not_resumed_until_submitted_again(tmp_path):
+    started, release = threading.Event(), threading.Event()
+    classified_subjects = []
+
+    def classify_fn(subject, body):
+        classified_subjects.append(subject)
+        started.set()
+        release.wait(timeout=10)
+        return {'topic_tags': ['Product'], 'sentiment': 'Neutral', 'priority': 'P1 (Medium)', 'reasoning': "llm"}
+
+    tickets = [ticket(i) for i in range(4)]
+    store_dir, job_dir = str(tmp_path / 'store'), str(tmp_path / 'jobs')
+    queue = ClassificationJobQueue(classify_fn, ResultStore(store_dir), job_dir=job_dir,
+                                   scheduler=LLMScheduler(workers=1))
+    job_id = queue.submit('v1', tickets)
+    assert started.wait(timeout=10)
+    queue.cancel(job_id)
+    release.set()
+
+    assert wait_for(queue, job_id)['status'] == CANCELLED
+    assert len(classified_subjects) == 1
+
+    # After a restart the partial results are still there, but the job must not auto-resume
+    restarted = ClassificationJobQueue(classify_fn, ResultStore(store_dir), job_dir=job_dir,
+                                       scheduler=LLMScheduler(workers=1))
+    assert restarted.has_partial('v1')
+    assert restarted.was_cancelled('v1')
+
+    # Submitting again on purpose resumes from the partial results and clears the marker
+    status = wait_for(restarted, restarted.submit('v1', tickets))
+    assert status['status'] == COMPLETED
+    assert sorted(classified_subjects) == [f"Subject {i}" for i in range(4)]
+    assert not restarted.was_cancelled('v1')
+    assert not restarted.has_partial('v1')
+
+
+def llm_labels(subject, body):
+    return {'topic_tags': ['Product'], 'sentiment': 'Neutral', 'priority': 'P1 (Medium)', 'reasoning': "llm"}
+
+
+def test_estimate_runs_once_per_ticket():
+    estimated = []
+
+    def estimate_fn(subject, body):
+        estimated.append(subject)
+        return {'priority': 'P2 (Low)'}
+
+    queue = ClassificationJobQueue(llm_labels, ResultStore(), estimate_fn=estimate_fn)
+    status = wait_for(queue, queue.submit('v1', [ticket(i) for i in range(4)]))
+
+    assert status['status'] == COMPLETED
+    assert sorted(estimated) == [f"Subject {i}" for i in range(4)]
+
+
+def test_submit_without_resume_restarts_an_active_job(tmp_path):
+    release = threading.Event()
+    calls = []
+
+    def classify_fn(subject, body):
+        calls.append(subject)
+        release.wait(timeout=10)
+        return llm_labels(subject, body)
+
+    queue = ClassificationJobQueue(classify_fn, ResultStore(), job_dir=str(tmp_path))
+    tickets = [ticket(i) for i in range(3)]
+    first = queue.submit('v1', tickets)
+    assert queue.submit('v1', tickets) == first  # resume joins the running job
+
+    second = queue.submit('v1', tickets, resume=False)
+    assert second != first
+    assert queue.active_job('v1')['id'] == second
+    release.set()
+
+    assert wait_for(queue, first)['status'] == CANCELLED
+    assert wait_for(queue, second)['status'] == COMPLETED
+    assert queue.get_status(second)['completed'] == 3
@@ -0,0 +1,75 @@
+import pytest
+
+from circuit_breaker import CLOSED, OPEN, CircuitBreaker, CircuitOpenError
+from llm_pool import LLMBackend, LLMBackendError, LLMPool
+from stub_llm import StubCohereClient
+
+
+class FailingClient:
+    def __init__(self, status: int):
+        self.status = status
+        self.calls = 0
+
+    def chat(self, message: str = "", **kwargs):
+        self.calls += 1
+        raise LLMBackendError(f"HTTP {self.status}", http_status=self.status)
+
+
+def backend(name, client, failure_threshold=3):
+    return LLMBackend(name, client, calls_per_minute=0,
+                      breaker=CircuitBreaker(f"test:{name}", failure_threshold=failure_threshold,
+                                             reset_timeout=60, max_retries=0))
+
+
+def test_fails_over_to_the_next_backend():
+    failing = FailingClient(503)
+    pool = LLMPool([backend('a', failing), backend('b', StubCohereClient())])
+
+    response = pool.chat(message="Question: what is lineage?")
+
+    assert response.text
+    assert failing.calls == 1
+    stats = {b['backend']: b for b in pool.snapshot()}
+    assert stats['a']['failures'] == 1 and stats['b']['calls'] == 1
+
+
+def test_open_backend_is_skipped():
+    failing = FailingClient(500)
+    pool = LLMPool([backend('a', failing, failure_threshold=1), backend('b', StubCohereClient())])
+
+    pool.chat(message="Question: one")
+    assert pool.backends[0].breaker.state == OPEN
+    pool.chat(message="Question: two")
+
+    assert failing.calls == 1
+
+
+def test_request_errors_do_not_fail_over_or_trip_the_breaker():
+    bad_request = FailingClient(400)
+    healthy = StubCohereClient()
+    pool = LLMPool([backend('a', bad_request, failure_threshold=1), backend('b', healthy)])
+
+    with pytest.raises(LLMBackendError):
+        pool.chat(message="Question: malformed")
+
+    assert healthy.calls == 0
+    assert pool.backends[0].breaker.state == CLOSED
+
+
+def test_rejected_credentials_fail_over():
+    pool = LLMPool([backend('a', FailingClient(401)), backend('b', StubCohereClient())])
+    assert pool.chat(message="Question: hello").text
+
+
+def test_raises_last_error_when_every_backend_fails():
+    pool = LLMPool([backend('a', FailingClient(500)), backend('b', FailingClient(502))])
+    with pytest.raises(LLMBackendError):
+        pool.chat(message="Question: hello")
+
+
+def test_raises_circuit_open_when_no_backend_is_healthy():
+    pool = LLMPool([backend('a', FailingClient(500), failure_threshold=1)])
+    with pytest.raises(LLMBackendError):
+        pool.chat(message="Question: hello")
+    with pytest.raises(CircuitOpenError):
+        pool.chat(message="Question: hello")
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from llm_scheduler import LLMScheduler, estimate_urgency
+
+
+def test_estimate_urgency():
+    assert estimate_urgency({'priority': "P0 (High)", 'sentiment': "Neutral"}) == (0.0, "P0")
+    assert estimate_urgency({'priority': "P1 (Medium)", 'sentiment': "Angry"}) == (0.5, "P1")
+    assert estimate_urgency({'priority': "P2 (Low)"}, interactive=True) == (1.0, "P2")
+    assert estimate_urgency({'priority': "P9 (Custom)"}) == (2.0, "P2")
+    assert estimate_urgency(None) == (2.0, "P2")
+
+
+def blocked_scheduler(**kwargs):
+    """A scheduler whose only bulk worker is busy until the returned event is set."""
+    scheduler = LLMScheduler(workers=1, **kwargs)
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait(timeout=10)
+
+    scheduler.submit(block)
+    assert started.wait(timeout=10)
+    return scheduler, release
+
+
+def test_runs_queued_calls_in_urgency_order():
+    scheduler, release = blocked_scheduler(interactive_workers=0)
+    order = []
+    futures = [scheduler.submit(order.append, tier, rank=rank, tier=tier)
+               for rank, tier in ((2.0, "P2"), (1.0, "P1"), (0.0, "P0"))]
+    assert scheduler.queue_depth() == 3
+    release.set()
+
+    for future in futures:
+        future.result(timeout=10)
+    assert order == ["P0", "P1", "P2"]
+
+
+def test_aging_lets_old_low_priority_work_run_first():
+    scheduler, release = blocked_scheduler(aging_seconds=0.05, interactive_workers=0)
+    order = []
+    old = scheduler.submit(order.append, "P2", rank=2.0, tier="P2")
+    time.sleep(0.15)  # three priority levels' worth of waiting
+    new = scheduler.submit(order.append, "P0", rank=0.0, tier="P0")
+    release.set()
+
+    old.result(timeout=10)
+    new.result(timeout=10)
+    assert order == ["P2", "P0"]
+
+
+def test_interactive_lane_does_not_wait_for_bulk_work():
+    scheduler, release = blocked_scheduler(interactive_workers=1)
+    try:
+        future = scheduler.submit(lambda: "answer", rank=0.0, interactive=True, kind="answer")
+        assert future.result(timeout=10) == "answer"
+        assert scheduler.queue_depth(interactive=False) == 0
+    finally:
+        release.set()
+
+
+def test_errors_are_set_on_the_future():
+    scheduler = LLMScheduler(workers=1, interactive_workers=0)
+
+    def fail():
+        raise ValueError("bad JSON")
+
+    with pytest.raises(ValueError):
+        scheduler.submit(fail).result(timeout=10)
@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+from micro_batcher import MicroBatcher
+
+
+def test_concurrent_submissions_share_one_batch():
+    batches = []
+    started = threading.Event()
+
+    def batch_fn(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=200)
+    futures = []
+
+    def submit(i):
+        started.wait()
+        futures.append((i, batcher.submit(i)))
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    started.set()
+    for thread in threads:
+        thread.join()
+
+    assert {i: future.result(timeout=5) for i, future in futures} == {i: i * 2 for i in range(5)}
+    assert len(batches) == 1
+    assert sorted(batches[0]) == list(range(5))
+    assert batcher.stats()['max_batch_size'] == 5
+
+
+def test_batches_are_capped_at_max_batch_size():
+    batches = []
+    batcher = MicroBatcher(lambda items: batches.append(len(items)) or items, max_batch_size=3, max_wait_ms=200)
+    futures = [batcher.submit(i) for i in range(7)]
+    assert [future.result(timeout=5) for future in futures] == list(range(7))
+    assert max(batches) <= 3
+    assert sum(batches) == 7
+
+
+def test_batch_errors_reach_every_caller():
+    def batch_fn(items):
+        raise RuntimeError("backend down")
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit(i) for i in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="backend down"):
+            future.result(timeout=5)
+    assert batcher.stats()['errors'] >= 1
+
+
+def test_wrong_result_count_is_an_error():
+    batcher = MicroBatcher(lambda items: items[:-1], max_batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit(i) for i in range(2)]
+    with pytest.raises(ValueError, match="returned"):
+        futures[0].result(timeout=5)
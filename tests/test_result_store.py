@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from result_store import ResultStore, compute_dataset_version
+
+
+def ticket(i, **labels):
+    return {'id': f"T-{i}", 'subject': f"Subject {i}", 'body': f"Body {i}", **labels}
+
+
+def classified(i, priority='P2 (Low)'):
+    return ticket(i, topic_tags=['Product'], sentiment='Neutral', priority=priority, reasoning="test")
+
+
+def test_put_persists_and_a_new_store_loads_it(tmp_path):
+    records = [classified(i) for i in range(3)]
+    ResultStore(str(tmp_path)).put('v1', records)
+
+    reloaded = ResultStore(str(tmp_path)).get('v1')
+    assert reloaded.to_records() == records
+
+
+def test_record_keeps_persisted_results(tmp_path):
+    ResultStore(str(tmp_path)).put('v1', [classified(0), classified(1)])
+
+    store = ResultStore(str(tmp_path))
+    store.record('v1', 1, classified(1, priority='P0 (High)'))
+    store.record('v1', 2, classified(2))
+    store.flush('v1')
+
+    records = ResultStore(str(tmp_path)).get('v1').to_records()
+    assert [r['priority'] for r in records] == ['P2 (Low)', 'P0 (High)', 'P2 (Low)']
+    assert store.get_aggregates('v1') is not None
+
+
+def test_record_rejects_positions_past_the_end():
+    store = ResultStore()
+    store.record('v1', 0, classified(0))
+    with pytest.raises(IndexError):
+        store.record('v1', 2, classified(2))
+
+
+def test_get_or_classify_runs_once_for_concurrent_callers():
+    store = ResultStore()
+    calls = []
+
+    def classify():
+        calls.append(1)
+        time.sleep(0.1)
+        return [classified(0)]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.get_or_classify('v1', classify)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(len(r) == 1 for r in results)
+
+
+def test_dataset_version_is_order_sensitive_and_stable():
+    tickets = [ticket(0), ticket(1)]
+    assert compute_dataset_version(tickets) == compute_dataset_version([dict(t) for t in tickets])
+    assert compute_dataset_version(tickets) != compute_dataset_version(tickets[::-1])
+
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from ai_classifier import TicketClassifier
+from config import Config
+from structured_output import coerce_classification, extract_json
+from stub_llm import StubChatResponse
+
+
+def test_extract_json_from_a_code_fence():
+    text = 'Here you go:\n```json\n{"priority": "P1 (Medium)", "reasoning": "uses } and { inside"}\n```'
+    assert extract_json(text) == {'priority': "P1 (Medium)", 'reasoning': "uses } and { inside"}
+
+
+def test_extract_json_after_leading_prose():
+    assert extract_json('Sure! The answer is [{"a": 1}, {"a": 2}] as requested.') == [{'a': 1}, {'a': 2}]
+    assert extract_json('Sure! [1, 2] then {"a": 1}', expect=dict) == {'a': 1}
+
+
+@pytest.mark.parametrize('text', [
+    'I think { so: {"a":1}',
+    'Options {a|b} {"a":1}',
+    '{"a": oops} {"a":1}',
+    'unbalanced ] then [ and {"a":1}'
+])
+def test_extract_json_skips_stray_braces(text):
+    assert extract_json(text, expect=dict) == {'a': 1}
+
+
+def test_extract_json_without_json():
+    assert extract_json("No JSON here {") is None
+    assert extract_json("") is None
+
+
+def test_label_codes_and_near_misses_are_accepted():
+    result, failed = coerce_classification(
+        {'topic_tags': ["PII", "connectors", "api"], 'sentiment': "F", 'priority': "high", 'reasoning': " ok "}
+    )
+    assert failed == []
+    assert result == {'topic_tags': ["Sensitive data", "Connector", "API/SDK"], 'sentiment': "Frustrated",
+                      'priority': "P0 (High)", 'reasoning': "ok"}
+
+
+@pytest.mark.parametrize('field,value', [
+    ('sentiment', "n"),  # lower-case code: too short to guess from
+    ('sentiment', "Happy"),
+    ('topic_tags', ["Data"]),  # one word of "Sensitive data"
+    ('priority', "P"),
+    ('priority', "urgent")
+])
+def test_ambiguous_or_unknown_labels_fail(field, value):
+    item = {'topic_tags': ["SSO"], 'sentiment': "Neutral", 'priority': "P2 (Low)", field: value}
+    result, failed = coerce_classification(item)
+    assert failed == [field]
+    assert field not in result
+
+
+class ScriptedClient:
+    """Answers chat calls from a list of canned responses, recording the messages it was sent."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.messages = []
+
+    def chat(self, message: str = "", model: str = None, max_tokens: int = None, temperature: float = None,
+             preamble_override: str = None):
+        self.messages.append(message)
+        return StubChatResponse(self.responses.pop(0))
+
+
+def scripted_classifier(*responses):
+    classifier = TicketClassifier(cohere_client=ScriptedClient(*responses), distilled_model=False)
+    classifier.min_delay_between_calls = 0
+    return classifier
+
+
+def test_invalid_label_is_re_asked_once():
+    first = json.dumps({'topic_tags': ["SSO"], 'sentiment': "n", 'priority': "P0 (High)", 'reasoning': "login"})
+    classifier = scripted_classifier(f"Answer: {first}", '{"sentiment": "Frustrated"}')
+
+    result = classifier.classify_with_cohere("SSO broken", "Nobody can log in since this morning")
+
+    assert result['sentiment'] == "Frustrated"
+    assert result['topic_tags'] == ["SSO"] and result['priority'] == "P0 (High)"
+    repair_message = classifier.cohere_client.messages[1]
+    assert "sentiment" in repair_message and "priority:" not in repair_message
+
+
+def test_repair_is_not_repeated_when_it_fails_too():
+    first = json.dumps({'topic_tags': ["SSO"], 'sentiment': "meh", 'priority': "P0 (High)", 'reasoning': "login"})
+    classifier = scripted_classifier(first, '{"sentiment": "still meh"}', '{"sentiment": "Neutral"}')
+
+    result = classifier.classify_with_cohere("SSO broken", "Nobody can log in since this morning")
+
+    assert len(classifier.cohere_client.messages) == 2
+    assert result['sentiment'] in Config.SENTIMENT_LABELS  # filled from keyword classification
+    assert result['topic_tags'] == ["SSO"]
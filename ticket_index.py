@@ -0,0 +1,98 @@
+"""
+Inverted indexes over classified tickets for fast filtering and pagination.
+
+The index is built once per classification run, so filtering by priority,
+sentiment and topic on a rerun only touches the matching postings instead of
+scanning every ticket.
+"""
+
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence
+
+
+class TicketIndex:
+    def __init__(self, tickets: List[Dict]):
+        self.tickets = tickets
+        self.by_priority: Dict[str, List[int]] = defaultdict(list)
+        self.by_sentiment: Dict[str, List[int]] = defaultdict(list)
+        self.by_topic: Dict[str, List[int]] = defaultdict(list)
+
+        for position, ticket in enumerate(tickets):
+            self.by_priority[ticket.get('priority')].append(position)
+            self.by_sentiment[ticket.get('sentiment')].append(position)
+            for tag in self._tags(ticket):
+                self.by_topic[tag].append(position)
+
+        # Set views of each posting list for O(1) membership during intersection
+        self._priority_sets = defaultdict(set, {k: set(v) for k, v in self.by_priority.items()})
+        self._sentiment_sets = defaultdict(set, {k: set(v) for k, v in self.by_sentiment.items()})
+        self._topic_sets = defaultdict(set, {k: set(v) for k, v in self.by_topic.items()})
+
+    @staticmethod
+    def _tags(ticket: Dict) -> List[str]:
+        tags = ticket.get('topic_tags') or []
+        if not isinstance(tags, list):
+            tags = [tags]
+        return list(set(tags))
+
+    @staticmethod
+    def _remove_posting(postings: List[int], members: set, position: int):
+        i = bisect_left(postings, position)
+        if i < len(postings) and postings[i] == position:
+            del postings[i]
+        members.discard(position)
+
+    @staticmethod
+    def _add_posting(postings: List[int], members: set, position: int):
+        if position not in members:
+            insort(postings, position)
+            members.add(position)
+
+    def _postings_for(self, ticket: Dict):
+        yield self.by_priority[ticket.get('priority')], self._priority_sets[ticket.get('priority')]
+        yield self.by_sentiment[ticket.get('sentiment')], self._sentiment_sets[ticket.get('sentiment')]
+        for tag in self._tags(ticket):
+            yield self.by_topic[tag], self._topic_sets[tag]
+
+    def update(self, position: int, ticket: Dict):
+        """Re-index one ticket in place (or append it when position == len)."""
+        if position < len(self.tickets):
+            for postings, members in self._postings_for(self.tickets[position]):
+                self._remove_posting(postings, members, position)
+            self.tickets[position] = ticket
+        else:
+            self.tickets.append(ticket)
+
+        for postings, members in self._postings_for(ticket):
+            self._add_posting(postings, members, position)
+
+    def __len__(self) -> int:
+        return len(self.tickets)
+
+    def filter(self, priority: Optional[str] = None, sentiment: Optional[str] = None,
+               topic: Optional[str] = None) -> Sequence[int]:
+        """Return ticket positions (in original order) matching all given filters."""
+        postings = []
+        if priority is not None:
+            postings.append((self.by_priority.get(priority, []), self._priority_sets.get(priority, set())))
+        if sentiment is not None:
+            postings.append((self.by_sentiment.get(sentiment, []), self._sentiment_sets.get(sentiment, set())))
+        if topic is not None:
+            postings.append((self.by_topic.get(topic, []), self._topic_sets.get(topic, set())))
+
+        if not postings:
+            return range(len(self.tickets))
+
+        # Walk the shortest posting list and probe the others
+        postings.sort(key=lambda p: len(p[0]))
+        smallest, _ = postings[0]
+        others = [s for _, s in postings[1:]]
+        if not others:
+            return smallest
+        return [pos for pos in smallest if all(pos in s for s in others)]
+
+    def page(self, positions: Sequence[int], page: int, page_size: int) -> List[Dict]:
+        """Materialize a single page (1-based) of tickets from filtered positions."""
+        start = max(page - 1, 0) * page_size
+        return [self.tickets[pos] for pos in positions[start:start + page_size]]